@@ -0,0 +1,493 @@
+'''
+author: Michael A. Reiter
+(c) ETH Zurich, Michael A. Reiter, 2022
+
+This file is part of Dashing Growth Curves.
+
+Dashing Growth Curves is free software: you can redistribute it and/or modify it under the terms of the GNU General Public License as published by the Free Software Foundation, either version 3 of the License, or (at your option) any later version.
+
+Dashing Growth Curves is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License along with Dashing Growth Curves. If not, see <https://www.gnu.org/licenses/>.
+'''
+
+import numpy as np
+from scipy.optimize import curve_fit
+
+import auto_fitting
+import math_functions as mf
+import derived_metrics as dm
+import results_table as rt
+import default_settings as ds
+import blanking as blk
+
+
+# analysis of whole plates without the UI (no Dash or plotly imports): used by the app's callbacks and the background workers
+
+
+################################################
+# results table
+################################################
+def add_to_growth_data_dict(growth_rate_data, sp,
+                            t0=None, t0_std=None, t0_idx=None,
+                            t1=None, t1_std=None, t1_idx=None,
+                            mumax=None, mumax_std=None,
+                            doublingslog=None, doublingslog_std=None,
+                            dt=None, dt_std=None,
+                            Yield=None,
+                            **fit,
+                            ):
+    '''
+        Store the fit of one sample in the results table (see results_table.fields), fields that are not given are reset
+        - growth_rate_data: results table (see results_table.new_table())
+        - sp: sample location
+        - fit: further fields (e.g. A, N0, v, l and their *_std, error, fitting_mode, smoothing_window, blank_model,
+          bootstrap intervals, model selection, fit_loss, point_weights, phase_*)
+    '''
+    return rt.set_fit(growth_rate_data, sp,
+                      t0=t0, t0_std=t0_std, t0_idx=t0_idx,
+                      t1=t1, t1_std=t1_std, t1_idx=t1_idx,
+                      mumax=mumax, mumax_std=mumax_std,
+                      doublings_log=doublingslog, doublings_log_std=doublingslog_std,
+                      dt=dt, dt_std=dt_std,
+                      **{'yield': Yield},
+                      **fit,
+                      )
+
+
+
+def update_derived_metrics(growth_rate_data, sample_locations=None):
+    '''
+        Compute lag time, end of exponential phase, doubling time and doublings in the exponential phase of many samples
+        at once from their stored fit parameters (see derived_metrics.derived_metrics())
+        - growth_rate_data: results table (see results_table.new_table())
+        - sample_locations: samples to update (default: all samples with a fit)
+        - doublings in the exponential phase of manual fits are measured and not recomputed
+    '''
+    if sample_locations is None:
+        rows = np.flatnonzero(rt.has_fit(growth_rate_data))
+    else:
+        rows = np.array([rt.sample_index(growth_rate_data, sp) for sp in sample_locations], dtype=int)
+    if rows.shape[0] == 0:
+        return growth_rate_data
+
+    keys = {'N0': 'N0', 'A': 'A', 'mu': 'mumax', 'l': 'l', 'v': 'v'}
+    fitting_modes = growth_rate_data['fitting_mode'][rows]
+    params = np.stack([growth_rate_data[keys[p]][rows] for p in dm.parameter_names], axis=1)
+    params_std = np.stack([growth_rate_data[keys[p] + '_std'][rows] for p in dm.parameter_names], axis=1)
+    t_window = np.stack([growth_rate_data['t0'][rows], growth_rate_data['t1'][rows]], axis=1)
+    metrics = dm.derived_metrics(fitting_modes, params, params_std, t_window)
+
+    measured = np.isin(fitting_modes, ['Manual', 'Manual-like'])
+    for key in metrics:
+        if key in ['doublings_log', 'doublings_log_std']:
+            growth_rate_data[key][rows[~measured]] = metrics[key][~measured]
+        else:
+            growth_rate_data[key][rows] = metrics[key]
+    return growth_rate_data
+
+
+
+################################################
+# fitting
+################################################
+def fit_growth_model(t, sample_trace_blanked, fitting_algorithm, window_size, n_bootstrap=0, executor=None, loss='linear', f_scale=ds.default_fit_loss_scale, y_log=None, start_params=None):
+    '''
+        Fit one of the automatic fitting algorithms (see default_settings.fittings_algorithms) to a blanked growth curve
+        - t, sample_trace_blanked: time points and blanked measurements without non-positive values
+        - window_size: window size of the Easy Linear algorithm
+        - n_bootstrap, executor: bootstrap resamples and process pool (see auto_fitting.bootstrap_parameters())
+        - loss, f_scale: robust loss of Gompertz, Logistic and Easy Linear fits (see auto_fitting.loss_kwargs())
+        - y_log: log-transformed sample_trace_blanked (computed if not given)
+        - start_params: N0, A, mu and l of a Gompertz fit of the same data, starting values of Richards and Schnute fits
+          (fitted if not given)
+
+        Returns the fitted parameters and their standard deviations (see derived_metrics.parameter_names), the start and
+        end of the exponential phase of window fits, the fitted log population size at t, the bootstrap samples, the loss
+        used and the weight of every data point in the fit, None if the fit failed. Lag time, doubling time and doublings
+        are derived from the parameters of all samples at once (see update_derived_metrics()).
+    '''
+    if not auto_fitting.supports_robust_loss(fitting_algorithm):
+        loss = 'linear'
+    if y_log is None:
+        y_log = np.log(np.array(sample_trace_blanked))
+
+    # shape parameter only for Richards and Schnute models, growth phases only for the Multi-phase algorithm
+    v, v_std = np.nan, np.nan
+    phases = {}
+
+    # start and end of the exponential phase (window fits only, sigmoid models: derived from the parameters)
+    t_window = [np.nan, np.nan]
+
+    if 'Gompertz' in fitting_algorithm:
+        # A: log carrying capacity
+        # mu: max growth rate
+        # l: lag time (i.e. beginning of exponential phase)
+        # N0: initial population size
+        A, A_std, mu, mu_std, l, l_std, N0, N0_std, params_bootstrap = auto_fitting.autofit_gompertz(t, sample_trace_blanked, n_bootstrap, executor, loss=loss, f_scale=f_scale, y_log=y_log)
+
+
+        if (np.isnan(A)) or (np.isnan(mu_std)) or (mu_std == np.inf):
+            return None
+        y_log_fit = mf.modified_gompertz(t, N0, A, mu, l)
+
+    elif 'Logistic' in fitting_algorithm:
+        # A: log carrying capacity
+        # mu: max growth rate
+        # l: lag time (i.e. beginning of exponential phase)
+        # N0: initial population size
+        A, A_std, mu, mu_std, l, l_std, N0, N0_std, params_bootstrap = auto_fitting.autofit_logistic(t, sample_trace_blanked, n_bootstrap, executor, loss=loss, f_scale=f_scale, y_log=y_log)
+        if (np.isnan(A)) or (np.isnan(mu_std)) or (mu_std == np.inf):
+            return None  
+        y_log_fit = mf.modified_logistic(t, N0, A, mu, l)
+
+    elif fitting_algorithm in ['Richards', 'Schnute']:
+        # A: log carrying capacity
+        # mu: max growth rate
+        # l: lag time (i.e. beginning of exponential phase)
+        # v: shape parameter
+        # N0: initial population size
+        if fitting_algorithm == 'Richards':
+            A, A_std, mu, mu_std, l, l_std, N0, N0_std, v, v_std, params_bootstrap = auto_fitting.autofit_richards(t, sample_trace_blanked, n_bootstrap, executor, y_log, start_params)
+            model = mf.modified_richards
+        else:
+            A, A_std, mu, mu_std, l, l_std, N0, N0_std, v, v_std, params_bootstrap = auto_fitting.autofit_schnute(t, sample_trace_blanked, n_bootstrap, executor, y_log, start_params)
+            model = mf.modified_schnute
+        if (np.isnan(A)) or (np.isnan(mu_std)) or (mu_std == np.inf):
+            return None
+        y_log_fit = model(t, N0, A, mu, l, v)
+
+    elif 'Easy Linear' in fitting_algorithm:
+        # mu: max growth rate
+        # t0: beginning of exponential phase
+        # t1: beginning of stationary phase (i.e. end of exponential phase)
+        t0, t1, mu, mu_std, y_intercept, y_intercept_std, R2_error, params_bootstrap = auto_fitting.autofit_easylinear(t, sample_trace_blanked, window_size, n_bootstrap, executor, loss=loss, f_scale=f_scale, y_log=y_log)
+
+        A, A_std, l, l_std = np.nan, np.nan, np.nan, np.nan
+        N0, N0_std = np.exp(y_intercept), 0
+        t_window = [t0, t1]
+
+        # lag phase, exponential phase and stationary phase as three-phase piecewise linear model (for model selection)
+        y_log_fit = np.clip(mf.lin_function(t, mu, y_intercept), mf.lin_function(t0, mu, y_intercept), mf.lin_function(t1, mu, y_intercept))
+
+    elif fitting_algorithm == 'Multi-phase':
+        # growth phases (mu, start, end and intercept), the fastest phase defines the growth parameters of the sample
+        mus, mus_std, t0s, t1s, y_intercepts, r2s = auto_fitting.autofit_multiphase(t, sample_trace_blanked, window_size, y_log)
+        params_bootstrap = None
+        if mus.shape[0] == 0:
+            return None
+        main = np.argmax(mus)
+        R2_error = r2s[main]
+
+        A, A_std, l, l_std = np.nan, np.nan, np.nan, np.nan
+        N0, N0_std = np.exp(y_intercepts[main]), 0
+        mu, mu_std = mus[main], mus_std[main]
+        t_window = [t0s[main], t1s[main]]
+
+        # fastest phase as three-phase piecewise linear model (like Easy Linear)
+        y_log_fit = np.clip(mf.lin_function(t, mus[main], y_intercepts[main]), mf.lin_function(t0s[main], mus[main], y_intercepts[main]), mf.lin_function(t1s[main], mus[main], y_intercepts[main]))
+        phases = {
+                    'phase_mumax': mus, 'phase_mumax_std': mus_std,
+                    'phase_t0': t0s, 'phase_t1': t1s,
+                    'phase_N0': np.exp(y_intercepts),
+                    }
+
+    # weight of every data point in the fit (Easy Linear: only points in the selected window are fitted)
+    weights = mf.robust_weights(y_log - y_log_fit, loss, f_scale)
+    if 'Easy Linear' in fitting_algorithm:
+        weights[(t < t0) | (t >= t1)] = np.nan
+
+    return {
+            'params': np.array([N0, A, mu, l, v], dtype=float),
+            'params_std': np.array([N0_std, A_std, mu_std, l_std, v_std], dtype=float),
+            't_window': np.array(t_window, dtype=float),
+            'y_log_fit': y_log_fit,
+            'R2_error': R2_error if fitting_algorithm in ['Easy Linear', 'Multi-phase'] else np.nan,
+            'params_bootstrap': params_bootstrap,
+            'loss': loss,
+            'weights': weights,
+            'phases': phases,
+            }
+
+
+def select_growth_model(t, sample_trace_blanked, window_size, n_bootstrap=0, executor=None, loss='linear', f_scale=ds.default_fit_loss_scale, y_log=None):
+    '''
+        Fit all candidate models (see default_settings.model_selection_candidates) to a blanked growth curve and select the
+        model with the lowest information criterion (see default_settings.model_selection_criterion)
+        - all models are compared on the same log-transformed data, Easy Linear as three-phase piecewise linear model
+        - candidates are fitted by least squares (the information criterion compares fits minimizing the same objective),
+          the Gompertz candidate is the start of Richards and Schnute candidates
+        - loss, f_scale: robust loss, the selected model is fitted again with it if it supports it (see fit_growth_model())
+        - bootstrap resamples (n_bootstrap) are only fitted for the selected model
+        - y_log: log-transformed sample_trace_blanked (computed if not given)
+
+        Returns the fit of the selected model (see fit_growth_model()), its name and the model selection summary
+        (selected model and runner-up with their scores), None if all fits failed.
+    '''
+    if y_log is None:
+        y_log = np.log(np.array(sample_trace_blanked))
+    fits = {}
+    scores = {}
+    start_params = None
+    for model in ds.model_selection_candidates:
+        fit = fit_growth_model(t, sample_trace_blanked, model, window_size, y_log=y_log, start_params=start_params)
+        if fit is None:
+            continue
+        if 'Gompertz' in model:
+            start_params = fit['params'][:4]
+        score = auto_fitting.information_criterion(y_log, fit['y_log_fit'], auto_fitting.n_model_parameters[model], ds.model_selection_criterion)
+        if np.isfinite(score):
+            fits[model] = fit
+            scores[model] = score
+
+    if len(scores) == 0:
+        return None, None, None
+    ranking = sorted(scores, key=scores.get)
+    selected_model = ranking[0]
+
+    robust = (loss != 'linear') and auto_fitting.supports_robust_loss(selected_model)
+    if (n_bootstrap > 0) or robust:
+        fit = fit_growth_model(t, sample_trace_blanked, selected_model, window_size, n_bootstrap, executor, loss, f_scale, y_log, start_params)
+        if fit is not None:
+            fits[selected_model] = fit
+
+    model_selection = {
+                        'selected_model': selected_model,
+                        'model_score': scores[selected_model],
+                        'runner_up_model': ranking[1] if len(ranking) > 1 else None,
+                        'runner_up_score': scores[ranking[1]] if len(ranking) > 1 else np.nan,
+                        'model_criterion': ds.model_selection_criterion,
+                        }
+    return fits[selected_model], selected_model, model_selection
+
+
+
+################################################
+# fitted curves
+################################################
+def generate_fitted_curve(t, fitting_algorithm, growth_data_sp, n_iter=1000):
+    t0 = growth_data_sp['t0']
+    t1 = growth_data_sp['t1']
+    t0_idx = growth_data_sp['t0_idx']
+    t1_idx = growth_data_sp['t1_idx']
+    mu = growth_data_sp['mumax']
+    N0 = growth_data_sp['N0']
+    l = growth_data_sp['t0']
+    A = growth_data_sp['A']
+    v = growth_data_sp['v']
+
+    # for tight fits, need to convert lag time value to lambda parameter
+    if fitting_algorithm in dm.phase_factors:
+        l = dm.lag_parameter(fitting_algorithm, l, A, mu)
+
+    # create timepoints
+    if fitting_algorithm in ['Manual', 'Manual-like']:
+        t_fit_start = t[t0_idx]
+        t_fit_end = t[t1_idx]
+    elif fitting_algorithm in ['Easy Linear', 'Multi-phase']:
+        t_fit_start = t0
+        t_fit_end = t1
+    else:
+        t_fit_start = t[0]
+        t_fit_end = t[-1]
+
+    t_fit = np.linspace(t_fit_start, t_fit_end, n_iter)
+
+    if fitting_algorithm == 'Multi-phase':
+        # one fitted segment per growth phase, separated by gaps (NaN)
+        t_fit, y_fit = [], []
+        for mu_k, t0_k, t1_k, N0_k in zip(growth_data_sp['phase_mumax'], growth_data_sp['phase_t0'], growth_data_sp['phase_t1'], growth_data_sp['phase_N0']):
+            t_k = np.linspace(t0_k, t1_k, max(n_iter // len(growth_data_sp['phase_mumax']), 2))
+            t_fit += [t_k, [np.nan]]
+            y_fit += [mf.exp_function(t_k, N0_k, mu_k), [np.nan]]
+        return np.concatenate(t_fit[:-1]), np.concatenate(y_fit[:-1])
+
+    # create fit values (i.e. associated y-values)
+    if fitting_algorithm in ['Manual', 'Manual-like', 'Easy Linear']:
+        
+        y_fit = mf.exp_function(t_fit, N0, mu)
+
+    elif fitting_algorithm in dm.phase_factors:
+        y_fit = np.exp(dm.log_population(fitting_algorithm, t_fit, N0, A, mu, l, v))
+    return t_fit, y_fit
+
+
+
+################################################
+# plate
+################################################
+def fit_all_samples(progress, df, df_blanked, growth_rate_data, auto_fit_ws, auto_fit_sr, auto_fit_weight, fitting_algorithm, window_size, smoother_ws, blank_model, n_bootstrap, executor, loss='linear', f_scale=ds.default_fit_loss_scale):
+    # fit every sample of the plate, bootstrap resamples are fitted in the shared process pool (executor)
+    skip_list = ds.accepted_blank_names
+    n_samples_total = len(growth_rate_data['sample_locations'])
+
+    # yield and doublings of all samples at once (non-positive values are removed before fitting)
+    yields, doublings_all = dm.measured_metrics(df_blanked.values)
+
+    # fitted samples with their masked data and fit, derived parameters are computed for all of them at once
+    fitted = {}
+    for i, sp in enumerate(growth_rate_data['sample_locations']):
+        progress(i + 1, n_samples_total)
+
+        sample_name = growth_rate_data['sample_name'][i]
+        if any([x in sample_name for x in skip_list]) or (sample_name == '-'):
+            continue
+
+        else:
+            sample_trace_blanked = df_blanked.iloc[i]
+            t = df.columns.values
+            
+            # remove negative and zero value (taking the log negative values become NaN, fitting algorithms can't handle NaNs and infinities)
+            sample_trace_blanked_log = np.log(sample_trace_blanked)
+            nan_inf_mask = (~np.isnan(sample_trace_blanked_log)) & (sample_trace_blanked_log != - np.inf)
+            sample_trace_blanked = sample_trace_blanked[nan_inf_mask]
+            y_log = sample_trace_blanked_log[nan_inf_mask].values
+            t = t[nan_inf_mask]
+            
+            if sample_trace_blanked.shape[0] <= 0.1 * sample_trace_blanked_log.shape[0]:
+                # don't analyze samples that contain majority negative values after blanking
+                continue
+
+            # fitting
+            if fitting_algorithm == 'Manual-like':
+                t0_idx, t1_idx = auto_fitting.autofit_manual_like(t, sample_trace_blanked, ws=auto_fit_ws, slope_range=auto_fit_sr, b=auto_fit_weight)
+
+                if t0_idx is None:
+                    continue
+
+                try:
+                    x = t[t0_idx: t1_idx]
+                    y = sample_trace_blanked.iloc[t0_idx: t1_idx]
+                    popt_exp, pcov_exp = curve_fit(mf.exp_function, x, y, bounds=([0, 0.001], [5, 2]))
+                    
+                except:
+                    continue
+                
+                # compute r2 value
+                r2 = mf.comp_R2(np.array(x), np.log(y), [popt_exp[1], np.log(popt_exp[0])])
+
+
+                doublings_log = np.log2(sample_trace_blanked.iloc[t1_idx] / sample_trace_blanked.iloc[t0_idx])
+                doublings_log_std = 0
+
+                fitting_mode = 'Manual-like'
+
+                growth_rate_data = add_to_growth_data_dict(growth_rate_data, sp,
+                                            t[t0_idx], 0, t0_idx, 
+                                            t[t1_idx], 0, t1_idx,
+                                            popt_exp[1], np.sqrt(pcov_exp[1,1]),
+                                            doublings_log, doublings_log_std,
+                                            N0=popt_exp[0], N0_std=0,
+                                            doublings=doublings_all[i],
+                                            Yield=yields[i],
+                                            error=r2,
+                                            fitting_mode=fitting_mode,
+
+                                            )
+                fitted[sp] = (t, sample_trace_blanked, None)
+            
+            else:
+                # fit model(s) to the log-transformed and masked data
+                if fitting_algorithm == 'Best model':
+                    fit, fitting_mode, model_selection = select_growth_model(t, sample_trace_blanked, window_size, n_bootstrap, executor, loss, f_scale, y_log)
+                else:
+                    fit = fit_growth_model(t, sample_trace_blanked, fitting_algorithm, window_size, n_bootstrap, executor, loss, f_scale, y_log)
+                    fitting_mode, model_selection = fitting_algorithm, {}
+                if fit is None:
+                    continue
+                params, params_std, t_window = fit['params'], fit['params_std'], fit['t_window']
+
+                # bootstrap confidence intervals
+                intervals = auto_fitting.bootstrap_intervals(fitting_mode, fit['params_bootstrap'])
+
+                # weights of all time points of the robust fit (removed non-positive values: NaN)
+                point_weights = None
+                if fit['loss'] != 'linear':
+                    point_weights = np.full(nan_inf_mask.shape[0], np.nan)
+                    point_weights[nan_inf_mask.values] = fit['weights']
+
+                # growth phases (Multi-phase algorithm)
+                phases = fit['phases']
+               
+                # fill in fit parameters (lag time, doubling time and doublings are derived below)
+                growth_rate_data = add_to_growth_data_dict(
+                                            growth_rate_data, sp,
+                                            t_window[0], None, None,
+                                            t_window[1], None, None,
+                                            params[2], params_std[2],
+                                            A=params[1], A_std=params_std[1],
+                                            N0=params[0], N0_std=params_std[0], 
+                                            v=params[4], v_std=params_std[4],
+                                            l=params[3], l_std=params_std[3],
+                                            doublings=doublings_all[i],
+                                            Yield=yields[i],
+                                            fitting_mode=fitting_mode,
+                                            smoothing_window=smoother_ws,
+                                            blank_model=blank_model,
+                                            **intervals,
+                                            fit_loss=fit['loss'],
+                                            point_weights=point_weights,
+                                            **phases,
+                                            **model_selection,
+                                            )
+                fitted[sp] = (t, sample_trace_blanked, fit)
+
+    # lag time, doubling time and doublings in the exponential phase of all fitted samples in one step
+    growth_rate_data = update_derived_metrics(growth_rate_data, list(fitted))
+
+    # fit errors
+    for sp, (t, sample_trace_blanked, fit) in fitted.items():
+        idx = rt.sample_index(growth_rate_data, sp)
+        fitting_mode = growth_rate_data['fitting_mode'][idx]
+        if fitting_mode in ['Manual-like']:
+            continue
+        elif fitting_mode in ['Easy Linear', 'Multi-phase']:
+            growth_rate_data['error'][idx] = fit['R2_error']
+        else:
+            t_fit, y_fit = generate_fitted_curve(t, fitting_mode, rt.sample_row(growth_rate_data, sp), t.shape[0])
+            rmse = mf.rmse(np.array(sample_trace_blanked), y_fit)
+            growth_rate_data['error'][idx] = rmse
+               
+    return growth_rate_data
+
+
+def valid_fit_settings(n_bootstrap, f_scale):
+    # number of bootstrap resamples per sample (invalid input: no bootstrap)
+    try:
+        n_bootstrap = max(int(n_bootstrap), 0)
+    except (TypeError, ValueError):
+        n_bootstrap = 0
+
+    # scale of the robust loss (invalid input: default scale)
+    try:
+        f_scale = float(f_scale)
+        if not f_scale > 0:
+            raise ValueError
+    except (TypeError, ValueError):
+        f_scale = ds.default_fit_loss_scale
+    return n_bootstrap, f_scale
+
+
+def autofit_plate(df, growth_rate_data, blank_locs, plate_layout, auto_fit_ws, auto_fit_sr, auto_fit_weight, fitting_algorithm, window_size, smoother_ws, blank_model, n_bootstrap=0, loss='linear', f_scale=ds.default_fit_loss_scale, progress=None):
+    '''
+        Blank and fit all samples of a plate (autofit)
+        - df: plate data (sample names as index, time points as columns), raw or smoothed
+        - growth_rate_data: results table (see results_table.new_table()), blanks are referenced by its sample names
+        - plate_layout: plate layout (see plate_layout.generate_plate_layout()) or None
+        - n_bootstrap, f_scale: invalid inputs mean no bootstrap and the default loss scale
+        - progress: called with the number of the sample and the number of samples before every sample is fitted
+
+        Returns the results table.
+    '''
+    if progress is None:
+        progress = lambda i, n: None
+
+    # subtract blanks from all samples at once (blanks are referenced by current sample names)
+    sample_locations = list(growth_rate_data['sample_locations'])
+    df.index = list(growth_rate_data['sample_name'])
+    blanks_mean, df_blanked = blk.blanked_plate(df, blank_locs, sample_locations, blank_model, plate_layout)
+
+    n_bootstrap, f_scale = valid_fit_settings(n_bootstrap, f_scale)
+    with auto_fitting.bootstrap_executor(n_bootstrap) as executor:
+        growth_rate_data = fit_all_samples(progress, df, df_blanked, growth_rate_data, auto_fit_ws, auto_fit_sr, auto_fit_weight, fitting_algorithm, window_size, smoother_ws, blank_model, n_bootstrap, executor, loss, f_scale)
+    return growth_rate_data
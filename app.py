@@ -14,60 +14,30 @@ You should have received a copy of the GNU General Public License along with Das
 from dash import Dash, html, dcc, Output, Input, State
 import dash
 import dash_bootstrap_components as dbc
-from dash import DiskcacheManager, CeleryManager, Input, Output, html
-
-import os
-
-import pandas as pd
-import numpy as np
+from dash import Input, Output, html, Patch, ClientsideFunction, callback, clientside_callback
 
 import base64
 from base64 import b64encode
 import io
 
-from PIL import Image
 import re
+import uuid
 
-import plotly.graph_objects as go
-from plotly.express.colors import sample_colorscale
-from plotly.subplots import make_subplots
-import plotting as pl
-
-import math_functions as mf
-import growth_data as gd
 import default_settings as ds
 import messages as ms
 import auxilliary_functions as ax
+import streaming as st
+import job_api as ja
+import figure_cache as fc
 
-################################################
-# initialize app
-################################################
-if 'REDIS_URL' in os.environ:
-    # Use Redis & Celery if REDIS_URL set as an env variable
-    from celery import Celery
-    celery_app = Celery(__name__, broker=os.environ['REDIS_URL'], backend=os.environ['REDIS_URL'], include=['growth_data'], CELERY_REDIS_MAX_CONNECTIONS=18, BROKER_POOL_LIMIT=0)
-    background_callback_manager = CeleryManager(celery_app)
-
-else:
-    # Diskcache for non-production apps when developing locally
-    import diskcache
-    cache = diskcache.Cache("./cache")
-    background_callback_manager = DiskcacheManager(cache)
-
-
-external_stylesheets = [dbc.themes.BOOTSTRAP, dbc.icons.FONT_AWESOME, dbc.icons.BOOTSTRAP]
-app = Dash(__name__,
-            external_stylesheets=external_stylesheets,
-            background_callback_manager=background_callback_manager,
-            )
-
-server = app.server
+# numpy, pandas, plotly figures and the analysis modules are only needed once data is uploaded, they are imported inside
+# the callbacks to keep the start of the app short (gunicorn_config.py imports them in the master before forking)
 
 ################################################
 # app layout
 ################################################
-# register external callbacks
-gd.register_gd_callbacks(app)
+# callbacks are registered with dash.callback (here and in growth_data.py), the app is created by create_app()
+external_stylesheets = [dbc.themes.BOOTSTRAP, dbc.icons.FONT_AWESOME, dbc.icons.BOOTSTRAP]
 
 
 ############
@@ -75,7 +45,8 @@ gd.register_gd_callbacks(app)
 ############
 stores = html.Div([
     dcc.Store(id = 'store_sample_idx', data=0),         # store idx of currently selectec sample
-    dcc.Store(id = 'store_data_df'),                    # store uploaded data as dictionary (operation on it as dataframe)
+    dcc.Store(id = 'store_data_df'),                    # store uploaded data as compressed binary blocks (see data_transport)
+    dcc.Store(id = 'store_plate_meta'),                 # store sample names, locations, shape and content hash of the uploaded data (for callbacks that don't compute on the data)
     dcc.Store(id = 'store_data_df_smoothed'),           # store smoothed data
     dcc.Store(id = 'store_smoother_value', data=0),     # store used smoothing window size
     dcc.Store(id = 'store_smoother_flag', data=False),  # store indicator if raw or smoothed data is used for analysis
@@ -83,16 +54,30 @@ stores = html.Div([
     dcc.Store(id = 'store_sample_names'),               # store the names associated to samples
     dcc.Store(id = 'store_sample_names_old'),           # temporary store of old sample names to facilitate renaming
     dcc.Store(id = 'store_sample_locations'),
+    dcc.Store(id = 'store_layout_file'),                # store well labels from an (optional) uploaded plate layout file
+    dcc.Store(id = 'store_plate_layout'),               # store plate layout (well labels and row/column indices of all samples)
     dcc.Store(id = 'store_upload_flag', data=False),    # store indicator if data has been uploaded, yet
     dcc.Store(id = 'analysis_flag', data=False),        # TODO: redundant, change code and remove
-    dcc.Store(id = 'store_growth_data'),                # store growth parameters as dictionary (operation on it as dataframe)
-    dcc.Store(id = 'store_growth_data_auto'),           # temporary store of growth parameters found by automatic growth curve analysis (as dictionary, operation on it as dataframe)
+    dcc.Store(id = 'store_growth_data'),                # store growth parameters as columnar table (see results_table)
+    dcc.Store(id = 'store_growth_data_auto'),           # temporary store of growth parameters found by automatic growth curve analysis (columnar table, see results_table)
     dcc.Store(id = 'store_gd_by_replicates'),           # store summarizing replicate growth data
+    dcc.Store(id = 'store_heatmap_values'),             # store values currently shown in plate heat map (to update only changed wells)
     dcc.Store(id = 'store_default_blanks'),             # store of set of default blanks
     dcc.Store(id = 'store_default_popsizemeasure', data=ds.default_pop_size_measure),   # string to format axes of plots with the correct population size measured used in data
     dcc.Store(id = 'store_auto_fit_ws', data=ds.auto_fit_default_ws),
     dcc.Store(id = 'store_auto_fit_slope_range', data=ds.auto_fit_default_sr),
-    dcc.Store(id = 'store_auto_fit_r2_var_weight', data=ds.auto_fit_default_weight)
+    dcc.Store(id = 'store_auto_fit_r2_var_weight', data=ds.auto_fit_default_weight),
+    dcc.Store(id = 'store_window_size_algorithms', data=ds.window_size_algorithms),    # fitting algorithms using the window size setting
+    dcc.Store(id = 'store_figure_session'),             # id of the sample figure cache of this session (see figure_cache)
+    dcc.Store(id = 'store_stream_session'),             # id of the live session (growing csv export or /stream API), None for uploaded files
+    dcc.Store(id = 'store_stream_n_points', data=0),    # number of time points of the live session already added to store_data_df
+    dcc.Interval(id = 'interval_stream', interval=ds.stream_poll_interval, disabled=True),
+    dcc.Store(id = 'store_autofit_job'),                # id and ticket of the running autofit job (see worker/jobs.py)
+    dcc.Interval(id = 'interval_autofit', interval=ds.job_poll_interval, disabled=True),
+    dcc.Store(id = 'store_sample_fit_job'),             # id and ticket of the running fit of the displayed sample
+    dcc.Interval(id = 'interval_sample_fit', interval=ds.job_poll_interval, disabled=True),
+    dcc.Store(id = 'store_export_job'),                  # id and ticket of the running export of the analysis (download)
+    dcc.Interval(id = 'interval_export', interval=ds.job_poll_interval, disabled=True),
     ])
 
 ############
@@ -138,6 +123,43 @@ upload_div = dbc.Collapse([
                                             'margin-bottom': '2em',
                                             }
                                     ),
+                            dbc.Row(
+                                    dcc.Upload(id='upload_layout', max_size=1e6,
+                                                children=html.Div([
+                                                                    ms.upload_layout_area
+                                                                    ],
+                                                                    style={
+                                                                            'line-height': '3em',   # vertically align text
+                                                                            }
+                                                                    ),
+                                                style={
+                                                        'width': '100%',
+                                                        'borderWidth': '1px',
+                                                        'borderStyle': 'dashed',
+                                                        'borderRadius': '5px',
+                                                        'textAlign': 'center',
+                                                        'display': 'inline-block',
+                                                        'height': '3em',
+                                                        },
+                                                ),
+                                    style = {
+                                            'margin-right': '20em',
+                                            'margin-left': '20em',
+                                            'margin-bottom': '2em',
+                                            }
+                                    ),
+                            dbc.Row(
+                                    dbc.InputGroup([
+                                                    dbc.Input(id='input_stream_source', placeholder=ms.stream_source_placeholder, type='text'),
+                                                    dbc.Button('Connect', id='button_stream_connect', color='secondary'),
+                                                    ]),
+                                    style = {
+                                            'margin-right': '20em',
+                                            'margin-left': '20em',
+                                            'margin-bottom': '2em',
+                                            }
+                                    ),
+                            html.Div(id='upload_layout_alert_area'),
                             html.Div(id='upload_alert_area'),   # error messages during upload are sent to this div
 
                             dbc.Row([
@@ -308,6 +330,22 @@ additional_input = html.Div([
                                                 target='button_auto_fit', 
                                                 placement='bottom'
                                                 ),
+                                     html.I(
+                                            id='button_fit_sample', 
+                                            className='bi bi-bullseye', 
+                                            style={
+                                                    'color': 'darkslategray',
+                                                    'font-size':'15pt', 
+                                                    'display': 'inline-block', 
+                                                    'width': '8%','padding': '0', 
+                                                    'margin-top': '5px', 
+                                                    'text-align':'center'}
+                                            ),
+                                     dbc.Tooltip(
+                                                ms.tooltip_fit_sample_button,
+                                                target='button_fit_sample', 
+                                                placement='bottom'
+                                                ),
                                      html.Div(
                                                 dcc.Dropdown(ds.fittings_algorithms, 
                                                 value=ds.default_fitting_algorithm, 
@@ -318,7 +356,7 @@ additional_input = html.Div([
                                                         'margin-top': '1px'}
                                                 ), 
                                                 style={
-                                                        'width': '52%', 
+                                                        'width': '44%', 
                                                         'padding-right': 0
                                                         }
                                         ),
@@ -440,6 +478,26 @@ settings_div = [
                                 width=4
                                 ),
                         dbc.Col([
+                                html.B('Bootstrap resamples:'),
+                                dcc.Input(id='input_bootstrap_resamples', 
+                                          type='number',
+                                          min=0,
+                                          step=1,
+                                          value=ds.default_bootstrap_resamples,
+                                          style={
+                                                  'margin-left': '10px', 
+                                                  'width':'40%'
+                                                  }),
+                                html.I(id='info_bootstrap_resamples', 
+                                       className='bi bi-info-circle-fill', 
+                                       style={
+                                            'color': 'darkslategray', 
+                                            'margin-left':'10px',
+                                            },
+                                        ),
+                                dbc.Tooltip(ms.tooltip_bootstrap_resamples, 
+                                            target='info_bootstrap_resamples',
+                                        ),
                                 # html.B('Window size: ', 
                                 #        style={
                                 #                 'display': 'inline-block', 
@@ -495,6 +553,30 @@ settings_div = [
                                 width=4
                                 ),
                         dbc.Col([
+                                html.B('Fit loss:'),
+                                html.Div(
+                                        dcc.Dropdown(ds.fit_losses,
+                                                     value=ds.default_fit_loss,
+                                                     id='dropdown_fit_loss',
+                                                     clearable=False,
+                                                     ),
+                                        style={
+                                                'display': 'inline-block',
+                                                'vertical-align': 'middle',
+                                                'margin-left': '10px',
+                                                'width':'40%'
+                                                }
+                                        ),
+                                html.I(id='info_fit_loss', 
+                                       className='bi bi-info-circle-fill', 
+                                       style={
+                                            'color': 'darkslategray', 
+                                            'margin-left':'10px',
+                                            },
+                                        ),
+                                dbc.Tooltip(ms.tooltip_fit_loss, 
+                                            target='info_fit_loss',
+                                        ),
                                 # html.B('Slope range: ', 
                                 #         style={
                                 #                 'display': 'inline-block', 
@@ -526,10 +608,53 @@ settings_div = [
                         ),
                 dbc.Row([
                         dbc.Col([
+                                html.B('Blank model:'),
+                                html.Div(
+                                        dcc.Dropdown(ds.blank_models,
+                                                     value=ds.default_blank_model,
+                                                     id='dropdown_blank_model',
+                                                     clearable=False,
+                                                     ),
+                                        style={
+                                                'display': 'inline-block',
+                                                'vertical-align': 'middle',
+                                                'margin-left': '45px',
+                                                'width':'52%'
+                                                }
+                                        ),
+                                html.I(id='info_blank_model', 
+                                       className='bi bi-info-circle-fill', 
+                                       style={
+                                            'color': 'darkslategray', 
+                                            'margin-left':'10px',
+                                            },
+                                        ),
+                                dbc.Tooltip(ms.tooltip_blank_model, 
+                                            target='info_blank_model',
+                                        )
                                 ], 
                                 width=4
                                 ),
                         dbc.Col([
+                                html.B('Loss scale:'),
+                                dcc.Input(id='input_fit_loss_scale', 
+                                          type='number',
+                                          min=0,
+                                          value=ds.default_fit_loss_scale,
+                                          style={
+                                                  'margin-left': '10px', 
+                                                  'width':'40%'
+                                                  }),
+                                html.I(id='info_fit_loss_scale', 
+                                       className='bi bi-info-circle-fill', 
+                                       style={
+                                            'color': 'darkslategray', 
+                                            'margin-left':'10px',
+                                            },
+                                        ),
+                                dbc.Tooltip(ms.tooltip_fit_loss_scale, 
+                                            target='info_fit_loss_scale',
+                                        ),
                                 # html.B('Weight: ', 
                                 #         style={
                                 #                 'display': 'inline-block', 
@@ -585,6 +710,10 @@ sample_blanked_graph = dcc.Graph(id='fig_blanked', config=ax.graph_config('sampl
 sample_log_graph = dcc.Graph(id='fig_log', config=ax.graph_config('sample_blanked_log'))
 
 
+# plate heat map
+plate_heatmap_graph = dcc.Graph(id='fig_plate_heatmap', config=ax.graph_config('plate'), style={'height': '25em'})
+
+
 # analysis graphs
 dt_graph = dcc.Graph(id='fig_dt', config=ax.graph_config('doubling time'))
 mu_graph = dcc.Graph(id='fig_mu', config=ax.graph_config('growth rate'))
@@ -849,6 +978,30 @@ sample_data_div = dbc.Collapse([
                         style={'margin-top': '6em'}
                         )
                 ]),
+        # plate view of fitted growth parameters (only for data in plate format)
+        dbc.Row([
+                dbc.Collapse([
+                            html.Hr(style={'margin-top': '30px', 'margin-bottom': '20px'}),
+                            dbc.Row([
+                                    dbc.Col([
+                                            html.B('Plate view:'),
+                                            dcc.Dropdown(list(ds.heatmap_parameters),
+                                                        value=ds.default_heatmap_parameter,
+                                                        id='dropdown_heatmap_parameter',
+                                                        clearable=False,
+                                                        style={'margin-top': '5px'}
+                                                        ),
+                                            ],
+                                            width=2,
+                                            style={'margin-top': '3em'}
+                                            ),
+                                    dbc.Col(plate_heatmap_graph, width=10),
+                                    ]),
+                            ],
+                            is_open=False,
+                            id='plate_heatmap_div'
+                            )
+                ]),
         # summary graphs of all analyzed samples
         dbc.Row([
                 dbc.Collapse([
@@ -879,7 +1032,7 @@ sample_data_div = dbc.Collapse([
 
 
 # master layout
-app.layout = html.Div(
+layout = html.Div(
     [
     stores,      # stores need to be inside html.Div
     upload_div,
@@ -894,106 +1047,162 @@ app.layout = html.Div(
 ################################################
 # callbacks
 ################################################
-@app.callback(
+@callback(
     Output('store_data_df', 'data'),
+    Output('store_plate_meta', 'data'),
     Output('div_upload_collapsible', 'is_open'),
     Output('store_upload_flag', 'data'),
     Output('upload_alert_area', 'children'),
     Output('upload', 'contents'),   # needs to reset to None after each upload to support uploading the same file twice (happens if the initial upload contained errors)
     Output('upload', 'filename'),   # see line above (https://github.com/plotly/dash-core-components/issues/816#issuecomment-1032635061)
+    Output('store_stream_session', 'data'),
+    Output('store_stream_n_points', 'data'),
+    Output('interval_stream', 'disabled'),
     Input('upload', 'contents'),
     Input('upload', 'filename'),
+    Input('button_stream_connect', 'n_clicks'),
+    State('input_stream_source', 'value'),
     State('store_upload_flag', 'data'),
+    State('store_layout_file', 'data'),
     prevent_initial_call=True
 )
-def load_data_page(contents, filename, upload_flag):
+def load_data_page(contents, filename, stream_clicks, stream_source, upload_flag, layout_file):
+    import data_transport as dt
+
     # handle and format uploaded data
-    if contents is None:
-        return dash.no_update, dash.no_update, dash.no_update, dash.no_update, None, None
+    no_stream = (None, 0, True)
+    if dash.callback_context.triggered[0]['prop_id'] == 'button_stream_connect.n_clicks':
+        # connect to a live session, new time points are added by stream_new_points()
+        # csv exports are only watched inside the watch directory (see default_settings.stream_watch_dir)
+        stream_source = (stream_source or '').strip()
+        try:
+            csv_path = st.watch_path(stream_source)
+            if csv_path is not None:
+                session = st.watch_csv(csv_path)
+            else:
+                session = st.get_session(stream_source)
+        except st.SessionLimitReached:
+            upload_alert = ax.generate_alert(ms.error_stream_limit)
+            return (dash.no_update, dash.no_update, dash.no_update, dash.no_update, upload_alert, None, None) + no_stream
+        except Exception:
+            session = None
+        if session is None:
+            upload_alert = ax.generate_alert(ms.error_stream_source)
+            return (dash.no_update, dash.no_update, dash.no_update, dash.no_update, upload_alert, None, None) + no_stream
+        if session.n == 0:
+            upload_alert = ax.generate_alert(ms.error_stream_empty)
+            return (dash.no_update, dash.no_update, dash.no_update, dash.no_update, upload_alert, None, None) + no_stream
+        df = session.to_dataframe()
+        stream = (session.session_id, df.shape[1], False)
+
+    elif contents is None:
+        return (dash.no_update, dash.no_update, dash.no_update, dash.no_update, dash.no_update, None, None) + no_stream
 
     else:
         # load data
         content_type, content_string = contents.split(',')
         decoded = base64.b64decode(content_string)
-
-        if filename.split('.')[-1] == 'csv':
-            df = pd.read_csv(io.StringIO(decoded.decode('utf-8')), sep=';')
-        elif (filename.split('.')[-1] == 'xlsx') or (filename.split('.')[-1] == '.xls'):
-            df = pd.read_excel(decoded)
-        else:
-            upload_alert = ax.generate_alert(ms.error_upload_file)
-            return dash.no_update, dash.no_update, dash.no_update, upload_alert, None, None
-
-        # check if entries can be cast to float
         try:
-            df.iloc[:, 1:].astype(float)
-            df.columns[1:].astype(float)
-        except:
-            upload_alert = ax.generate_alert(ms.error_upload_duplicate_t_non_float)
-            print('xxx')
-            return dash.no_update, dash.no_update, dash.no_update, upload_alert, None, None
-
-        # format uploaded data
-        df.set_index(df.iloc[:,0].values, inplace=True)
-        df = df.iloc[:, 1:]
-        df.columns = df.columns.astype(float)
+            df = ax.read_data_file(decoded, filename)
+        except ValueError as e:
+            upload_alert = ax.generate_alert(str(e))
+            return (dash.no_update, dash.no_update, dash.no_update, dash.no_update, upload_alert, None, None) + no_stream
+        stream = no_stream
 
 
-        if len(set(df[[not x for x in df.index == '-']].index)) + df[df.index == '-'].shape[0] != df.shape[0]:
-            # check for duplicate sample names
-            upload_alert = ax.generate_alert(ms.error_duplicate_samples)
-            return dash.no_update, dash.no_update, dash.no_update, upload_alert, None, None
-    return df.to_dict('tight'), False, True, '', None, None
+    if ax.has_duplicate_samples(df):
+        # check for duplicate sample names
+        upload_alert = ax.generate_alert(ms.error_duplicate_samples)
+        return (dash.no_update, dash.no_update, dash.no_update, dash.no_update, upload_alert, None, None) + no_stream
+
+    if (layout_file is not None) and (len(layout_file) != df.shape[0]):
+        # check if layout file matches the uploaded data
+        upload_alert = ax.generate_alert(ms.error_layout_length)
+        return (dash.no_update, dash.no_update, dash.no_update, dash.no_update, upload_alert, None, None) + no_stream
+    return (dt.frame_for_store(df), ax.plate_meta(df, layout_file), False, True, '', None, None) + stream
+
+
+@callback(
+    Output('store_layout_file', 'data'),
+    Output('upload_layout_alert_area', 'children'),
+    Output('upload_layout', 'contents'),
+    Input('upload_layout', 'contents'),
+    State('upload_layout', 'filename'),
+    State('store_upload_flag', 'data'),
+    prevent_initial_call=True
+)
+def load_layout_file(contents, filename, upload_flag):
+    import plate_layout as lay
 
+    # read optional plate layout file mapping data rows to wells
+    if contents is None:
+        return dash.no_update, dash.no_update, None
 
-@app.callback(
+    content_type, content_string = contents.split(',')
+    decoded = base64.b64decode(content_string)
+    try:
+        layout_file = lay.read_layout_file(decoded, filename)
+    except:
+        upload_alert = ax.generate_alert(ms.error_layout_file)
+        return None, upload_alert, None
+    if upload_flag:
+        # sample locations, blanks and growth data of the current data depend on the layout, the layout only takes effect
+        # with the next data upload (see load_data_page())
+        layout_info = dbc.Alert(ms.layout_file_after_data.format(len(layout_file)), color='warning')
+        return layout_file, layout_info, None
+    layout_info = dbc.Alert(ms.layout_file_loaded.format(len(layout_file)), duration=10000, color='secondary')
+    return layout_file, layout_info, None
+
+
+@callback(
                 Output('input_sample_name', 'value'),
                 Output('store_sample_names', 'data'),
                 Output('store_sample_names_old', 'data'),
                 Output('message_area_sample_names', 'children'),
                 Output('store_sample_locations', 'data'),
+                Output('store_plate_layout', 'data'),
                 Input('store_sample_idx', 'data'),
                 Input('input_sample_name', 'value'),
                 Input('store_upload_flag', 'data'),
                 State('store_sample_names', 'data'),
-                State('store_data_df', 'data'),
+                State('store_plate_meta', 'data'),
+                State('store_layout_file', 'data'),
                 prevent_initial_call=True
 )
-def update_sample_input_value(sample_idx, new_sample_name, upload_flag, sample_names, df):
+def update_sample_input_value(sample_idx, new_sample_name, upload_flag, sample_names, plate_meta, layout_file):
     # update stored sample names from different inputs
+    import plate_layout as lay
 
     # update on data upload from names stored in uploaded data
     if dash.callback_context.triggered[0]['prop_id'] == 'store_upload_flag.data':
-        df = pd.DataFrame.from_dict(df, orient='tight')
-
         # set default sample names as defined in uploaded data
-        sample_names = []
-        for loc in df.index:
-            sample_names.append(loc)
+        sample_names = list(plate_meta['sample_names'])
 
         # set sample locations
-        sample_locations = ax.set_sample_locations(df)
-        return list(sample_names)[sample_idx], sample_names, sample_names, '', sample_locations
+        plate_layout = lay.generate_plate_layout(plate_meta['n_samples'], layout_file)
+        sample_locations = plate_layout['locations'].tolist()
+        return list(sample_names)[sample_idx], sample_names, sample_names, '', sample_locations, lay.layout_for_store(plate_layout)
 
     # update on page turn
     elif dash.callback_context.triggered[0]['prop_id'] == 'store_sample_idx.data':
         current_sample_name = sample_names[sample_idx]
-        return current_sample_name, dash.no_update, dash.no_update, '', dash.no_update
+        return current_sample_name, dash.no_update, dash.no_update, '', dash.no_update, dash.no_update
 
     # update on new name input
     elif dash.callback_context.triggered[0]['prop_id'] == 'input_sample_name.value':
-        df = pd.DataFrame.from_dict(df, orient='tight')
         # check for duplicate sample names
         if new_sample_name in sample_names:
             alert_sn = ax.generate_alert(ms.error_duplicate_sample)
-            return sample_names[sample_idx], dash.no_update, dash.no_update, alert_sn, dash.no_update
+            return sample_names[sample_idx], dash.no_update, dash.no_update, alert_sn, dash.no_update, dash.no_update
         else:
             sample_names_old = sample_names.copy()
             sample_names[sample_idx] = new_sample_name
-            return new_sample_name, sample_names, sample_names_old, '', dash.no_update
+            return new_sample_name, sample_names, sample_names_old, '', dash.no_update, dash.no_update
 
 
-@app.callback(
+# change displayed sample with different inputs (client-side, see assets/clientside.js)
+clientside_callback(
+                ClientsideFunction(namespace='growthdash', function_name='change_sample'),
                 Output('store_sample_idx', 'data'),
                 Output('current_sample_name', 'options'),
                 Output('current_sample_name', 'value'),
@@ -1006,10 +1215,11 @@ def update_sample_input_value(sample_idx, new_sample_name, upload_flag, sample_n
                 Input('fig_doublings', 'clickData'),
                 Input('fig_doublings_log', 'clickData'),
                 Input('fig_yield', 'clickData'),
+                Input('fig_plate_heatmap', 'clickData'),
                 Input('current_sample_name', 'value'),
                 State('store_sample_names', 'data'),
                 State('store_sample_idx', 'data'),
-                State('store_data_df', 'data'),
+                State('store_plate_meta', 'data'),
                 State('fig_dt', 'hoverData'),
                 State('fig_mu', 'hoverData'),
                 State('fig_lt', 'hoverData'),
@@ -1018,75 +1228,9 @@ def update_sample_input_value(sample_idx, new_sample_name, upload_flag, sample_n
                 State('fig_yield', 'hoverData'),
                 prevent_initial_call=True
 )
-def change_sample(f_clicks, b_clicks, upload_flag, 
-                    fig_dt_click, fig_mu_click, fig_lt_click, fig_doublings_click, fig_doublings_log_click, fig_yield_click, 
-                    selected_sample_name, sample_names, sample_idx, df, 
-                    fig_dt_hover, fig_mu_hover, fig_lt_hover, fig_doublings_hover, fig_doublings_log_hover, fig_yield_hover,
-                ):
-    # change displayed sample with different inputs
-    df = pd.DataFrame.from_dict(df, orient='tight')
 
-    
-    if dash.callback_context.triggered[0]['prop_id'] == 'store_upload_flag.data':
-        # at data upload set sample_idx such that the first sample is displayed that's not been defined as 'to skip'
-        sample_names = df.index.to_list()
-        sample_idx = np.argmax(np.array(sample_names) != '-')
-    elif dash.callback_context.triggered[0]['prop_id'] == 'backbutton.n_clicks':
-        # go to the previous sample
-        sample_idx_0 = sample_idx
-
-        sample_idx -= 1
-
-        while sample_names[sample_idx] == '-':
-            sample_idx -= 1
-
-        if sample_idx < 0:
-            sample_idx = sample_idx_0
-
-    elif dash.callback_context.triggered[0]['prop_id'] == 'forwardbutton.n_clicks':
-        # go to the next sample
-        sample_idx_0 = sample_idx
-        sample_idx += 1
-
-        while sample_names[sample_idx] == '-':
-            sample_idx += 1
-
-        if sample_idx >= df.shape[0]:
-            sample_idx = sample_idx_0
-
-    # when clicking on datapoint in summary plots, jump to sample in data display section
-    elif dash.callback_context.triggered[0]['prop_id'] == 'fig_dt.clickData':
-        clicked_sample_name = fig_dt_hover['points'][0]['hovertext']
-        sample_idx = sample_names.index(clicked_sample_name)
-    elif dash.callback_context.triggered[0]['prop_id'] == 'fig_mu.clickData':
-        clicked_sample_name = fig_mu_hover['points'][0]['hovertext']
-        sample_idx = sample_names.index(clicked_sample_name)
-    elif dash.callback_context.triggered[0]['prop_id'] == 'fig_lt.clickData':
-        clicked_sample_name = fig_lt_hover['points'][0]['hovertext']
-        sample_idx = sample_names.index(clicked_sample_name)
-    elif dash.callback_context.triggered[0]['prop_id'] == 'fig_doublings.clickData':
-        clicked_sample_name = fig_doublings_hover['points'][0]['hovertext']
-        sample_idx = sample_names.index(clicked_sample_name)
-    elif dash.callback_context.triggered[0]['prop_id'] == 'fig_doublings_log.clickData':
-        clicked_sample_name = fig_doublings_log_hover['points'][0]['hovertext']
-        sample_idx = sample_names.index(clicked_sample_name)
-    elif dash.callback_context.triggered[0]['prop_id'] == 'fig_yield.clickData':
-        clicked_sample_name = fig_yield_hover['points'][0]['hovertext']
-        sample_idx = sample_names.index(clicked_sample_name)
-
-
-    # change sample on selection from drop down menu
-    elif dash.callback_context.triggered[0]['prop_id'] == 'current_sample_name.value':
-        sample_idx = sample_names.index(selected_sample_name)
-
-
-    # format drop down menu with currently selected sample
-    current_sample_name = sample_names[sample_idx]
-    sample_names_out = [x for x in sample_names if x != '-']
-    return sample_idx, sample_names_out, current_sample_name
-
-
-@app.callback(
+
+@callback(
                 Output('blanks_input', 'value'),
                 Output('store_blank_locs', 'data'),
                 Output('default_blanks_input', 'value'),
@@ -1099,26 +1243,20 @@ def change_sample(f_clicks, b_clicks, upload_flag,
                 Input('store_sample_names', 'data'),
                 Input('store_sample_names_old', 'data'),
                 State('store_blank_locs', 'data'),
-                State('store_data_df', 'data'),
-                State('store_data_df_smoothed', 'data'),
-                State('store_smoother_flag', 'data'),
+                State('store_plate_meta', 'data'),
                 State('store_default_blanks', 'data'),
 
                 prevent_initial_call=True
 )
-def update_blanks(new_blanks, input_default_blanks, sample_idx, upload_flag, sample_names, sample_names_old, blank_locs, df, df_smoothed, smoother_flag, default_blanks):
+def update_blanks(new_blanks, input_default_blanks, sample_idx, upload_flag, sample_names, sample_names_old, blank_locs, plate_meta, default_blanks):
+    import numpy as np
+
     if dash.callback_context.triggered[0]['prop_id'] == 'store_upload_flag.data':
         # initialize blanks on data upload
-
-        if smoother_flag == False:
-            df = pd.DataFrame.from_dict(df, orient='tight')
-        else:
-            df = pd.DataFrame.from_dict(df_smoothed, orient='tight')
-        
-        sample_locations = ax.set_sample_locations(df)
+        sample_locations = plate_meta['sample_locations']
         blank_locs = {}
 
-        sample_names = df.index.to_list()
+        sample_names = plate_meta['sample_names']
         for loc in sample_locations:
             blank_locs[loc] = np.array(sample_names)[np.array(sample_names) != '-'][:3]
 
@@ -1198,7 +1336,7 @@ def update_blanks(new_blanks, input_default_blanks, sample_idx, upload_flag, sam
 
 
 
-@app.callback(
+@callback(
                 Output('fig_overview', 'figure'),
                 Input('store_sample_names', 'data'),
                 Input('store_smoother_flag', 'data'),
@@ -1210,14 +1348,20 @@ def update_blanks(new_blanks, input_default_blanks, sample_idx, upload_flag, sam
                 prevent_initial_call=True,
 )
 def show_overview(sample_names, smoother_flag, blank_locs, upload_flag, pop_size_measure, df, df_smoothed):
+    import numpy as np
+    import plotly.graph_objects as go
+    from plotly.colors import sample_colorscale
+    from plotly.subplots import make_subplots
+    import plate_cache as pc
+
     if df is None:
         return dash.no_update
     
     # reconstruct pandas df from store
     if smoother_flag == False:
-        df = pd.DataFrame.from_dict(df, orient='tight')
+        df = pc.frame_from_store(df)
     else:
-        df = pd.DataFrame.from_dict(df_smoothed, orient='tight')
+        df = pc.frame_from_store(df_smoothed)
     if dash.callback_context.triggered[0]['prop_id'] != 'store_upload_flag.data':
         df.index = sample_names
 
@@ -1307,40 +1451,15 @@ def show_overview(sample_names, smoother_flag, blank_locs, upload_flag, pop_size
 
 
 
-@app.callback(
-                Output('fig_blanks', 'figure'),
-                Output('fig_sample', 'figure'),
-                Output('fig_blanked', 'figure'),
-                Output('fig_log', 'figure'),
-                Output('current_sample_position', 'children'),
-                Output('collapse_data', 'is_open'),
-                Input('store_sample_idx', 'data'),
-                Input('store_blank_locs', 'data'),
-                Input('store_upload_flag', 'data'),
-                Input('store_sample_names', 'data'),
-                Input('store_growth_data', 'data'),
-                Input('store_smoother_flag', 'data'),
-                Input('store_default_popsizemeasure', 'data'),
-                State('store_data_df', 'data'),
-                State('store_data_df_smoothed', 'data'),
-                State('store_sample_locations', 'data'),
-                
-                prevent_initial_call=True,
-
-)
-def show_data(sample_idx, blank_locs, upload_flag, sample_names, growth_data, smoother_flag, pop_size_measure, df, df_smoothed, sample_locations):
-    # plot data of the currently selected sample
-    if df is None:
-        return dash.no_update, dash.no_update, dash.no_update, dash.no_update, dash.no_update, dash.no_update
-
-    # reconstruct pandas df from store
-    if smoother_flag == False:
-        df = pd.DataFrame.from_dict(df, orient='tight')
-    else:
-        df = pd.DataFrame.from_dict(df_smoothed, orient='tight')
-
-    if dash.callback_context.triggered[0]['prop_id'] != 'store_upload_flag.data':
-        df.index = sample_names
+def sample_figures(sample_idx, df, blanks_mean_all, df_blanked, blank_locs, sample_locations, blank_model, growth_data_sp, pop_size_measure):
+    '''
+        Figures of one sample: blanks, raw data, blanked data and blanked data on log-scale
+        - df, blanks_mean_all, df_blanked: plate data, background and blanked data of all samples (see blanking.blanked_plate())
+        - growth_data_sp: growth parameters of the sample (see results_table.sample_row())
+    '''
+    import numpy as np
+    import plotly.graph_objects as go
+    import analysis_core as ac
 
     # time points
     t = df.columns.tolist()
@@ -1348,24 +1467,25 @@ def show_data(sample_idx, blank_locs, upload_flag, sample_names, growth_data, sm
     # sample position
     current_sample_position = sample_locations[sample_idx]
 
-    # sample name
-    current_sample_name = sample_names[sample_idx]
-
-    
 
     ##########
     # blanks graph
     ##########
     # display the blanks associated with the current sample
-    blanks = blank_locs[current_sample_position]
-    data_blanks = []
+    blanks_mean = blanks_mean_all.iloc[sample_idx]
 
-    for b in blanks:
-        data_blanks.append(go.Scatter(x=t, y=df.loc[b], name=b))
+    if blank_model == 'Selected blanks':
+        blanks = blank_locs[current_sample_position]
+        data_blanks = []
 
-    # display mean of all selected blanks (mean of blanks is subtracted from sample trace)
-    blanks_mean = df.loc[blanks].mean(axis=0)
-    data_blanks.append(go.Scatter(x=t, y=blanks_mean, name='blanks averaged'))
+        for b in blanks:
+            data_blanks.append(go.Scatter(x=t, y=df.loc[b], name=b))
+
+        # display mean of all selected blanks (mean of blanks is subtracted from sample trace)
+        data_blanks.append(go.Scatter(x=t, y=blanks_mean, name='blanks averaged'))
+    else:
+        # display background of the current sample computed from all blank wells
+        data_blanks = [go.Scatter(x=t, y=blanks_mean, name=blank_model.lower())]
     annotations_blank = [{'text': '<b>Blanks</b>', 'font_size': 22, 'textangle': -90, 'align':'center',
                           'showarrow': False,
                           'x': -0.4, 'xref': 'paper', 'xanchor': 'center', 
@@ -1424,21 +1544,21 @@ def show_data(sample_idx, blank_locs, upload_flag, sample_names, growth_data, sm
     # sample blanked graph
     ##########
     # display the trace of the currently selected blanked sample
-    sample_trace = df.iloc[sample_idx]
-    sample_trace_blanked = sample_trace - blanks_mean
-    sample_name = growth_data[current_sample_position]['sample_name']
+    sample_trace_blanked = df_blanked.iloc[sample_idx]
+    sample_name = growth_data_sp['sample_name']
 
     data_blanked = [go.Scatter(x=t, y=sample_trace_blanked, line={'color':'rgb(44, 105, 154)', 'width':3}, name=sample_name)]
 
     # add fitted trace, if computed
-    fitting_algorithm = growth_data[current_sample_position]['fitting_mode']
+    fitting_algorithm = growth_data_sp['fitting_mode']
+    fitted = (fitting_algorithm is not None) and not np.isnan(growth_data_sp['mumax'])
     
-    if (fitting_algorithm != 'NaN') and (growth_data[current_sample_position]['mumax'] != 'NaN'):
+    if fitted:
         # fitted trace
-        t_fit, y_fit = ax.generate_fitted_curve(t, fitting_algorithm, growth_data[current_sample_position])
+        t_fit, y_fit = ac.generate_fitted_curve(t, fitting_algorithm, growth_data_sp)
 
         # add start/end of log-phase overlay to plot
-        x_0, y_0, x_1, y_1, hovertext_start, hovertext_end = ax.generate_start_end_logphase_indicator_lines(fitting_algorithm, growth_data[current_sample_position], sample_trace_blanked)
+        x_0, y_0, x_1, y_1, hovertext_start, hovertext_end = ax.generate_start_end_logphase_indicator_lines(fitting_algorithm, growth_data_sp, sample_trace_blanked)
 
 
         scatter_fit = go.Scatter(x=t_fit, y=y_fit, line={'color': 'rgb(242, 158, 76)', 'width': 3}, name='fit')
@@ -1516,13 +1636,26 @@ def show_data(sample_idx, blank_locs, upload_flag, sample_names, growth_data, sm
 
 
     # add exponential fit log growth, if already computed and beginning and end of log phase
-    if (fitting_algorithm != 'NaN') and (growth_data[current_sample_position]['mumax'] != 'NaN'):
+    if fitted:
         data_log.append(go.Scatter(x=t_fit, y=y_fit, 
                                    line={'color': 'rgb(242, 158, 76)', 'width': 3}, 
                                    name='fit')
                         )
         data_log.append(scatter_log_start)
         data_log.append(scatter_log_end)
+
+        # highlight outliers of robust fits (data points with low weight)
+        point_weights = growth_data_sp['point_weights']
+        if point_weights is not None:
+            outliers = point_weights < ds.outlier_weight_threshold
+            if outliers.any():
+                data_log.append(go.Scatter(x=np.array(t)[outliers], y=sample_trace_blanked_log[outliers],
+                                           mode='markers',
+                                           marker={'color': 'rgb(214, 39, 40)', 'size': 10, 'symbol': 'x'},
+                                           hoverinfo='text',
+                                           hovertext=['outlier (weight {:.2f})'.format(w) for w in point_weights[outliers]],
+                                           name='outliers')
+                                )
     
     # layout
     if sample_trace_blanked.max() > 0:
@@ -1568,62 +1701,302 @@ def show_data(sample_idx, blank_locs, upload_flag, sample_names, growth_data, sm
                             )
     fig_log = go.Figure(data=data_log, layout=layout_log)
     
-    # add image to exclude sample button
-    if growth_data[current_sample_position]['excluded_flag'] == False:
-        img = Image.open('./assets/x-circle.png')
+    # add image to exclude sample button (served as static asset, not embedded in the figure)
+    if growth_data_sp['excluded_flag'] == False:
+        img = dash.get_asset_url('x-circle.png')
     else:
-        img = Image.open('./assets/x-circle-fill.png')
+        img = dash.get_asset_url('x-circle-fill.png')
     fig_log.add_layout_image({'source':img, 'x':0.075, 'y':0.925, 
                                     'xref': 'x2', 'yref':'y2',
                                     'xanchor': 'center', 'yanchor': 'middle',
                                     'sizex': 0.075, 'sizey': 0.075,
                                 })
+    return fig_blanks, fig_sample, fig_blanked, fig_log
+
+
+def neighbour_samples(sample_names, sample_idx):
+    # samples shown next by the forward and back buttons (samples to skip ('-') are jumped over)
+    following = [i for i in range(sample_idx + 1, len(sample_names)) if sample_names[i] != '-'][:1]
+    previous = [i for i in range(sample_idx - 1, -1, -1) if sample_names[i] != '-'][:1]
+    return following + previous
+
+
+@callback(
+                Output('store_figure_session', 'data'),
+                Input('store_upload_flag', 'data'),
+                State('store_figure_session', 'data'),
+                prevent_initial_call=True,
+)
+def start_figure_session(upload_flag, session_id):
+    # id of the sample figure cache of this browser session (see figure_cache)
+    if session_id is None:
+        return uuid.uuid4().hex
+    return dash.no_update
+
+
+@callback(
+                Output('fig_blanks', 'figure'),
+                Output('fig_sample', 'figure'),
+                Output('fig_blanked', 'figure'),
+                Output('fig_log', 'figure'),
+                Output('current_sample_position', 'children'),
+                Output('collapse_data', 'is_open'),
+                Input('store_sample_idx', 'data'),
+                Input('store_blank_locs', 'data'),
+                Input('store_upload_flag', 'data'),
+                Input('store_sample_names', 'data'),
+                Input('store_growth_data', 'data'),
+                Input('store_smoother_flag', 'data'),
+                Input('store_default_popsizemeasure', 'data'),
+                Input('dropdown_blank_model', 'value'),
+                State('store_data_df', 'data'),
+                State('store_data_df_smoothed', 'data'),
+                State('store_sample_locations', 'data'),
+                State('store_plate_layout', 'data'),
+                State('store_figure_session', 'data'),
+                State('store_plate_meta', 'data'),
+                State('store_smoother_value', 'data'),
+                
+                prevent_initial_call=True,
+
+)
+def show_data(sample_idx, blank_locs, upload_flag, sample_names, growth_data, smoother_flag, pop_size_measure, blank_model, df, df_smoothed, sample_locations, plate_layout, session_id, plate_meta, smoother_ws):
+    import plate_layout as lay
+    import blanking as blk
+    import results_table as rt
+    import plate_cache as pc
+
+    # plot data of the currently selected sample, figures are cached per session and the neighbouring samples are prefetched
+    if (df is None) or (growth_data is None) or (plate_meta is None):
+        return dash.no_update, dash.no_update, dash.no_update, dash.no_update, dash.no_update, dash.no_update
+
+    # raw or smoothed data
+    if smoother_flag == False:
+        df_data = df
+    else:
+        df_data = df_smoothed
+    if dash.callback_context.triggered[0]['prop_id'] != 'store_upload_flag.data':
+        index_names = sample_names
+    else:
+        index_names = plate_meta['sample_names']
+
+    # sample position
+    current_sample_position = sample_locations[sample_idx]
+
+    # figures depend on the plate data and blanks (data version) and on the growth parameters of the sample (fit version)
+    growth_data = rt.table_from_store(growth_data)
+    data_version = fc.version(plate_meta['hash'], smoother_flag, smoother_ws, index_names, blank_locs, blank_model, plate_layout, pop_size_measure)
+    def figure_key(idx):
+        sp = sample_locations[idx]
+        return fc.figure_key(sp, data_version, fc.version(rt.sample_row(growth_data, sp)))
+
+    # plate data and blanked data, only computed if figures have to be built
+    plate = {}
+    def build(idx):
+        if len(plate) == 0:
+            plate['df'] = pc.frame_from_store(df_data)
+            plate['df'].index = index_names
+            layout = None if plate_layout is None else lay.layout_from_store(plate_layout)
+            plate['blanks_mean'], plate['df_blanked'] = blk.blanked_plate(plate['df'], blank_locs, sample_locations, blank_model, layout)
+        return sample_figures(idx, plate['df'], plate['blanks_mean'], plate['df_blanked'], blank_locs, sample_locations, blank_model,
+                              rt.sample_row(growth_data, sample_locations[idx]), pop_size_measure)
+
+    key = figure_key(sample_idx)
+    figures = fc.get(session_id, key)
+    if figures is None:
+        figures = build(sample_idx)
+        fc.put(session_id, key, figures)
+    fig_blanks, fig_sample, fig_blanked, fig_log = figures
+
+    # figures of the next and previous sample are built in the background
+    neighbours = {figure_key(idx): idx for idx in neighbour_samples(index_names, sample_idx)}
+    fc.prefetch(session_id, list(neighbours), lambda key: build(neighbours[key]))
+
     return fig_blanks, fig_sample, fig_blanked, fig_log, current_sample_position, True
 
 
-@app.callback(
+# reset click value, else multiple clicks in plot are not possible
+clientside_callback(
+    ClientsideFunction(namespace='growthdash', function_name='reset_click'),
     Output('fig_log', 'clickData'),
     Input('fig_log', 'clickData')
 )
-def reset_click(click):
-    # reset click value, else multiple clicks in plot are not possible
-    return None
+
+
+def get_heatmap_values(growth_data, voi):
+    import numpy as np
+
+    # values of one growth parameter for all samples (excluded samples and samples without fit are shown as empty wells)
+    return np.where(growth_data['excluded_flag'], np.nan, growth_data[voi])
+
+
+@callback(
+                Output('fig_plate_heatmap', 'figure'),
+                Output('store_heatmap_values', 'data'),
+                Output('plate_heatmap_div', 'is_open'),
+                Input('store_growth_data', 'data'),
+                Input('dropdown_heatmap_parameter', 'value'),
+                Input('store_plate_layout', 'data'),
+                State('store_heatmap_values', 'data'),
+                prevent_initial_call = True
+)
+def show_plate_heatmap(growth_data, parameter, plate_layout, heatmap_values_old):
+    import numpy as np
+    import plotting as pl
+    import plate_layout as lay
+    import results_table as rt
+
+    # plate heat map of the fitted growth parameters, after the initial drawing only the wells that changed are updated
+    if (growth_data is None) or (plate_layout is None):
+        return dash.no_update, dash.no_update, dash.no_update
+
+    growth_data = rt.table_from_store(growth_data)
+    plate_layout = lay.layout_from_store(plate_layout)
+    if (plate_layout['n_rows'] == 0) or (len(plate_layout['row_idx']) != len(growth_data['sample_locations'])):
+        # data not in plate format
+        return dash.no_update, dash.no_update, False
+
+    values = get_heatmap_values(growth_data, ds.heatmap_parameters[parameter])
+    sample_names = list(growth_data['sample_name'])
+    heatmap_values = {'parameter': parameter, 'values': values.tolist(), 'sample_names': sample_names}
+
+    if (dash.callback_context.triggered[0]['prop_id'] == 'store_growth_data.data') and (heatmap_values_old is not None) \
+            and (heatmap_values_old['parameter'] == parameter) and (len(heatmap_values_old['values']) == len(values)):
+        # NaN values are returned as None from the store
+        values_old = np.array(heatmap_values_old['values'], dtype=float)
+        changed_values = ~((values_old == values) | (np.isnan(values_old) & np.isnan(values)))
+        changed_names = np.array(heatmap_values_old['sample_names']) != np.array(sample_names)
+        changed = np.flatnonzero(changed_values | changed_names)
+
+        if changed.shape[0] == 0:
+            return dash.no_update, heatmap_values, True
+
+        elif changed.shape[0] <= ds.heatmap_max_patched_wells:
+            fig_patch = Patch()
+            for i in changed:
+                r = int(plate_layout['row_idx'][i])
+                c = int(plate_layout['col_idx'][i])
+                if r < 0:
+                    continue
+                if changed_values[i]:
+                    fig_patch['data'][0]['z'][r][c] = None if np.isnan(values[i]) else values[i]
+                if changed_names[i]:
+                    fig_patch['data'][0]['text'][r][c] = sample_names[i]
+            return fig_patch, heatmap_values, True
+
+    fig_plate_heatmap = pl.plate_heatmap(plate_layout, values, sample_names, parameter)
+    return fig_plate_heatmap, heatmap_values, True
+
+
+@callback(
+                Output('store_data_df', 'data', allow_duplicate=True),
+                Output('store_plate_meta', 'data', allow_duplicate=True),
+                Output('store_stream_n_points', 'data', allow_duplicate=True),
+                Output('fig_sample', 'extendData'),
+                Output('fig_blanked', 'extendData'),
+                Output('fig_log', 'extendData'),
+                Output('fig_plate_heatmap', 'figure', allow_duplicate=True),
+                Output('store_heatmap_values', 'data', allow_duplicate=True),
+                Input('interval_stream', 'n_intervals'),
+                State('store_stream_session', 'data'),
+                State('store_stream_n_points', 'data'),
+                State('store_sample_idx', 'data'),
+                State('store_sample_names', 'data'),
+                State('store_blank_locs', 'data'),
+                State('store_sample_locations', 'data'),
+                State('dropdown_blank_model', 'value'),
+                State('store_plate_layout', 'data'),
+                State('easy_linear_window_size', 'value'),
+                State('dropdown_heatmap_parameter', 'value'),
+                State('store_smoother_flag', 'data'),
+                prevent_initial_call = True
+)
+def stream_new_points(n_intervals, session_id, n_points, sample_idx, sample_names, blank_locs, sample_locations, blank_model, plate_layout, window_size, heatmap_parameter, smoother_flag):
+    import numpy as np
+    import plotting as pl
+    import plate_layout as lay
+    import data_transport as dt
+
+    # add new time points of a live session to the stored data and the graphs, only the new points are sent to the browser
+    no_update = (dash.no_update,) * 8
+    session = st.get_session(session_id)
+    if (session is None) or (blank_locs is None) or (sample_names is None):
+        return no_update
+    try:
+        session.poll()
+    except (OSError, ValueError):
+        # export is being rewritten, try again on the next poll
+        return no_update
+    if session.n <= n_points:
+        return no_update
+
+    # blanks and growth rates of the new time points (see streaming.StreamingSession)
+    try:
+        ws = int(window_size)
+    except (TypeError, ValueError):
+        ws = ds.default_easy_linear_window_size
+    if plate_layout is not None:
+        plate_layout = lay.layout_from_store(plate_layout)
+    session.configure(sample_names, blank_locs, sample_locations, blank_model, plate_layout, ws)
+
+    t_new = session.t[n_points:].tolist()
+    raw_new = session.raw[:, n_points:]
+    blanked_new = session.blanked(n_points)
+
+    df_patch = dt.append_block(Patch(), t_new, raw_new)
+    meta_patch = Patch()
+    meta_patch['n_timepoints'] = session.n
+    meta_patch['hash'] = ax.plate_hash(session.sample_names, session.t, session.raw)
+
+    if smoother_flag == False:
+        extend_sample = ({'x': [t_new], 'y': [raw_new[sample_idx].tolist()]}, [0])
+        extend_blanked = ({'x': [t_new], 'y': [blanked_new[sample_idx].tolist()]}, [0])
+    else:
+        # graphs show smoothed data, which is only updated on the next smoothing
+        extend_sample = dash.no_update
+        extend_blanked = dash.no_update
+
+    # live Easy Linear growth rates in the plate heat map
+    fig_patch = dash.no_update
+    heatmap_patch = dash.no_update
+    if (heatmap_parameter == 'growth rate') and (plate_layout is not None) and (plate_layout['n_rows'] > 0) \
+            and (len(plate_layout['row_idx']) == len(sample_names)):
+        mu = session.growth_rates()
+        z = pl.plate_matrix(plate_layout, mu)
+        fig_patch = Patch()
+        fig_patch['data'][0]['z'] = np.where(np.isnan(z), None, z).tolist()
+        heatmap_patch = Patch()
+        heatmap_patch['values'] = np.where(np.isnan(mu), None, mu).tolist()
+
+    return df_patch, meta_patch, session.n, extend_sample, extend_blanked, extend_blanked, fig_patch, heatmap_patch
+
+
+def sample_groups(sample_names):
+    import numpy as np
+
+    # group of every sample (sample name without replicate number, e.g. 'glucose_1' -> 'glucose')
+    return np.array([' '.join(re.split('_| ', sn)[:-1]) for sn in sample_names], dtype=object)
 
 
 def get_overlay_dp(growth_data, gd_by_replicates, voi):
-    overlays = {sn: [] for sn in gd_by_replicates}
+    import numpy as np
+
+    # individual values of the included samples of every group
+    groups = sample_groups(growth_data['sample_name'])
+    included = ~growth_data['excluded_flag']
+    overlays = {}
     for sn in gd_by_replicates:
-        for sp in growth_data:
-            sn_full = growth_data[sp]['sample_name']
-
-            # discard excluded samples
-            if growth_data[sp]['excluded_flag'] == True:
-                continue
-
-            if ' '.join(re.split('_| ', sn_full)[:-1]) == sn:
-                if growth_data[sp][voi] == 'NaN':
-                    overlays[sn].append({'name': sn_full, 'value': np.nan})
-                else:
-                    overlays[sn].append({'name': sn_full, 'value': growth_data[sp][voi]})
+        members = np.flatnonzero((groups == sn) & included)
+        overlays[sn] = [{'name': growth_data['sample_name'][i], 'value': growth_data[voi][i]} for i in members]
     return overlays
 
 
 def generate_excluded_dict(growth_data):
-    excluded = {}
-    for i, sp in enumerate(growth_data):
-        sn_full = growth_data[sp]['sample_name']
-        sn = ' '.join(re.split('_| ', sn_full)[:-1])
-        if sn in excluded:
-            continue
-        elif sn == '':
-            # for '-' samples that are supposed to be skipped
-            continue
-        else:
-            excluded[sn] = 0
-    return excluded
+    # groups in order of appearance, '-' samples that are supposed to be skipped have no group
+    return {sn: 0 for sn in sample_groups(growth_data['sample_name']) if sn != ''}
 
 
-@app.callback(
+@callback(
                 Output('fig_mu', 'figure'),
                 Output('fig_dt', 'figure'),
                 Output('fig_lt', 'figure'),
@@ -1642,71 +2015,40 @@ def show_analysis(growth_data, sample_names, pop_size_measure, sample_locations)
     # summarize data by group (usually groups are replicates of the same growth condition)
     # plot growth characteristics of the individual groups together so that different conditions can be easily compared
 
+    import numpy as np
+    import plotting as pl
+    import results_table as rt
+
+    growth_data = rt.table_from_store(growth_data)
+
     # group data by sample name
     gd_by_replicates = {}
     excluded = generate_excluded_dict(growth_data)
-    
-    # summarize data by condition in dict
-    for i, sn_full in enumerate(sample_names):
-        if sn_full in sample_locations + ['-']:
-            # check if sample name has been defined, if not, don't add to analysis
-            continue
-
-        sl = sample_locations[i]
-        sn = ' '.join(re.split('_| ', sn_full)[:-1])
-        if sn not in gd_by_replicates:
-            # initialize dictionary
-            gd_by_replicates[sn] = {}
-            gd_by_replicates[sn]['sample_names'] = []
-            gd_by_replicates[sn]['sample_locs'] = []
-            gd_by_replicates[sn]['mus'] = []
-            gd_by_replicates[sn]['dts'] = []
-            gd_by_replicates[sn]['lts'] = []
-            gd_by_replicates[sn]['doublings'] = []
-            gd_by_replicates[sn]['doublings_log'] = []
-            gd_by_replicates[sn]['yields'] = []
-
-        # discard excluded samples:
-        if growth_data[sl]['excluded_flag'] == True:
-            excluded[sn] += 1
-            continue
-
-        # collect replicate samples
-        gd_by_replicates[sn]['sample_names'].append(sn_full)
-        gd_by_replicates[sn]['sample_locs'].append(sample_locations[i])
-        gd_by_replicates[sn]['mus'].append(growth_data[sl]['mumax'])
-        gd_by_replicates[sn]['dts'].append(growth_data[sl]['dt'])
-        gd_by_replicates[sn]['lts'].append(growth_data[sl]['t0'])
-        gd_by_replicates[sn]['doublings'].append(growth_data[sl]['doublings'])
-        gd_by_replicates[sn]['doublings_log'].append(growth_data[sl]['doublings_log'])
-        gd_by_replicates[sn]['yields'].append(growth_data[sl]['yield'])
-
-    # add data summary statistics
-    for sn in gd_by_replicates:
-        # Dash Stores can't hold np.nan values which is why they are stored as 'NaN' strings and converted here
-        mus = [np.nan if x == 'NaN' else x for x in gd_by_replicates[sn]['mus']]
-        gd_by_replicates[sn]['mu_mean'] = np.nanmean(mus)
-        gd_by_replicates[sn]['mu_std'] = np.nanstd(mus)
 
-        dts = [np.nan if x == 'NaN' else x for x in gd_by_replicates[sn]['dts']]
-        gd_by_replicates[sn]['dt_mean'] = np.nanmean(dts)
-        gd_by_replicates[sn]['dt_std'] = np.nanstd(dts)
+    # samples without defined sample name are not added to analysis
+    groups = sample_groups(sample_names)
+    named = ~np.isin(np.array(sample_names, dtype=object), sample_locations + ['-'])
 
-        lts = [np.nan if x == 'NaN' else x for x in gd_by_replicates[sn]['lts']]
-        gd_by_replicates[sn]['lt_mean'] = np.nanmean(lts)
-        gd_by_replicates[sn]['lt_std'] = np.nanstd(lts)
+    # summarize data by condition in dict, statistics are reductions over the samples of a group
+    for sn in dict.fromkeys(groups[named]):
+        members = named & (groups == sn)
 
-        doublings = [np.nan if x == 'NaN' else x for x in gd_by_replicates[sn]['doublings']]
-        gd_by_replicates[sn]['doublings_mean'] = np.nanmean(doublings)
-        gd_by_replicates[sn]['doublings_std'] = np.nanstd(doublings)
+        # discard excluded samples
+        n_excluded = np.count_nonzero(members & growth_data['excluded_flag'])
+        if n_excluded > 0:
+            excluded[sn] += n_excluded
+        replicates = members & ~growth_data['excluded_flag']
 
-        doublings_log = [np.nan if x == 'NaN' else x for x in gd_by_replicates[sn]['doublings_log']]
-        gd_by_replicates[sn]['doublings_log_mean'] = np.nanmean(doublings_log)
-        gd_by_replicates[sn]['doublings_log_std'] = np.nanstd(doublings_log)
-
-        yields = [np.nan if x == 'NaN' else x for x in gd_by_replicates[sn]['yields']]
-        gd_by_replicates[sn]['yields_mean'] = np.nanmean(yields)
-        gd_by_replicates[sn]['yields_std'] = np.nanstd(yields)
+        gd_by_replicates[sn] = {
+                                'sample_names': np.array(sample_names, dtype=object)[replicates].tolist(),
+                                'sample_locs': np.array(sample_locations, dtype=object)[replicates].tolist(),
+                                }
+        for key, stat, field in [('mus', 'mu', 'mumax'), ('dts', 'dt', 'dt'), ('lts', 'lt', 't0'), ('doublings', 'doublings', 'doublings'),
+                                 ('doublings_log', 'doublings_log', 'doublings_log'), ('yields', 'yields', 'yield')]:
+            values = growth_data[field][replicates]
+            gd_by_replicates[sn][key] = values.tolist()
+            gd_by_replicates[sn][stat + '_mean'] = np.nanmean(values)
+            gd_by_replicates[sn][stat + '_std'] = np.nanstd(values)
 
 
 
@@ -1751,21 +2093,16 @@ def show_analysis(growth_data, sample_names, pop_size_measure, sample_locations)
         return fig_mus, fig_dts, fig_lts, fig_doublings, fig_doublings_log, fig_yields, gd_by_replicates
 
 
-@app.callback(
+clientside_callback(
+                ClientsideFunction(namespace='growthdash', function_name='smoother_ws_tooltip'),
                 Output('tooltip_button_smoother', 'children'),
                 Input('input_smoother_ws', 'value'),
                 Input('store_smoother_flag', 'data'),
                 prevent_initial_call = True,
             )
-def update_smoother_ws_tooltip(smoothing_ws, smoother_flag):
-    if smoother_flag == True:
-        tooltip = 'Use raw data'
-    else:
-        tooltip = 'Smooth data to remove noise using a sliding window of size {}'.format(smoothing_ws)
-    return tooltip
 
 
-@app.callback(
+@callback(
                 Output('store_smoother_flag', 'data'),
                 Output('store_data_df_smoothed', 'data'),
                 Output('button_smoother', 'className'),
@@ -1778,6 +2115,9 @@ def update_smoother_ws_tooltip(smoothing_ws, smoother_flag):
                 prevent_initial_call = True,
 )
 def smooth_data(n_clicks, df, smoother_flag, input_smoother_ws):
+    import data_transport as dt
+    import plate_cache as pc
+
     alert_ws = ax.generate_alert(ms.error_smoother_ws)
     try:
         input_smoother_ws = int(input_smoother_ws)
@@ -1789,10 +2129,10 @@ def smooth_data(n_clicks, df, smoother_flag, input_smoother_ws):
     
     if smoother_flag == False:
         smoother_flag = True
-        df = pd.DataFrame.from_dict(df, orient='tight')
+        df = pc.frame_from_store(df)
         df_smoothed = df.rolling(input_smoother_ws, axis=1, min_periods=1, center=True).mean()
         button_shape = 'bi bi-chevron-up'
-        return smoother_flag, df_smoothed.to_dict('tight'), button_shape, dash.no_update, input_smoother_ws
+        return smoother_flag, dt.frame_for_store(df_smoothed), button_shape, dash.no_update, input_smoother_ws
     else:
         smoother_flag = False
         button_shape = 'bi bi-circle'
@@ -1800,7 +2140,7 @@ def smooth_data(n_clicks, df, smoother_flag, input_smoother_ws):
 
 
 
-# @app.callback(
+# @callback(
 #                 Output('store_auto_fit_ws', 'data'),
 #                 Output('input_auto_default_ws', 'value'),
 
@@ -1852,21 +2192,18 @@ def smooth_data(n_clicks, df, smoother_flag, input_smoother_ws):
 ##################
 # layout callbacks
 ##################
-@app.callback(
+clientside_callback(
+                ClientsideFunction(namespace='growthdash', function_name='toggle_overview_graphs'),
                 Output('overview_graphs_div', 'is_open'),
                 Output('show_hide_overview_graphs_button', 'className'),
                 Input('show_hide_overview_graphs_button', 'n_clicks'),
                 State('overview_graphs_div', 'is_open'),
                 prevent_initial_call = True
 )
-def settings_div(n_clicks, is_open_state):
-    # open settings div on button click
-    if is_open_state == True:
-        return False, 'bi bi-caret-right'
-    else:
-        return True, 'bi bi-caret-down-fill'
 
-@app.callback(
+# open settings div on button click
+clientside_callback(
+                ClientsideFunction(namespace='growthdash', function_name='toggle_settings'),
                 Output('settings_div', 'is_open'),
                 Output('settings_button', 'style'),
                 Input('settings_button', 'n_clicks'),
@@ -1874,26 +2211,18 @@ def settings_div(n_clicks, is_open_state):
                 State('settings_button', 'style'),
                 prevent_initial_call = True
 )
-def settings_div(n_clicks, is_open_state, style):
-    # open settings div on button click
-    if is_open_state == True:
-        return False, {'font-size': 25, 'color': 'dimgray'}
-    else:
-        return True, {'font-size': 25, 'color': 'darkslategray'}
 
 
-@app.callback(
+# show window size setting for the algorithms using it
+clientside_callback(
+                ClientsideFunction(namespace='growthdash', function_name='autofitting_settings'),
                 Output('autofit_settings', 'is_open'),
                 Input('dropdown_fitting_algorithms', 'value'),
+                State('store_window_size_algorithms', 'data'),
 )
-def autofitting_settings(fitting_algorithm):
-    if fitting_algorithm == 'Easy Linear':
-        return True
-    else:
-        return False
 
 
-@app.callback(
+@callback(
                 Output('analysis_div', 'is_open'),
                 Output('analysis_flag', 'data'),
                 Input('store_gd_by_replicates', 'data'),
@@ -1904,7 +2233,7 @@ def show_analysis_div(selected_data, analysis_flag):
     return True, True
 
 
-@app.callback(
+@callback(
                 Output('store_default_popsizemeasure', 'data'),
                 Output('input_popsizemeasure', 'value'),
                 Input('input_popsizemeasure', 'value'),
@@ -1915,6 +2244,8 @@ def update_popsizemeasure(input_val):
    
 
 def encode_plot_for_download(fig):
+    import plotly.graph_objects as go
+
     buffer = io.StringIO()
     go.Figure(fig).write_html(buffer)
     html_bytes = buffer.getvalue().encode()
@@ -1922,7 +2253,7 @@ def encode_plot_for_download(fig):
     href = "data:text/html;base64," + encoded
     return href
 
-@app.callback(
+@callback(
               Output('overview_download', 'href'),
               Output('dt_download', 'href'),
               Output('mu_download', 'href'),
@@ -1951,19 +2282,7 @@ def make_image(fig_overview, fig_dt, fig_mu, fig_lt, fig_doublings, fig_doubling
     return href_overview, href_dt, href_mu, href_lt, href_doublings, href_doublings_log, href_yields
 
 
-@app.callback(
-    Output("download_sample_data", "data"),
-    Input("download_sample_data_button", "n_clicks"),
-    State('store_growth_data', 'data'),
-    prevent_initial_call=True,
-)
-def func(n_clicks, df):
-    # download summaries of sample data
-    df = pd.DataFrame.from_dict(df, orient='index')
-    return dcc.send_data_frame(df.to_csv, "sample_data.csv", sep='\t')
-
-
-@app.callback(
+@callback(
     Output("download_sample_file", "data"),
     Input("button_download_sample_file", "n_clicks"),
     prevent_initial_call=True,
@@ -1974,6 +2293,36 @@ def download_sample_file(n_clicks):
     return dcc.send_file('./assets/sample_file.xlsx')
 
 
+################################################
+# app
+################################################
+def create_app():
+    '''
+        Dash app with the layout, the callbacks (registered with dash.callback) and the HTTP APIs for live plate reads and
+        plate analysis jobs
+        - with gunicorn --preload (see gunicorn_config.py) the app is created once in the master process, the workers
+          share it and the imported libraries copy-on-write
+        - long computations (autofit) are submitted as jobs to the background workers (see worker/)
+    '''
+    app = Dash(__name__,
+                external_stylesheets=external_stylesheets,
+                compress=True,      # gzip responses of callbacks (Flask-Compress)
+                )
+    app.layout = layout
+
+    # the import only registers the growth data and autofit callbacks (dash.callback) of growth_data.py
+    import growth_data  # noqa: F401
+
+    # HTTP API for live plate reads and plate analysis jobs
+    st.register_stream_routes(app.server)
+    ja.register_job_routes(app.server)
+    return app
+
+
+app = create_app()
+server = app.server
+
+
 if __name__ == '__main__':
     # import warnings
     # warnings.filterwarnings("ignore")
@@ -0,0 +1,192 @@
+/*
+author: Michael A. Reiter
+(c) ETH Zurich, Michael A. Reiter, 2022
+
+This file is part of Dashing Growth Curves.
+
+Dashing Growth Curves is free software: you can redistribute it and/or modify it under the terms of the GNU General Public License as published by the Free Software Foundation, either version 3 of the License, or (at your option) any later version.
+
+Dashing Growth Curves is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License along with Dashing Growth Curves. If not, see <https://www.gnu.org/licenses/>.
+*/
+
+// Client-side callbacks of view-only interactions (no request to the server), registered in app.py
+
+
+////////////////////////////////////////////////
+// results table (see results_table.py)
+////////////////////////////////////////////////
+// decoded columns of the growth results store (key: store data)
+const decodedTables = new WeakMap();
+
+function decodeColumn(column) {
+    // numbers and flags are base64 encoded little-endian arrays, text is stored as list
+    if (column.dtype === 'text') {
+        return column.data;
+    }
+    const bytes = Uint8Array.from(atob(column.data), c => c.charCodeAt(0));
+    if (column.dtype === '<f8') {
+        return new Float64Array(bytes.buffer);
+    } else if (column.dtype === '|b1') {
+        return bytes;
+    }
+    return null;
+}
+
+function decodeTable(data) {
+    // growth results as typed arrays, decoded once per store update
+    let table = decodedTables.get(data);
+    if (table === undefined) {
+        table = {'sample_locations': data.sample_locations};
+        for (const field in data.columns) {
+            table[field] = decodeColumn(data.columns[field]);
+        }
+        decodedTables.set(data, table);
+    }
+    return table;
+}
+
+
+////////////////////////////////////////////////
+// formatting (same output as growth_data.format_output_strings())
+////////////////////////////////////////////////
+function fmt(x, digits) {
+    // fixed-point number like Python's '{:.2f}'.format()
+    if (Number.isNaN(x)) {
+        return 'nan';
+    } else if (!Number.isFinite(x)) {
+        return x > 0 ? 'inf' : '-inf';
+    }
+    return x.toFixed(digits);
+}
+
+function markdown(text, allowHtml) {
+    return {
+        'namespace': 'dash_core_components',
+        'type': 'Markdown',
+        'props': {'children': text, 'dangerously_allow_html': allowHtml},
+    };
+}
+
+function formatOutputStrings(table, i, popSizeMeasure) {
+    const value = field => table[field][i];
+    const out = [
+        markdown('growth rate \\[h<sup>-1</sup>\\] = ' + fmt(value('mumax'), 2) + ' &plusmn; ' + fmt(value('mumax_std'), 2), true),
+        markdown('doubling time \\[h\\] = ' + fmt(value('dt'), 2) + ' &plusmn; ' + fmt(value('dt_std'), 2), false),
+        markdown('lag time \\[h\\] = ' + fmt(value('t0'), 2) + ' &plusmn; ' + fmt(value('t0_std'), 2), false),
+        markdown('doublings = ' + fmt(value('doublings'), 2), false),
+        markdown('doublings in log-phase = ' + fmt(value('doublings_log'), 2) + ' &plusmn; ' + fmt(value('doublings_log_std'), 2), false),
+        markdown('yield \\[' + popSizeMeasure + '\\] = ' + fmt(value('yield'), 2), true),
+    ];
+    if (['Manual', 'Manual-like', 'Easy Linear', 'Multi-phase'].includes(value('fitting_mode'))) {
+        out.push(markdown('R<sup>2</sup> = ' + fmt(value('error'), 3), true));
+    } else {
+        out.push(markdown('RMSE = ' + fmt(value('error'), 3), false));
+    }
+    return out;
+}
+
+
+////////////////////////////////////////////////
+// callbacks
+////////////////////////////////////////////////
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    growthdash: {
+        change_sample: function(f_clicks, b_clicks, upload_flag,
+                                fig_dt_click, fig_mu_click, fig_lt_click, fig_doublings_click, fig_doublings_log_click, fig_yield_click, fig_plate_heatmap_click,
+                                selected_sample_name, sample_names, sample_idx, plate_meta,
+                                fig_dt_hover, fig_mu_hover, fig_lt_hover, fig_doublings_hover, fig_doublings_log_hover, fig_yield_hover) {
+            // change displayed sample with different inputs (see the former server callback in app.py for the rules)
+            const no_update = window.dash_clientside.no_update;
+            const trigger = window.dash_clientside.callback_context.triggered[0].prop_id;
+            const hovers = {
+                'fig_dt.clickData': fig_dt_hover, 'fig_mu.clickData': fig_mu_hover, 'fig_lt.clickData': fig_lt_hover,
+                'fig_doublings.clickData': fig_doublings_hover, 'fig_doublings_log.clickData': fig_doublings_log_hover,
+                'fig_yield.clickData': fig_yield_hover,
+            };
+
+            if (trigger === 'store_upload_flag.data') {
+                // at data upload the first sample is displayed that's not been defined as 'to skip'
+                sample_names = plate_meta.sample_names;
+                sample_idx = Math.max(sample_names.findIndex(x => x !== '-'), 0);
+            } else if (trigger === 'backbutton.n_clicks') {
+                // previous sample (samples to skip are jumped over)
+                for (let i = sample_idx - 1; i >= 0; i--) {
+                    if (sample_names[i] !== '-') {
+                        sample_idx = i;
+                        break;
+                    }
+                }
+            } else if (trigger === 'forwardbutton.n_clicks') {
+                // next sample
+                for (let i = sample_idx + 1; i < sample_names.length; i++) {
+                    if (sample_names[i] !== '-') {
+                        sample_idx = i;
+                        break;
+                    }
+                }
+            } else if (trigger in hovers) {
+                // when clicking on datapoint in summary plots, jump to sample in data display section
+                sample_idx = sample_names.indexOf(hovers[trigger].points[0].hovertext);
+            } else if (trigger === 'fig_plate_heatmap.clickData') {
+                // when clicking on a well in the plate heat map, jump to the sample in that well
+                const clicked_sample_idx = fig_plate_heatmap_click.points[0].customdata;
+                if ((clicked_sample_idx === null) || (clicked_sample_idx === undefined) || (clicked_sample_idx < 0) || (sample_names[clicked_sample_idx] === '-')) {
+                    return [no_update, no_update, no_update];
+                }
+                sample_idx = clicked_sample_idx;
+            } else if (trigger === 'current_sample_name.value') {
+                // change sample on selection from drop down menu
+                sample_idx = sample_names.indexOf(selected_sample_name);
+            }
+
+            // format drop down menu with currently selected sample
+            return [sample_idx, sample_names.filter(x => x !== '-'), sample_names[sample_idx]];
+        },
+
+        show_growth_parameters: function(sample_idx, pop_size_measure, growth_data, sample_locations) {
+            // growth parameters of the displayed sample in the message area
+            if ((growth_data === null) || (growth_data === undefined) || (sample_locations === null) || (sample_locations === undefined)) {
+                return Array(7).fill(window.dash_clientside.no_update);
+            }
+            const table = decodeTable(growth_data);
+            const i = table.sample_locations.indexOf(sample_locations[sample_idx]);
+            if (i < 0) {
+                return Array(7).fill(window.dash_clientside.no_update);
+            }
+            return formatOutputStrings(table, i, pop_size_measure);
+        },
+
+        smoother_ws_tooltip: function(smoothing_ws, smoother_flag) {
+            if (smoother_flag === true) {
+                return 'Use raw data';
+            }
+            return 'Smooth data to remove noise using a sliding window of size ' + smoothing_ws;
+        },
+
+        reset_click: function(click) {
+            // reset click value, else multiple clicks in plot are not possible
+            return null;
+        },
+
+        toggle_overview_graphs: function(n_clicks, is_open_state) {
+            if (is_open_state === true) {
+                return [false, 'bi bi-caret-right'];
+            }
+            return [true, 'bi bi-caret-down-fill'];
+        },
+
+        toggle_settings: function(n_clicks, is_open_state, style) {
+            if (is_open_state === true) {
+                return [false, {'font-size': 25, 'color': 'dimgray'}];
+            }
+            return [true, {'font-size': 25, 'color': 'darkslategray'}];
+        },
+
+        autofitting_settings: function(fitting_algorithm, window_size_algorithms) {
+            // window size setting of the algorithms that use it
+            return window_size_algorithms.includes(fitting_algorithm);
+        },
+    }
+});
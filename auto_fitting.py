@@ -11,56 +11,209 @@ Dashing Growth Curves is distributed in the hope that it will be useful, but WIT
 You should have received a copy of the GNU General Public License along with Dashing Growth Curves. If not, see <https://www.gnu.org/licenses/>.
 '''
 
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+
 import numpy as np
 import pandas as pd
-from scipy.ndimage import uniform_filter1d
 from scipy.optimize import curve_fit
 
 import math_functions as mf
+import default_settings as ds
+import fitting_kernels as fk
+
+
+################################################
+# residual bootstrap
+################################################
+def bootstrap_n_workers(n_jobs=ds.bootstrap_n_jobs):
+    # processes of the bootstrap process pool (None: number of cores)
+    return n_jobs if n_jobs is not None else (os.cpu_count() or 1)
+
+
+@contextmanager
+def bootstrap_executor(n_resamples, n_jobs=ds.bootstrap_n_jobs):
+    '''
+        Process pool shared by the bootstrap of all samples of a plate
+        - yields None (i.e. resamples are fitted in the current process) if bootstrapping is disabled, only one job is requested
+          or the current process isn't allowed to start child processes (e.g. daemonic worker processes)
+        - the number of processes is kept as executor.n_workers, bootstrap_parameters() splits the resamples by it
+    '''
+    if (n_resamples <= 0) or (n_jobs == 1) or multiprocessing.current_process().daemon:
+        yield None
+        return
+    n_workers = bootstrap_n_workers(n_jobs)
+    try:
+        executor = ProcessPoolExecutor(max_workers=n_workers)
+    except (OSError, ValueError, AssertionError):
+        yield None
+        return
+    executor.n_workers = n_workers
+    try:
+        yield executor
+    finally:
+        executor.shutdown(cancel_futures=True)
+
+
+def _fit_resamples(model, x, y_fit, residuals_resampled, p0, bounds, maxfev, jac=None, fit_kwargs=None):
+    # fit model to a batch of resampled data sets, warm started from the point estimate
+    params = np.full((residuals_resampled.shape[0], len(p0)), np.nan)
+    for j in range(residuals_resampled.shape[0]):
+        try:
+            with np.errstate(all='ignore'):
+                params[j], _ = curve_fit(model, x, y_fit + residuals_resampled[j], p0=p0, bounds=bounds, maxfev=maxfev, jac=jac, **(fit_kwargs or {}))
+        except:
+            continue
+    return params
+
+
+def bootstrap_parameters(model, x, y, popt, n_resamples, bounds=(-np.inf, np.inf), executor=None, seed=None, jac=None, fit_kwargs=None):
+    '''
+        Residual bootstrap of the parameters of a fitted model
+        - model: model function fitted to y (e.g. mf.modified_gompertz)
+        - popt: fitted parameters (point estimate), used as starting values for fitting the resamples
+        - n_resamples: number of bootstrap resamples
+        - executor: process pool to fit the resamples in parallel (see bootstrap_executor()), fitted serially if None
+        - jac: optional analytic Jacobian of the model
+        - fit_kwargs: further arguments of curve_fit (e.g. robust loss, see loss_kwargs())
+
+        All resamples are generated at once by drawing the residuals of the point estimate with replacement.
+        Returns the parameters fitted to every resample (n_resamples x n_parameters, NaN if the fit failed).
+    '''
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    y_fit = model(x, *popt)
+    residuals = y - y_fit
+
+    rng = np.random.default_rng(seed)
+    residuals_resampled = residuals[rng.integers(0, residuals.shape[0], size=(n_resamples, residuals.shape[0]))]
+
+    if executor is None:
+        return _fit_resamples(model, x, y_fit, residuals_resampled, popt, bounds, ds.bootstrap_maxfev, jac, fit_kwargs)
+
+    # one batch of resamples per process of the pool
+    batches = np.array_split(residuals_resampled, executor.n_workers)
+    futures = [executor.submit(_fit_resamples, model, x, y_fit, batch, popt, bounds, ds.bootstrap_maxfev, jac, fit_kwargs) for batch in batches if batch.shape[0] > 0]
+    return np.concatenate([f.result() for f in futures])
+
+
+def percentile_interval(samples, ci_level=ds.bootstrap_ci_level):
+    # percentile confidence interval of bootstrap samples (failed resamples are ignored)
+    samples = np.asarray(samples, dtype=float)
+    if np.isnan(samples).all():
+        return np.nan, np.nan
+    alpha = (100 - ci_level) / 2
+    return np.nanpercentile(samples, alpha), np.nanpercentile(samples, 100 - alpha)
+
+
+def bootstrap_intervals(fitting_algorithm, params_bootstrap, ci_level=ds.bootstrap_ci_level):
+    '''
+        Confidence intervals of growth rate, lag time and doubling time from bootstrap samples
+        - params_bootstrap: bootstrap samples returned by the autofit_*() functions
+          (N0, A, mu, l (, v) for sigmoid models, slope and intercept of the log-phase fit for Easy Linear)
+
+        Returns a dict with the lower and upper bound of every interval (NaN if not available).
+    '''
+    intervals = {}
+    for parameter in ['mumax', 't0', 'dt']:
+        intervals[parameter + '_ci_low'] = np.nan
+        intervals[parameter + '_ci_high'] = np.nan
+    if params_bootstrap is None:
+        return intervals
+
+    if 'Easy Linear' in fitting_algorithm:
+        # lag time is the start of the selected window, which is not resampled
+        mu = params_bootstrap[:, 0]
+        t0 = np.full_like(mu, np.nan)
+    else:
+        A, mu, l = params_bootstrap[:, 1], params_bootstrap[:, 2], params_bootstrap[:, 3]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            if fitting_algorithm == 'Gompertz - tight':
+                t0 = l + 0.014 * A / mu
+            elif fitting_algorithm == 'Logistic - tight':
+                t0 = l + 0.17 * A / mu
+            else:
+                t0 = l
+    with np.errstate(divide='ignore'):
+        dt = np.log(2) / mu
+
+    for parameter, samples in [('mumax', mu), ('t0', t0), ('dt', dt)]:
+        intervals[parameter + '_ci_low'], intervals[parameter + '_ci_high'] = percentile_interval(samples, ci_level)
+    return intervals
 
 
 # Easy Linear method
-def autofit_easylinear(x, y, ws):
+################################################
+# robust loss
+################################################
+# Gompertz, Logistic and Easy Linear fits can use a robust loss of scipy's least_squares ('soft_l1', 'huber', 'cauchy',
+# 'arctan'), residuals larger than f_scale (log units) are down-weighted, i.e. single outlier time points don't pull the fit
+robust_loss_algorithms = ['Gompertz', 'Logistic', 'Easy Linear']
+
+
+def loss_kwargs(loss, f_scale):
+    # curve_fit arguments of a robust fit (Levenberg-Marquardt doesn't support robust losses)
+    if loss == 'linear':
+        return {}
+    return {'method': 'trf', 'loss': loss, 'f_scale': f_scale}
+
+
+def supports_robust_loss(fitting_algorithm):
+    return any([a in fitting_algorithm for a in robust_loss_algorithms])
+
+
+def autofit_easylinear(x, y, ws, n_bootstrap=0, executor=None, loss='linear', f_scale=ds.default_fit_loss_scale, y_log=None):
     '''
         Determine start and end point of the exponential growth phase as well as its associated growth rate by computing
         the growth rates for every window of data points
         - ws: window size
         - x: time points
         - y: population size measurements (expect blanked data), data can be smoothed beforehand using the smooth_data() function
+        - n_bootstrap: number of residual bootstrap resamples of the fit in the selected window (0: no bootstrap)
+        - executor: process pool for the bootstrap (see bootstrap_executor())
+        - loss, f_scale: robust loss, windows are then fitted by iteratively reweighted least squares
+        - y_log: log-transformed y (computed if not given)
     '''
 
     # n0 = np.min([y_i for y_i in y if y_i > 0]) # center around minimum measured OD value
-    y_log = np.log(np.array(y))
+    if y_log is None:
+        y_log = np.log(np.array(y))
     ws = int(ws)
 
-    # iterate over all subarrays of length ws
-    # compute the growth rate for each subarray
-    # return the subarray with the highest growth rate
+    # fit a line through all subarrays of length ws at once (see fitting_kernels.rolling_regression())
+    # return the subarray with the highest (positive) growth rate
+    if loss == 'linear':
+        slopes, intercepts, slopes_std, intercepts_std, r2 = fk.rolling_regression(x, y_log, ws)
+    else:
+        slopes, intercepts, slopes_std, intercepts_std, r2, _ = fk.rolling_regression_robust(x, y_log, ws, loss, f_scale, ds.robust_irls_iter)
     
     max_growth_rate = 0
     max_growth_rate_std = np.nan
     max_growth_rate_idx = np.nan
     y_intercept = np.nan
     R2_error = np.nan
-    for i in range(len(y_log) - ws):
-        ydata = y_log[i:i+ws]
-        xdata = x[i:i+ws]
-        popt, pcov = curve_fit(mf.lin_function, xdata, ydata)
-        growth_rate = popt[0]
-        if growth_rate > max_growth_rate:
-            max_growth_rate = growth_rate
-            max_growth_rate_std = np.sqrt(pcov[0, 0])
-            y_intercept = popt[1]
-            y_intercept_std = np.sqrt(pcov[1, 1])
-            max_growth_rate_idx = i
-            R2_error = mf.comp_R2(xdata, ydata, popt)
+    if (slopes.shape[0] > 0) and (np.nanmax(slopes, initial=0) > 0):
+        max_growth_rate_idx = int(np.nanargmax(slopes))
+        max_growth_rate = slopes[max_growth_rate_idx]
+        max_growth_rate_std = slopes_std[max_growth_rate_idx]
+        y_intercept = intercepts[max_growth_rate_idx]
+        y_intercept_std = intercepts_std[max_growth_rate_idx]
+        R2_error = r2[max_growth_rate_idx]
 
     idx_start = max_growth_rate_idx
     t_start = x[idx_start]
     idx_end = max_growth_rate_idx + ws
     t_end = x[idx_end]
+
+    # bootstrap samples of slope and intercept
+    params_bootstrap = None
+    if n_bootstrap > 0:
+        params_bootstrap = bootstrap_parameters(mf.lin_function, x[idx_start:idx_end], y_log[idx_start:idx_end], [max_growth_rate, y_intercept], n_bootstrap, executor=executor, 
+                                                fit_kwargs=loss_kwargs(loss, f_scale))
     
-    return t_start, t_end, max_growth_rate, max_growth_rate_std, y_intercept, y_intercept_std, R2_error
+    return t_start, t_end, max_growth_rate, max_growth_rate_std, y_intercept, y_intercept_std, R2_error, params_bootstrap
 
 # deprecated
 # def autofit_manual_like(x, y, ws=10, slope_range=0.6, min_window_length=3, b=25):
@@ -124,9 +277,92 @@ def autofit_easylinear(x, y, ws):
 
 
 
-def autofit_gompertz(x, y):
+################################################
+# multi-start fitting
+################################################
+def latin_hypercube_starts(x, y_log, n_starts, seed=None):
+    '''
+        Starting values (N0, A, mu, l) on a Latin hypercube, one row per start
+        - log(N0) around the lowest data point, A up to 1.5x the range of the log data, mu log-uniform between the
+          slope of a linear increase over the whole experiment and the slope of the range covered in two time steps,
+          l anywhere within the experiment
+    '''
+    y_min = np.min(y_log)
+    y_range = max(np.max(y_log) - y_min, 1e-3)
+    duration = max(np.max(x) - np.min(x), 1e-12)
+    dt = np.median(np.diff(np.sort(x))) if x.shape[0] > 1 else duration
+    mu_min = y_range / duration
+    mu_max = max(y_range / (2 * max(dt, 1e-12)), 2 * mu_min)
+
+    lower = [y_min - 0.5 * y_range, 0.1 * y_range, np.log(mu_min), np.min(x)]
+    upper = [y_min + 0.5 * y_range, 1.5 * y_range, np.log(mu_max), np.max(x)]
+    # scipy.stats is only imported by fits with multiple starts
+    from scipy.stats import qmc
+    starts = qmc.scale(qmc.LatinHypercube(d=4, seed=seed).random(n_starts), lower, upper)
+    starts[:, 0] = np.exp(starts[:, 0])
+    starts[:, 2] = np.exp(starts[:, 2])
+    return starts
+
+
+def fit_sigmoid_multistart(model, x, y_log, p0, bounds, maxfev, multistart=ds.multistart_fitting, loss='linear', f_scale=1.0):
+    '''
+        Fit a Gompertz or Logistic model (see fitting_kernels.fit_sigmoid()), if the fit fails or its RMSE exceeds
+        ds.multistart_rmse_threshold times the range of the log data and multistart is set:
+        - evaluate ds.multistart_n_starts Latin hypercube starting values in one vectorized pass
+        - refit from the ds.multistart_n_local best starts and keep the fit with the lowest residual sum of squares
+        (robust fits: lowest loss, see math_functions.robust_loss())
+
+        Returns parameters and covariance matrix like curve_fit, raises RuntimeError if no fit converged.
+    '''
+    model_batch = mf.modified_gompertz_batch if model == 'Gompertz' else mf.modified_logistic_batch
+    x = np.asarray(x, dtype=float)
+    y_log = np.asarray(y_log, dtype=float)
+
+    def rss(popt):
+        return np.sum(mf.robust_loss(model_batch(x, *popt[:, None]) - y_log, loss, f_scale))
+
+    best, best_rss = None, np.inf
+    try:
+        best = fk.fit_sigmoid(model, x, y_log, p0=p0, bounds=bounds, maxfev=maxfev, loss=loss, f_scale=f_scale)
+        best_rss = rss(best[0])
+    except (RuntimeError, ValueError, np.linalg.LinAlgError):
+        pass
+    if not multistart:
+        if best is None:
+            raise RuntimeError('Optimal parameters not found')
+        return best
+
+    y_range = max(np.max(y_log) - np.min(y_log), 1e-3)
+    if np.isfinite(best_rss) and (np.sqrt(best_rss / y_log.shape[0]) <= ds.multistart_rmse_threshold * y_range):
+        return best
+
+    # residual sum of squares of all starts at once, the best starts are refined by local fits
+    starts = latin_hypercube_starts(x, y_log, ds.multistart_n_starts, seed=ds.multistart_seed)
+    with np.errstate(over='ignore', invalid='ignore'):
+        starts_rss = np.sum(mf.robust_loss(model_batch(x, *starts.T) - y_log, loss, f_scale), axis=1)
+    starts_rss[~np.isfinite(starts_rss)] = np.inf
+    for start in starts[np.argsort(starts_rss)[:ds.multistart_n_local]]:
+        try:
+            fit = fk.fit_sigmoid(model, x, y_log, p0=start, bounds=bounds, maxfev=ds.multistart_maxfev, loss=loss, f_scale=f_scale)
+        except (RuntimeError, ValueError, np.linalg.LinAlgError):
+            continue
+        fit_rss = rss(fit[0])
+        if fit_rss < best_rss:
+            best, best_rss = fit, fit_rss
+
+    if best is None:
+        raise RuntimeError('Optimal parameters not found')
+    return best
+
+
+def autofit_gompertz(x, y, n_bootstrap=0, executor=None, multistart=ds.multistart_fitting, loss='linear', f_scale=ds.default_fit_loss_scale, y_log=None):
     # fit a Gompertz growth sigmoid curve to the growth curve
-    y_log = np.log(np.array(y))
+    # optionally add n_bootstrap residual bootstrap samples of the parameters (see bootstrap_parameters())
+    # multistart: retry failed or poor fits from multiple starting values (see fit_sigmoid_multistart())
+    # loss, f_scale: robust loss (see loss_kwargs())
+    # y_log: log-transformed y (computed if not given)
+    if y_log is None:
+        y_log = np.log(np.array(y))
     
     # estimate initial parameters for fitting
     N0_estimate = np.min([y_i for y_i in y if y_i > 0])
@@ -138,11 +374,15 @@ def autofit_gompertz(x, y):
     l_estimate = x[closest_ylog_point_idx]
 
     try:
-        popt, pcov = curve_fit(mf.modified_gompertz, x, y_log, 
-                               p0=[N0_estimate, A_estimate, mu_estimate, l_estimate], 
-                               bounds=[[-np.inf, 0, 0, -np.inf], [np.inf, np.inf, np.inf, np.inf]],
-                               maxfev=100000000,
-                               )
+        bounds = [[-np.inf, 0, 0, -np.inf], [np.inf, np.inf, np.inf, np.inf]]
+        popt, pcov = fit_sigmoid_multistart('Gompertz', x, y_log, 
+                                            p0=[N0_estimate, A_estimate, mu_estimate, l_estimate], 
+                                            bounds=bounds,
+                                            maxfev=100000000,
+                                            multistart=multistart,
+                                            loss=loss,
+                                            f_scale=f_scale,
+                                            )
         N0 = popt[0]
         N0_std = np.sqrt(pcov[0, 0])
         A = popt[1]
@@ -151,14 +391,24 @@ def autofit_gompertz(x, y):
         mu_std = np.sqrt(pcov[2, 2])
         l = popt[3]
         l_std = np.sqrt(pcov[3, 3])
-        return A, A_std, mu, mu_std, l, l_std, N0, N0_std
     except:
-        return np.nan, np.nan, np.nan, np.nan, np.nan, np.nan, np.nan, np.nan
+        return np.nan, np.nan, np.nan, np.nan, np.nan, np.nan, np.nan, np.nan, None
 
+    # bootstrap samples of N0, A, mu and l
+    params_bootstrap = None
+    if n_bootstrap > 0:
+        params_bootstrap = bootstrap_parameters(mf.modified_gompertz, x, y_log, popt, n_bootstrap, bounds=bounds, executor=executor, fit_kwargs=loss_kwargs(loss, f_scale))
+    return A, A_std, mu, mu_std, l, l_std, N0, N0_std, params_bootstrap
 
-def autofit_logistic(x, y):
+
+def autofit_logistic(x, y, n_bootstrap=0, executor=None, multistart=ds.multistart_fitting, loss='linear', f_scale=ds.default_fit_loss_scale, y_log=None):
     # fit a Logistic growth sigmoid curve to the growth curve
-    y_log = np.log(np.array(y))
+    # optionally add n_bootstrap residual bootstrap samples of the parameters (see bootstrap_parameters())
+    # multistart: retry failed or poor fits from multiple starting values (see fit_sigmoid_multistart())
+    # loss, f_scale: robust loss (see loss_kwargs())
+    # y_log: log-transformed y (computed if not given)
+    if y_log is None:
+        y_log = np.log(np.array(y))
     
     # estimate initial parameters for fitting
     N0_estimate = np.min([y_i for y_i in y if y_i > 0])
@@ -170,11 +420,15 @@ def autofit_logistic(x, y):
     l_estimate = x[closest_ylog_point_idx]
 
     try:
-        popt, pcov = curve_fit(mf.modified_logistic, x, y_log, 
-                               p0=[N0_estimate, A_estimate, mu_estimate, l_estimate], 
-                               bounds=[[-np.inf, 0, 0, -np.inf], [np.inf, np.inf, np.inf, np.inf]],
-                               maxfev=10000000,
-                               )
+        bounds = [[-np.inf, 0, 0, -np.inf], [np.inf, np.inf, np.inf, np.inf]]
+        popt, pcov = fit_sigmoid_multistart('Logistic', x, y_log, 
+                                            p0=[N0_estimate, A_estimate, mu_estimate, l_estimate], 
+                                            bounds=bounds,
+                                            maxfev=10000000,
+                                            multistart=multistart,
+                                            loss=loss,
+                                            f_scale=f_scale,
+                                            )
         N0 = popt[0]
         N0_std = np.sqrt(pcov[0, 0])
         A = popt[1]
@@ -183,52 +437,233 @@ def autofit_logistic(x, y):
         mu_std = np.sqrt(pcov[2, 2])
         l = popt[3]
         l_std = np.sqrt(pcov[3, 3])
-        return A, A_std, mu, mu_std, l, l_std, N0, N0_std
     except:
-        return np.nan, np.nan, np.nan, np.nan, np.nan, np.nan, np.nan, np.nan
+        return np.nan, np.nan, np.nan, np.nan, np.nan, np.nan, np.nan, np.nan, None
 
+    # bootstrap samples of N0, A, mu and l
+    params_bootstrap = None
+    if n_bootstrap > 0:
+        params_bootstrap = bootstrap_parameters(mf.modified_logistic, x, y_log, popt, n_bootstrap, bounds=bounds, executor=executor, fit_kwargs=loss_kwargs(loss, f_scale))
+    return A, A_std, mu, mu_std, l, l_std, N0, N0_std, params_bootstrap
 
-# def autofit_richards(x, y):
-#      # fit a logistic growth sigmoid curve to the whole dataset
-#     n0 = np.min([y_i for y_i in y if y_i > 0]) # center around minimum measured OD value
-    
-#     # print(x.shape, y.values[17])
-#     y_log = np.log(y.values / n0)
-
-#     mask = y_log != 0
-#     y_log = y_log[mask]
-#     x = x[mask]
-
-#     try:
-#         popt, pcov = curve_fit(mf.modified_richards, x, y_log, maxfev=1000000, p0=[np.max(y_log), np.median(x), 1, 0.5], bounds=[[0, 0, -np.inf, 0.01], [np.inf, np.inf, np.inf, np.inf]]) #
-#         A = popt[0]
-#         A_std = np.sqrt(pcov[0, 0])
-#         mu = popt[1]
-#         mu_std = np.sqrt(pcov[1, 1])
-#         l = popt[2]
-#         l_std = np.sqrt(pcov[2, 2])
-#         v = popt[3]
-#         v_std = pcov[3, 3]
-#         return A, A_std, mu, mu_std, l, l_std, v, v_std, n0
-#     except:
-#         return np.nan, np.nan, np.nan, np.nan, np.nan, np.nan, np.nan, np.nan, np.nan
-
-
-# def autofit_schnute(x, y):
-#      # fit a logistic growth sigmoid curve to the whole dataset
-#     n0 = np.min([y_i for y_i in y if y_i > 0]) # center around minimum measured OD value
-#     y_log = np.log(np.array(y) / n0)
-    
-#     try:
-#         popt, pcov = curve_fit(mf.modified_schnute, x, y_log, p0=[2, 0.5, 3, -1], maxfev=10000, ) #bounds=[[0, 0.001, -np.inf, -np.inf], [np.inf, 10, np.inf, 0]]
-#         A = popt[0]
-#         A_std = np.sqrt(pcov[0, 0])
-#         mu = popt[1]
-#         mu_std = np.sqrt(pcov[1, 1])
-#         l = popt[2]
-#         l_std = np.sqrt(pcov[2, 2])
-#         v = popt[3]
-#         v_std = pcov[3, 3]
-#         return A, A_std, mu, mu_std, l, l_std, v, v_std, n0
-#     except:
-#         return np.nan, np.nan, np.nan, np.nan, np.nan, np.nan, np.nan, np.nan, np.nan
\ No newline at end of file
+
+################################################
+# multi-phase growth
+################################################
+def _segment_costs(S, i, j):
+    # residual sum of squares around the mean of the segments [i, j) (i, j: arrays of indices) from the cumulative sums S of 1, y and y^2
+    n, sy, syy = (S[:, j] - S[:, i])
+    return np.maximum(syy - sy * sy / n, 0)
+
+
+def _best_split(S, i, j, min_size):
+    # split point of the segment [i, j) with the largest decrease of the residual sum of squares (all split points at once)
+    k = np.arange(i + min_size, j - min_size + 1)
+    if k.shape[0] == 0:
+        return None, 0
+    gain = _segment_costs(S, np.array([i]), np.array([j]))[0] - _segment_costs(S, np.full_like(k, i), k) - _segment_costs(S, k, np.full_like(k, j))
+    best = np.argmax(gain)
+    return k[best], gain[best]
+
+
+def change_points(y, min_size, max_segments=ds.multiphase_max_segments, penalty=ds.multiphase_penalty):
+    '''
+        Binary segmentation of the series y into segments of constant mean
+        - the segment whose best split decreases the residual sum of squares most is split, as long as the split
+          improves the BIC (penalty: parameters per additional segment, i.e. mean and change point)
+        - min_size: min. number of values per segment
+        - costs of all split points of a segment are computed at once from cumulative sums and only the two new
+          segments are searched again after a split, i.e. O(n log n) for balanced splits
+
+        Returns the segment boundaries (segment k: values boundaries[k] ... boundaries[k + 1] - 1).
+    '''
+    y = np.asarray(y, dtype=float)
+    n = y.shape[0]
+    S = np.zeros((3, n + 1))
+    np.cumsum([np.ones(n), y, y * y], axis=1, out=S[:, 1:])
+
+    cost = _segment_costs(S, np.array([0]), np.array([n]))[0]
+    splits = {(0, n): _best_split(S, 0, n, min_size)}
+    while len(splits) < max_segments:
+        (i, j), (k, gain) = max(splits.items(), key=lambda item: item[1][1])
+        if (k is None) or (gain <= 0) or (cost - gain <= 0):
+            break
+        if n * np.log(cost / (cost - gain)) <= penalty * np.log(n):
+            break
+        cost -= gain
+        del splits[(i, j)]
+        splits[(i, k)] = _best_split(S, i, k, min_size)
+        splits[(k, j)] = _best_split(S, k, j, min_size)
+    return np.array(sorted([i for i, j in splits] + [n]))
+
+
+def autofit_multiphase(x, y, ws, y_log=None):
+    '''
+        Detect exponential growth phases (e.g. diauxic growth) as change points of the rolling growth rate
+        - growth rates of all windows of ws data points (see fitting_kernels.rolling_regression()) are segmented into
+          pieces of constant growth rate (see change_points(), min. segment length ws / 2)
+        - growth phases: consecutive segments with a mean growth rate of at least ds.multiphase_min_growth_fraction of
+          the highest one, each phase is described by its fastest window (like Easy Linear) and extends between the
+          centers of its first and last window
+        - y_log: log-transformed y (computed if not given)
+
+        Returns growth rate, its standard error, start, end, intercept (log scale) and R2 of the fastest window of
+        every growth phase.
+    '''
+    x = np.asarray(x, dtype=float)
+    if y_log is None:
+        y_log = np.log(np.array(y))
+    ws = int(ws)
+    slopes, intercepts, slopes_std, _, r2 = fk.rolling_regression(x, y_log, ws)
+    if slopes.shape[0] == 0:
+        return (np.array([]),) * 6
+    slopes = np.nan_to_num(slopes, nan=0)
+    boundaries = change_points(slopes, max(ws // 2, 2))
+
+    # group consecutive segments with fast growth into phases
+    means = np.array([slopes[i:j].mean() for i, j in zip(boundaries[:-1], boundaries[1:])])
+    growing = np.flatnonzero((means > 0) & (means >= ds.multiphase_min_growth_fraction * means.max()))
+    phases = np.split(growing, np.flatnonzero(np.diff(growing) > 1) + 1) if growing.shape[0] > 0 else []
+
+    fastest = []
+    t_start = []
+    t_end = []
+    for phase in phases:
+        first, last = boundaries[phase[0]], boundaries[phase[-1] + 1]
+        fastest.append(first + np.argmax(slopes[first:last]))
+        # phases start and end at the centers of their first and last window
+        t_start.append(x[first + ws // 2])
+        t_end.append(x[last - 1 + ws // 2])
+    fastest = np.array(fastest, dtype=int)
+    return slopes[fastest], slopes_std[fastest], np.array(t_start), np.array(t_end), intercepts[fastest], r2[fastest]
+
+
+################################################
+# model selection
+################################################
+# number of fitted parameters of every model (Easy Linear: slope, intercept and start/end of the exponential phase)
+n_model_parameters = {
+                        'Gompertz - tight': 4,
+                        'Gompertz - conventional': 4,
+                        'Logistic - tight': 4,
+                        'Logistic - conventional': 4,
+                        'Richards': 5,
+                        'Schnute': 5,
+                        'Easy Linear': 4,
+                        }
+
+
+def information_criterion(y_log, y_log_fit, n_params, criterion='AIC'):
+    # AIC or BIC of a least squares fit (Gaussian errors on the log scale), lower is better
+    n = y_log.shape[0]
+    rss = np.sum((np.asarray(y_log) - np.asarray(y_log_fit))**2)
+    if (n <= n_params) or (rss <= 0) or not np.isfinite(rss):
+        return np.nan
+    if criterion == 'BIC':
+        return n * np.log(rss / n) + n_params * np.log(n)
+    return n * np.log(rss / n) + 2 * n_params
+
+
+################################################
+# Richards and Schnute models
+################################################
+# both models are fitted with log-transformed parameters log(N0), log(A), log(mu), l and a transformed shape parameter
+# (Richards: log(v), v > 0; Schnute: log(1 - v), v < 1), i.e. without bounds, so the fast Levenberg-Marquardt algorithm
+# can be used with the analytic Jacobian of the model
+def richards_transformed(x, log_N0, log_A, log_mu, l, log_v):
+    return mf.modified_richards(x, np.exp(log_N0), np.exp(log_A), np.exp(log_mu), l, _richards_shape(log_v))
+
+
+def richards_transformed_jacobian(x, log_N0, log_A, log_mu, l, log_v):
+    # Richards function is the Schnute function with shape parameter -v, d(-v)/dlog(v) = -v
+    v = _richards_shape(log_v)
+    J = mf.modified_schnute_jacobian(x, np.exp(log_N0), np.exp(log_A), np.exp(log_mu), l, - v)
+    J[:, 4] *= - v
+    return J
+
+
+def _richards_shape(log_v):
+    # shape parameter v = exp(log_v), kept away from the Gompertz limit v -> 0 (fits of Gompertz-like curves drift towards it)
+    return max(np.exp(log_v), 1e-10)
+
+
+def schnute_transformed(x, log_N0, log_A, log_mu, l, log_1mv):
+    return mf.modified_schnute(x, np.exp(log_N0), np.exp(log_A), np.exp(log_mu), l, _schnute_shape(log_1mv))
+
+
+def schnute_transformed_jacobian(x, log_N0, log_A, log_mu, l, log_1mv):
+    # dv/dlog(1 - v) = v - 1
+    v = _schnute_shape(log_1mv)
+    J = mf.modified_schnute_jacobian(x, np.exp(log_N0), np.exp(log_A), np.exp(log_mu), l, v)
+    J[:, 4] *= v - 1
+    return J
+
+
+def _schnute_shape(log_1mv):
+    # shape parameter v = 1 - exp(log_1mv), v = 0 (Gompertz limit) is not defined and shifted by a tiny amount
+    v = 1 - np.exp(log_1mv)
+    return v if abs(v) > 1e-10 else -1e-10
+
+
+def _fit_shape_model(model, jacobian, x, y, v_start, v_transform, v_back_transform, v_derivative, n_bootstrap, executor, y_log=None, start=None):
+    '''
+        Fit the Richards or Schnute model to the growth curve
+        - starting values of N0, A, mu and l are taken from a Gompertz fit (Gompertz function is the v -> 0 limit of both models)
+        - v_transform/v_back_transform: transform of the shape parameter and its inverse, v_derivative: dv/d(transformed v)
+        - y_log: log-transformed y, start: N0, A, mu and l of a Gompertz fit of the same data (both computed if not given)
+
+        Returns the parameters with standard errors (delta method) and the bootstrap samples of N0, A, mu, l and v.
+    '''
+    if y_log is None:
+        y_log = np.log(np.array(y))
+    x = np.asarray(x, dtype=float)
+
+    if start is None:
+        A, _, mu, _, l, _, N0, _, _ = autofit_gompertz(x, y, y_log=y_log)
+    else:
+        N0, A, mu, l = start
+    if np.isnan(A) or (A <= 0) or (mu <= 0) or (N0 <= 0):
+        # Gompertz fit failed, use the same estimates as the Gompertz fit
+        N0 = np.min([y_i for y_i in y if y_i > 0])
+        A = max(np.max(y_log - np.log(N0)), 1e-3)
+        mu = 0.2
+        l = x[np.argmin(np.power((np.max(y_log) + np.min(y_log)) / 2 - y_log, 2))]
+
+    try:
+        p0 = [np.log(N0), np.log(A), np.log(mu), l, v_transform(v_start)]
+        with np.errstate(all='ignore'):
+            # trial steps of the optimizer can leave the domain of the model
+            popt, pcov = curve_fit(model, x, y_log, p0=p0, jac=jacobian, method='lm', maxfev=ds.shape_model_maxfev)
+        if not np.isfinite(pcov).all():
+            raise RuntimeError('covariance of parameters could not be estimated')
+    except:
+        return np.nan, np.nan, np.nan, np.nan, np.nan, np.nan, np.nan, np.nan, np.nan, np.nan, None
+
+    # back-transform parameters, standard errors from first order error propagation
+    std = np.sqrt(np.diag(pcov))
+    N0, A, mu, l, v = np.exp(popt[0]), np.exp(popt[1]), np.exp(popt[2]), popt[3], v_back_transform(popt[4])
+    N0_std, A_std, mu_std, l_std, v_std = N0 * std[0], A * std[1], mu * std[2], std[3], abs(v_derivative(popt[4])) * std[4]
+
+    # bootstrap samples of N0, A, mu, l and v
+    params_bootstrap = None
+    if n_bootstrap > 0:
+        params_bootstrap = bootstrap_parameters(model, x, y_log, popt, n_bootstrap, executor=executor, jac=jacobian)
+        params_bootstrap = np.column_stack([np.exp(params_bootstrap[:, 0]), np.exp(params_bootstrap[:, 1]), np.exp(params_bootstrap[:, 2]),
+                                            params_bootstrap[:, 3], v_back_transform(params_bootstrap[:, 4])])
+    return A, A_std, mu, mu_std, l, l_std, N0, N0_std, v, v_std, params_bootstrap
+
+
+def autofit_richards(x, y, n_bootstrap=0, executor=None, y_log=None, start=None):
+    # fit a Richards growth sigmoid curve to the growth curve
+    # optionally add n_bootstrap residual bootstrap samples of the parameters (see bootstrap_parameters())
+    # y_log, start: log-transformed y and starting values from a Gompertz fit (see _fit_shape_model())
+    return _fit_shape_model(richards_transformed, richards_transformed_jacobian, x, y, ds.shape_model_v_start,
+                            np.log, np.exp, np.exp, n_bootstrap, executor, y_log, start)
+
+
+def autofit_schnute(x, y, n_bootstrap=0, executor=None, y_log=None, start=None):
+    # fit a Schnute growth sigmoid curve to the growth curve (v is the shape parameter b of the Schnute function)
+    # optionally add n_bootstrap residual bootstrap samples of the parameters (see bootstrap_parameters())
+    # y_log, start: log-transformed y and starting values from a Gompertz fit (see _fit_shape_model())
+    return _fit_shape_model(schnute_transformed, schnute_transformed_jacobian, x, y, - ds.shape_model_v_start,
+                            lambda v: np.log(1 - v), lambda log_1mv: 1 - np.exp(log_1mv), lambda log_1mv: - np.exp(log_1mv), n_bootstrap, executor, y_log, start)
@@ -11,13 +11,13 @@ Dashing Growth Curves is distributed in the hope that it will be useful, but WIT
 You should have received a copy of the GNU General Public License along with Dashing Growth Curves. If not, see <https://www.gnu.org/licenses/>.
 '''
 
+import hashlib
+import io
 
 import dash_bootstrap_components as dbc
 from dash import html
-from string import ascii_uppercase
-import numpy as np
 
-import math_functions as mf
+import messages as ms
 
 ################################################
 # graph configs
@@ -73,30 +73,80 @@ def create_link_button(name, target):
 ################################################
 # set sample locations
 ################################################
-def set_sample_locations(df):
-    # generate sample locations to fit 12, 24, 96 or 384 well format
+def set_sample_locations(df, layout_file=None):
+    import plate_layout as lay
+
+    # generate sample locations to fit 12, 24, 48, 96, 384 or 1536 well format, or the wells listed in an uploaded layout file
     # if data wasn't collected from any of the type, just generate numerical IDs
-    sample_locations = []
-    if df.shape[0] == 384:
-        for x in ascii_uppercase[:16]:
-            for y in np.arange(1,25):
-                sample_locations.append('{}{}'.format(x, y))
-    elif df.shape[0] == 96:
-        for x in ascii_uppercase[:8]:
-            for y in np.arange(1,13):
-                sample_locations.append('{}{}'.format(x, y))
-    elif df.shape[0] == 24:
-        for x in ascii_uppercase[:4]:
-            for y in np.arange(1,7):
-                sample_locations.append('{}{}'.format(x, y))
-    elif df.shape[0] == 12:
-        for x in ascii_uppercase[:3]:
-            for y in np.arange(1,5):
-                sample_locations.append('{}{}'.format(x, y))
+    layout = lay.generate_plate_layout(df.shape[0], layout_file)
+    return layout['locations'].tolist()
+
+
+################################################
+# data files
+################################################
+def read_data_file(decoded, filename):
+    '''
+        Plate data from an uploaded file (sample names as index, time points as columns)
+        - semicolon-separated .csv or Excel file, sample names in the first column, time points in the header line
+
+        Raises ValueError with the message for the user if the file can't be read or contains non-numerical values.
+    '''
+    import pandas as pd
+
+    if filename.split('.')[-1] == 'csv':
+        df = pd.read_csv(io.StringIO(decoded.decode('utf-8')), sep=';')
+    elif (filename.split('.')[-1] == 'xlsx') or (filename.split('.')[-1] == '.xls'):
+        df = pd.read_excel(decoded)
     else:
-        for i in np.arange(1, df.shape[0] + 1):
-            sample_locations.append('{}'.format(i))
-    return sample_locations
+        raise ValueError(ms.error_upload_file)
+
+    # check if entries can be cast to float
+    try:
+        df.iloc[:, 1:].astype(float)
+        df.columns[1:].astype(float)
+    except:
+        raise ValueError(ms.error_upload_duplicate_t_non_float)
+
+    # format uploaded data
+    df.set_index(df.iloc[:,0].values, inplace=True)
+    df = df.iloc[:, 1:]
+    df.columns = df.columns.astype(float)
+    return df
+
+
+def has_duplicate_samples(df):
+    # sample names need to be unique, except for samples to skip ('-')
+    return len(set(df[[not x for x in df.index == '-']].index)) + df[df.index == '-'].shape[0] != df.shape[0]
+
+
+################################################
+# plate metadata
+################################################
+def plate_hash(sample_names, t, values):
+    import numpy as np
+
+    # content hash of the plate data (sample names, time points and measurements)
+    h = hashlib.blake2b(digest_size=16)
+    h.update('\n'.join(str(x) for x in sample_names).encode())
+    h.update(np.ascontiguousarray(t, dtype='<f8').tobytes())
+    h.update(np.ascontiguousarray(values, dtype='<f8').tobytes())
+    return h.hexdigest()
+
+
+def plate_meta(df, layout_file=None):
+    '''
+        Description of the uploaded plate for callbacks that don't compute on the data (see store_plate_meta)
+        - sample names as uploaded, sample locations, number of samples and time points, content hash of the data
+    '''
+    sample_names = df.index.tolist()
+    return {
+            'sample_names': sample_names,
+            'sample_locations': set_sample_locations(df, layout_file),
+            'n_samples': df.shape[0],
+            'n_timepoints': df.shape[1],
+            'hash': plate_hash(sample_names, df.columns.values, df.values),
+            }
 
 
 ################################################
@@ -114,61 +164,10 @@ def generate_alert(alert_message):
 ################################################
 # generate fitted curve
 ################################################
-def generate_fitted_curve(t, fitting_algorithm, growth_data_sp, n_iter=1000):
-    t0 = growth_data_sp['t0']
-    t1 = growth_data_sp['t1']
-    t0_idx = growth_data_sp['t0_idx']
-    t1_idx = growth_data_sp['t1_idx']
-    mu = growth_data_sp['mumax']
-    N0 = growth_data_sp['N0']
-    l = growth_data_sp['t0']
-    A = growth_data_sp['A']
-    v = growth_data_sp['v']
-
-    # for tight fits, need to convert lag time value to lambda parameter
-    if fitting_algorithm == 'Logistic - tight':
-        l = l - 0.17 * A / mu
-    elif fitting_algorithm == 'Gompertz - tight':
-        l = l - 0.014 * A / mu
-
-    # create timepoints
-    if fitting_algorithm in ['Manual', 'Manual-like']:
-        t_fit_start = t[t0_idx]
-        t_fit_end = t[t1_idx]
-    elif fitting_algorithm == 'Easy Linear':
-        t_fit_start = t0
-        t_fit_end = t1
-    else:
-        t_fit_start = t[0]
-        t_fit_end = t[-1]
-
-    t_fit = np.linspace(t_fit_start, t_fit_end, n_iter)
-
-    # create fit values (i.e. associated y-values)
-    if fitting_algorithm in ['Manual', 'Manual-like', 'Easy Linear']:
-        
-        y_fit = mf.exp_function(t_fit, N0, mu)
-
-    elif 'Gompertz' in fitting_algorithm:
-        y_gompertz_fit = mf.modified_gompertz(t_fit, N0, A, mu, l)
-        y_fit = np.exp(y_gompertz_fit)
-
-    elif 'Logistic' in fitting_algorithm:
-        y_logistic_fit = mf.modified_logistic(t_fit, N0, A, mu, l)
-        y_fit = np.exp(y_logistic_fit)
-
-    # elif fitting_algorithm == 'Richards':
-    #     y_richards_fit = mf.modified_richards(t_fit, A, mu, l, v)
-    #     y_fit = np.exp(y_richards_fit) * n0
-    
-    # elif fitting_algorithm == 'Schnute':
-    #     y_schnute_fit = mf.modified_schnute(t_fit, A, mu, l, v)
-    #     y_fit = np.exp(y_schnute_fit) * n0
-    return t_fit, y_fit
-
-
-
 def generate_start_end_logphase_indicator_lines(fitting_algorithm, growth_data_sp, sample_trace_blanked, n_iter=1000):
+    import numpy as np
+    import math_functions as mf
+    import derived_metrics as dm
 
     t0 = growth_data_sp['t0']
     t0_std = growth_data_sp['t0_std']
@@ -183,10 +182,8 @@ def generate_start_end_logphase_indicator_lines(fitting_algorithm, growth_data_s
     v = growth_data_sp['v']
 
     # for tight fits, need to convert lag time value to lambda parameter
-    if fitting_algorithm == 'Logistic - tight':
-        l = l - 0.17 * A / mu
-    elif fitting_algorithm == 'Gompertz - tight':
-        l = l - 0.014 * A / mu
+    if fitting_algorithm in dm.phase_factors:
+        l = dm.lag_parameter(fitting_algorithm, l, A, mu)
 
     x_0 = np.ones(n_iter) * t0
     x_1 = np.ones(n_iter) * t1
@@ -202,38 +199,17 @@ def generate_start_end_logphase_indicator_lines(fitting_algorithm, growth_data_s
         hovertext_start = ['start log-phase: {0:.2f} h'.format(t0) for x in range(n_iter)]
         hovertext_end = ['end log-phase: {0:.2f} h'.format(t1) for x in range(n_iter)]
     
-    elif fitting_algorithm == 'Easy Linear':
+    elif fitting_algorithm in ['Easy Linear', 'Multi-phase']:
         y0 = mf.exp_function(t0, N0, mu)
         y1 = mf.exp_function(t1, N0, mu)
         hovertext_start = ['start log-phase: {0:.2f} h'.format(t0) for x in range(n_iter)]
         hovertext_end = ['end log-phase: {0:.2f} h'.format(t1) for x in range(n_iter)]
     else:
-        if 'Gompertz' in fitting_algorithm:
-            y0 = np.exp(mf.modified_gompertz(t0, N0, A, mu, l)) 
-            y1 = np.exp(mf.modified_gompertz(t1, N0, A, mu, l))
-        elif 'Logistic' in fitting_algorithm:
-            y0 = np.exp(mf.modified_logistic(t0, N0, A, mu, l))
-            y1 = np.exp(mf.modified_logistic(t1, N0, A, mu, l))
-        # elif fitting_algorithm == 'Richards':
-        #     y0 = np.exp(mf.modified_richards(t0, N0, A, mu, l, v))
-        #     y1 = np.exp(mf.modified_richards(t1, N0, A, mu, l, v))
-        # elif fitting_algorithm == 'Schnute':
-        #     y0 = np.exp(mf.modified_schnute(t0, N0, A, mu, l, v))
-        #     y1 = np.exp(mf.modified_schnute(t1, N0, A, mu, l, v))
+        y0 = np.exp(dm.log_population(fitting_algorithm, t0, N0, A, mu, l, v))
+        y1 = np.exp(dm.log_population(fitting_algorithm, t1, N0, A, mu, l, v))
         hovertext_start = ['start log-phase: {0:.2f} &plusmn; {1:.2f} h'.format(t0, t0_std) for x in range(n_iter)]
         hovertext_end = ['end log-phase: {0:.2f} h &plusmn; {1:.2f}'.format(t1, t1_std) for x in range(n_iter)]
     y_0 = np.linspace(0, y0, n_iter)
     y_1 = np.linspace(0, y1, n_iter)    
 
     return x_0, y_0, x_1, y_1, hovertext_start, hovertext_end
-
-
-################################################
-# format nan for store
-################################################
-# np.nan value cannot be stored in serialized dict (get turned to None value), need to convert them to 'NaN' (a string)
-def format_value_for_store(x):
-    if ~np.isnan(x):
-        return x
-    else:
-        return 'NaN'
\ No newline at end of file
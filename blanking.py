@@ -0,0 +1,231 @@
+'''
+author: Michael A. Reiter
+(c) ETH Zurich, Michael A. Reiter, 2022
+
+This file is part of Dashing Growth Curves.
+
+Dashing Growth Curves is free software: you can redistribute it and/or modify it under the terms of the GNU General Public License as published by the Free Software Foundation, either version 3 of the License, or (at your option) any later version.
+
+Dashing Growth Curves is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License along with Dashing Growth Curves. If not, see <https://www.gnu.org/licenses/>.
+'''
+
+import hashlib
+import json
+import warnings
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+import default_settings as ds
+
+
+# blanked plates of the most recent requests (key: hash of data and blank assignment)
+_blanked_plate_cache = OrderedDict()
+
+
+################################################
+# blank groups
+################################################
+def blank_groups(blank_locs, sample_locations):
+    '''
+        Group samples by identical sets of blanks (usually most samples share the same few blanks)
+        - blank_locs: dict mapping sample locations to lists of blank names
+        - sample_locations: sample locations in the order of the data
+
+        Returns the list of distinct blank sets and the group index of every sample.
+    '''
+    group_ids = {}
+    group_idx = np.empty(len(sample_locations), dtype=int)
+    for i, sp in enumerate(sample_locations):
+        group_idx[i] = group_ids.setdefault(tuple(blank_locs[sp]), len(group_ids))
+    return list(group_ids), group_idx
+
+
+def blank_group_means(values, sample_names, groups):
+    # mean blank trace of every distinct blank set, NaN values are skipped (same as pandas mean)
+    sample_names = pd.Index(sample_names)
+    group_means = np.full((len(groups), values.shape[1]), np.nan)
+    for g, blanks in enumerate(groups):
+        if len(blanks) == 0:
+            continue
+        blank_idx = sample_names.get_indexer_for(list(blanks))
+        if (blank_idx < 0).any():
+            raise KeyError('blank(s) not found in sample names: {}'.format(list(blanks)))
+        blank_values = values[blank_idx]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            group_means[g] = np.nansum(blank_values, axis=0) / (~np.isnan(blank_values)).sum(axis=0)
+    return group_means
+
+
+################################################
+# blank models
+################################################
+def blank_wells(sample_names, blank_locs):
+    # blank wells: all samples used as blanks by any sample or named as blanks (e.g. 'blank 3')
+    sample_names = pd.Series(sample_names, dtype=str)
+    used_as_blank = sample_names.isin(set(b for blanks in blank_locs.values() for b in blanks))
+    named_as_blank = sample_names.str.split(r'[_ ]').str[0].isin(ds.accepted_blank_names)
+    return (used_as_blank | named_as_blank).values
+
+
+def plate_median_background(values, is_blank):
+    # median of all blank wells at every time point, same background for all samples
+    with warnings.catch_warnings():
+        # all-NaN time points stay NaN
+        warnings.simplefilter('ignore', RuntimeWarning)
+        plate_median = np.nanmedian(values[is_blank], axis=0)
+    return np.broadcast_to(plate_median, values.shape)
+
+
+def line_median_background(values, is_blank, plate_layout, axis):
+    '''
+        Median of the blank wells in the same plate row (axis=1) or column (axis=0) of every sample
+        - rows/columns without blanks and samples without plate position fall back to the plate median
+    '''
+    row_idx = plate_layout['row_idx']
+    col_idx = plate_layout['col_idx']
+    plate_median = plate_median_background(values, is_blank)[0]
+
+    # arrange blank traces on a (rows, columns, time points) grid, all other wells are NaN
+    on_plate = row_idx >= 0
+    blank_on_plate = is_blank & on_plate
+    grid = np.full((plate_layout['n_rows'], plate_layout['n_cols'], values.shape[1]), np.nan)
+    grid[row_idx[blank_on_plate], col_idx[blank_on_plate]] = values[blank_on_plate]
+
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore', RuntimeWarning)
+        line_median = np.nanmedian(grid, axis=axis)
+    line_median = np.where(np.isnan(line_median), plate_median, line_median)
+
+    background = np.tile(plate_median, (values.shape[0], 1))
+    line_idx = row_idx if axis == 1 else col_idx
+    background[on_plate] = line_median[line_idx[on_plate]]
+    return background
+
+
+def spatial_background(values, is_blank, plate_layout):
+    '''
+        Smooth spatial fit of the background across all blank wells
+        - at every time point a quadratic surface in plate row/column (plus an offset for edge wells, which evaporate faster)
+          is fit to the blank wells by least squares, all time points are solved in one lstsq call
+        - fewer terms are used if there are not enough blank wells to support the full model, terms that can't be estimated
+          from the blank positions (e.g. column terms if all blanks are in one column or in the two edge columns) are left
+          out, the background is then constant along them
+        - samples without plate position get the plate median
+    '''
+    row_idx = plate_layout['row_idx']
+    col_idx = plate_layout['col_idx']
+    on_plate = row_idx >= 0
+    blank_on_plate = is_blank & on_plate
+    plate_median = plate_median_background(values, is_blank)[0]
+    background = np.tile(plate_median, (values.shape[0], 1))
+    if blank_on_plate.sum() == 0:
+        return background
+
+    # plate coordinates scaled to [-1, 1]
+    r = 2 * row_idx / max(plate_layout['n_rows'] - 1, 1) - 1
+    c = 2 * col_idx / max(plate_layout['n_cols'] - 1, 1) - 1
+    edge = ((row_idx == 0) | (col_idx == 0) | (row_idx == plate_layout['n_rows'] - 1) | (col_idx == plate_layout['n_cols'] - 1)).astype(float)
+    terms = [np.ones_like(r), r, c, r**2, c**2, r * c]
+    n_blanks = blank_on_plate.sum()
+    if n_blanks >= 8:
+        terms = terms[:6]   # quadratic surface
+    elif n_blanks >= 3:
+        terms = terms[:3]   # plane
+    else:
+        terms = terms[:1]   # constant
+    if 0 < edge[blank_on_plate].sum() < blank_on_plate.sum():
+        # edge term can only be estimated if there are blanks both at the edge and inside the plate
+        terms.append(edge)
+
+    # a term is only kept if it's not constant or a combination of the terms before over the blank wells, else lstsq
+    # returns the minimum-norm solution, which extrapolates a wrong background away from the blanks
+    kept = []
+    for term in terms:
+        candidate = kept + [term]
+        if np.linalg.matrix_rank(np.stack(candidate, axis=1)[blank_on_plate]) == len(candidate):
+            kept = candidate
+    X = np.stack(kept, axis=1)
+
+    # missing blank measurements are replaced by the plate median
+    Y = values[blank_on_plate]
+    Y = np.where(np.isnan(Y), plate_median, Y)
+    coefficients, _, _, _ = np.linalg.lstsq(X[blank_on_plate], Y, rcond=None)
+
+    background[on_plate] = X[on_plate] @ coefficients
+    return background
+
+
+def model_background(values, sample_names, blank_locs, blank_model, plate_layout):
+    # background of every sample computed with one of the plate-wide blank models (see default_settings.blank_models)
+    is_blank = blank_wells(sample_names, blank_locs)
+    if (plate_layout is None) or (plate_layout['n_rows'] == 0) or (len(plate_layout['row_idx']) != values.shape[0]):
+        # without plate positions only the plate median can be computed
+        blank_model = 'Plate median'
+
+    if blank_model == 'Plate median':
+        return np.array(plate_median_background(values, is_blank))
+    elif blank_model == 'Row median':
+        return line_median_background(values, is_blank, plate_layout, axis=1)
+    elif blank_model == 'Column median':
+        return line_median_background(values, is_blank, plate_layout, axis=0)
+    elif blank_model == 'Spatial fit':
+        return spatial_background(values, is_blank, plate_layout)
+    else:
+        raise ValueError('unknown blank model: {}'.format(blank_model))
+
+
+################################################
+# blanked plate
+################################################
+def _cache_key(values, sample_names, blank_locs, sample_locations, blank_model, plate_layout):
+    h = hashlib.blake2b(np.ascontiguousarray(values).tobytes(), digest_size=16)
+    h.update(json.dumps([list(sample_names), [list(blank_locs[sp]) for sp in sample_locations], blank_model]).encode())
+    if plate_layout is not None:
+        h.update(np.asarray(plate_layout['row_idx']).tobytes() + np.asarray(plate_layout['col_idx']).tobytes())
+    return h.hexdigest()
+
+
+def blanked_plate(df, blank_locs, sample_locations, blank_model=ds.default_blank_model, plate_layout=None):
+    '''
+        Subtract the blanks from all samples at once
+        - df: data with sample names as index and time points as columns
+        - blank_locs: dict mapping sample locations to lists of blank names
+        - sample_locations: sample locations in the order of the data
+        - blank_model: one of default_settings.blank_models
+        - plate_layout: plate layout (see plate_layout.generate_plate_layout()), needed for row/column/spatial blank models
+
+        With the default model every distinct set of blanks is averaged once and the mean blank traces are subtracted from
+        the whole plate in one step, the other models compute the background of all samples from all blank wells.
+        Results are cached until the data, the blank assignment or the model change.
+
+        Returns the background trace of every sample and the blanked data (both as dataframes shaped like df).
+    '''
+    values = df.values.astype(float)
+    key = _cache_key(values, df.index, blank_locs, sample_locations, blank_model, plate_layout)
+
+    if key in _blanked_plate_cache:
+        _blanked_plate_cache.move_to_end(key)
+        blanks_mean, blanked = _blanked_plate_cache[key]
+    else:
+        if blank_model == 'Selected blanks':
+            groups, group_idx = blank_groups(blank_locs, sample_locations)
+            blanks_mean = blank_group_means(values, df.index, groups)[group_idx]
+        else:
+            blanks_mean = model_background(values, df.index, blank_locs, blank_model, plate_layout)
+        blanked = values - blanks_mean
+
+        # cached arrays are shared between requests
+        blanks_mean.flags.writeable = False
+        blanked.flags.writeable = False
+
+        _blanked_plate_cache[key] = (blanks_mean, blanked)
+        if len(_blanked_plate_cache) > ds.blanked_plate_cache_size:
+            _blanked_plate_cache.popitem(last=False)
+
+    blanks_mean = pd.DataFrame(blanks_mean, index=df.index, columns=df.columns)
+    blanked = pd.DataFrame(blanked, index=df.index, columns=df.columns)
+    return blanks_mean, blanked
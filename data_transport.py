@@ -0,0 +1,106 @@
+'''
+author: Michael A. Reiter
+(c) ETH Zurich, Michael A. Reiter, 2022
+
+This file is part of Dashing Growth Curves.
+
+Dashing Growth Curves is free software: you can redistribute it and/or modify it under the terms of the GNU General Public License as published by the Free Software Foundation, either version 3 of the License, or (at your option) any later version.
+
+Dashing Growth Curves is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License along with Dashing Growth Curves. If not, see <https://www.gnu.org/licenses/>.
+'''
+
+import base64
+import gzip
+
+import numpy as np
+import pandas as pd
+
+import default_settings as ds
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+
+################################################
+# arrays
+################################################
+def _compress(raw, compression):
+    if compression == 'zstd':
+        return zstandard.ZstdCompressor(level=ds.store_compression_level).compress(raw)
+    elif compression == 'gzip':
+        return gzip.compress(raw, compresslevel=ds.store_compression_level, mtime=0)
+    return raw
+
+
+def _decompress(raw, compression):
+    if compression == 'zstd':
+        return zstandard.ZstdDecompressor().decompress(raw)
+    elif compression == 'gzip':
+        return gzip.decompress(raw)
+    return raw
+
+
+def store_compression(compression=None):
+    # compression of the stores (zstd falls back to gzip if zstandard is not installed)
+    compression = ds.store_compression if compression is None else compression
+    if (compression == 'zstd') and (zstandard is None):
+        return 'gzip'
+    return compression
+
+
+def encode_array(array, dtype='<f8', compression=None):
+    '''
+        Array as base64 encoded little-endian bytes
+        - dtype: stored data type (e.g. '<f4' halves the size of measurements that don't need double precision)
+        - compression: None, 'gzip' or 'zstd'
+    '''
+    array = np.ascontiguousarray(np.asarray(array).astype(dtype))
+    raw = _compress(array.tobytes(), compression)
+    return {'dtype': dtype, 'shape': list(array.shape), 'compression': compression, 'data': base64.b64encode(raw).decode('ascii')}
+
+
+def decode_array(data):
+    # array from its encoded form (see encode_array()), writable
+    raw = _decompress(base64.b64decode(data['data']), data.get('compression'))
+    return np.frombuffer(raw, dtype=data['dtype']).reshape(data.get('shape', -1)).copy()
+
+
+################################################
+# plate data
+################################################
+def frame_for_store(df, dtype=None, compression=None):
+    '''
+        Plate data (sample names as index, time points as columns) for store_data_df and store_data_df_smoothed
+        - values as encoded array (see encode_array()), dtype and compression as set in default_settings if not given
+        - index and columns as lists
+
+        Values are kept in blocks of time points, new time points of live sessions are appended as new block
+        (see append_block()). Returns a dict.
+    '''
+    dtype = ds.store_float_dtype if dtype is None else dtype
+    return {
+            'index': df.index.tolist(),
+            'columns': df.columns.tolist(),
+            'blocks': [encode_array(df.values, dtype, store_compression(compression))],
+            }
+
+
+def append_block(patch, t_new, values_new, dtype=None, compression=None):
+    # add time points to a stored frame with a dash Patch (only the new block is sent to the browser)
+    dtype = ds.store_float_dtype if dtype is None else dtype
+    patch['columns'].extend(list(t_new))
+    patch['blocks'].append(encode_array(values_new, dtype, store_compression(compression)))
+    return patch
+
+
+def frame_from_store(data):
+    # plate data as DataFrame (float64) from its stored form (see frame_for_store())
+    if 'blocks' not in data:
+        # stores written with df.to_dict('tight')
+        return pd.DataFrame.from_dict(data, orient='tight')
+    values = np.hstack([decode_array(block).astype(float) for block in data['blocks']])
+    return pd.DataFrame(values, index=data['index'], columns=data['columns'])
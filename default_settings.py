@@ -17,6 +17,17 @@ You should have received a copy of the GNU General Public License along with Foo
 # app_name = 'GrowthRat0r'
 app_name = 'Dashing Growth Curves'
 
+################################################
+# supported plate formats (number of wells: (rows, columns))
+################################################
+plate_formats = {12: (3, 4),
+                 24: (4, 6),
+                 48: (6, 8),
+                 96: (8, 12),
+                 384: (16, 24),
+                 1536: (32, 48),
+                 }
+
 ################################################
 # accepted names for blank samples
 ################################################
@@ -28,6 +39,21 @@ accepted_blank_names = ['Blanks', 'Blank', 'blanks', 'blank']
 default_pop_size_measure = 'OD<sub>600</sub>'
 
 
+################################################
+# blank subtraction
+################################################
+blanked_plate_cache_size = 8    # number of blanked plates kept in memory (per process)
+
+# blank models: mean of the blanks selected for each sample or background computed from all blank wells on the plate
+blank_models = ['Selected blanks', 
+                'Row median', 
+                'Column median', 
+                'Plate median', 
+                'Spatial fit',
+                ]
+default_blank_model = 'Selected blanks'
+
+
 ################################################
 # data smoothing
 ################################################
@@ -47,6 +73,60 @@ auto_fit_default_weight = 25    # default weight of optimiation algorithm
 ################################################
 default_easy_linear_window_size = 20
 
+################################################
+# multi-phase fitting algorithm
+################################################
+multiphase_max_segments = 8             # max. number of segments of constant growth rate
+multiphase_penalty = 2                  # BIC penalty per additional segment (growth rate and change point)
+multiphase_min_growth_fraction = 0.3    # segments growing at least this fraction of the max. growth rate are growth phases
+
+################################################
+# live plate reads (streaming)
+################################################
+stream_poll_interval = 5000         # interval of checking live sessions for new time points [ms]
+stream_initial_capacity = 256       # preallocated time points per session (doubled when full)
+stream_max_sessions = 16            # max. number of live sessions, new sessions are refused when reached
+stream_session_expires = 3 * 24 * 3600  # time live sessions are kept after they were started [s]
+# growing csv exports can only be watched inside this directory (environment variable STREAM_WATCH_DIR), None: off
+stream_watch_dir = None
+# token of the HTTP feed (/stream API, header 'Authorization: Bearer <token>', environment variable STREAM_API_TOKEN),
+# None: the HTTP feed is off
+stream_api_token = None
+
+################################################
+# fitting backend
+################################################
+fitting_backend = 'auto'    # 'auto': compiled kernels if numba is installed, else NumPy/SciPy; 'numpy': always NumPy/SciPy
+fitting_max_iter = 1000     # max. iterations of the compiled Levenberg-Marquardt loop (SciPy is used if it doesn't converge)
+
+################################################
+# multi-start fitting (Gompertz and Logistic)
+################################################
+multistart_fitting = True           # refit failed or poor fits from multiple starting values
+multistart_rmse_threshold = 0.1     # fits with RMSE above this fraction of the range of the log data are refitted
+multistart_n_starts = 64            # starting values on a Latin hypercube over (N0, A, mu, lambda)
+multistart_n_local = 4              # number of best starting values refined by local fits
+multistart_maxfev = 10000           # max. function evaluations per local fit
+multistart_seed = 0                 # seed of the Latin hypercube (fixed for reproducible fits)
+
+################################################
+# robust fitting (Gompertz, Logistic and Easy Linear)
+################################################
+fit_losses = ['linear', 'soft_l1', 'huber', 'cauchy', 'arctan']  # loss functions of scipy's least_squares, 'linear': least squares
+default_fit_loss = 'linear'
+default_fit_loss_scale = 0.1        # residuals [log units] above this scale are down-weighted
+robust_irls_iter = 10               # reweighting iterations of the Easy Linear window regressions
+robust_maxfev = 2000                # max. function evaluations of robust Gompertz/Logistic fits
+outlier_weight_threshold = 0.5      # data points with lower weight are highlighted as outliers
+
+################################################
+# bootstrap confidence intervals
+################################################
+default_bootstrap_resamples = 0     # number of residual bootstrap resamples per sample (0: no bootstrap)
+bootstrap_ci_level = 95             # confidence level of percentile intervals [%]
+bootstrap_maxfev = 10000            # max. function evaluations per resample fit (fits are warm started from the point estimate)
+bootstrap_n_jobs = None             # number of processes fitting resamples in parallel (None: number of cores)
+
 ################################################
 # available automatic fitting algorithms
 ################################################
@@ -55,9 +135,102 @@ fittings_algorithms = ['Gompertz - tight',
                        'Logistic - tight', 
                        'Logistic - conventional', 
                        'Easy Linear',
-                       ]  #'Manual-like', 'Schnute', 'Richards'
+                       'Richards',
+                       'Schnute',
+                       'Best model',
+                       'Multi-phase',
+                       ]  #'Manual-like'
 default_fitting_algorithm = 'Gompertz - tight'
 
+# 'Best model': models fitted to every sample, the model with the lowest information criterion ('AIC' or 'BIC') is selected
+model_selection_candidates = ['Gompertz - tight', 'Logistic - tight', 'Easy Linear', 'Richards']
+model_selection_criterion = 'AIC'
+
+# algorithms using the window size setting (also needed if Easy Linear is a candidate of the automatic model selection, Multi-phase uses it as min. length of segments)
+window_size_algorithms = ['Easy Linear', 'Multi-phase'] + (['Best model'] if 'Easy Linear' in model_selection_candidates else [])
+
+# Richards and Schnute models (fitted with transformed parameters and analytic Jacobian, started from a Gompertz fit)
+shape_model_v_start = 0.1       # starting value of the shape parameter (Richards: v, Schnute: -v), close to the Gompertz limit v -> 0
+shape_model_maxfev = 2000       # max. function evaluations of the fit
+
+
+################################################
+# plate heat map
+################################################
+heatmap_parameters = {'growth rate': 'mumax',
+                      'lag time': 't0',
+                      'yield': 'yield',
+                      'doublings': 'doublings',
+                      'fit error': 'error',
+                      }
+default_heatmap_parameter = 'growth rate'
+heatmap_max_patched_wells = 50  # if more wells changed, the heat map is redrawn instead of updated well by well
+
+
+################################################
+# sample browser
+################################################
+# sample figures are shared by the server processes (see figure_cache.py)
+figure_cache_dir = './cache/figures'    # cached figures without Redis (no REDIS_URL)
+figure_cache_size_limit = 2**28     # size of the figure cache without Redis [bytes], least recently used figures are evicted
+figure_cache_expires = 3600         # time figures are kept after they were built [s]
+figure_cache_compression_level = 1  # zlib level of cached figures (JSON)
+figure_prefetch_workers = 2         # background threads building the figures of the next and previous sample
+
+
+################################################
+# data transport
+################################################
+store_float_dtype = '<f8'           # data type of the stored plate data ('<f4' halves the payloads, with single precision)
+store_compression = 'gzip'          # compression of the stored plate data (None, 'gzip' or 'zstd' if zstandard is installed)
+store_compression_level = 6
+
+
+################################################
+# shared plate cache
+################################################
+plate_cache_enabled = True          # decoded plates are shared between server processes as memory-mapped files
+plate_cache_dir = './cache/plates'
+plate_cache_max_files = 64          # max. number of cached plates (the least recently used is removed)
+plate_cache_max_attached = 8        # max. number of plates mapped by one server process
+
+
+################################################
+# background jobs (see worker/)
+################################################
+# queue of every task (see worker/tasks.py), single-well fits have their own queue so they don't wait for plate-wide jobs
+worker_task_queues = {
+                        'fit_sample': 'interactive',
+                        'bootstrap_sample': 'interactive',
+                        'autofit_plate': 'plate',
+                        'export_results': 'export',
+                        }
+worker_concurrency = 2              # processes of a Celery worker (environment variable WORKER_CONCURRENCY)
+worker_prefetch_multiplier = 1      # tasks reserved by a Celery worker process (environment variable WORKER_PREFETCH_MULTIPLIER)
+local_worker_processes = {'interactive': 1, 'plate': 2, 'export': 1}    # processes per queue without Celery (no REDIS_URL)
+job_cache_dir = './cache/jobs'      # status and results of jobs without Celery
+job_cache_size_limit = 2**30        # size of the job cache [bytes], least recently used results are evicted
+job_result_expires = 24 * 3600      # time status and results of jobs are kept (and reused by identical requests) [s]
+job_dedup_enabled = True            # identical requests (same plate, blanks and settings) get the job of the first one
+job_dedup_pending_timeout = 900     # queued jobs of identical requests are considered lost after this time [s]
+# with Redis, results are evicted by Redis if memory is full (maxmemory-policy volatile-lru evicts results before other keys)
+job_poll_interval = 500             # interval of checking the progress of jobs of the app (autofit, single-well fit, export) [ms]
+progress_update_interval = 0.2      # min. time between progress updates of a job [s] (one Redis write per update)
+job_lock_timeout = 10               # locks of the job bookkeeping are released after this time if their holder dies [s]
+
+# HTTP API for plate analysis (see job_api.py)
+job_api_max_running = 4             # jobs of the API running at the same time (environment variable JOB_API_MAX_RUNNING)
+job_api_retry_after = 30            # time clients are asked to wait if a job was not admitted [s]
+job_api_max_upload = 50 * 2**20     # max. size of uploaded plate files [bytes] (max. size of all requests of the server)
+# token of the API (header 'Authorization: Bearer <token>', environment variable JOB_API_TOKEN), None: the API is off
+job_api_token = None
+
+# Redis connections per process (see worker/connections.py), shared by the result backend and the server-side stores
+redis_max_connections = 8           # environment variable REDIS_MAX_CONNECTIONS
+redis_broker_pool_limit = 4         # connections kept open for sending tasks (kombu)
+redis_pool_timeout = 20             # time waiting for a free connection if all are in use [s]
+redis_health_check_interval = 30    # idle connections are checked before they are used again [s]
+
 
 ################################################
 # outgoing links
@@ -0,0 +1,174 @@
+'''
+author: Michael A. Reiter
+(c) ETH Zurich, Michael A. Reiter, 2022
+
+This file is part of Dashing Growth Curves.
+
+Dashing Growth Curves is free software: you can redistribute it and/or modify it under the terms of the GNU General Public License as published by the Free Software Foundation, either version 3 of the License, or (at your option) any later version.
+
+Dashing Growth Curves is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License along with Dashing Growth Curves. If not, see <https://www.gnu.org/licenses/>.
+'''
+
+import warnings
+from functools import partial
+
+import numpy as np
+
+import math_functions as mf
+
+
+# fitted parameters in the order of the parameter arrays and covariance matrices (NaN if not part of the model)
+parameter_names = ['N0', 'A', 'mu', 'l', 'v']
+
+# start and end of the exponential phase of the sigmoid models: t0 = l + a * A / mu, t1 = l + b * A / mu
+phase_factors = {
+                'Gompertz - tight': (0.014, 0.72),
+                'Gompertz - conventional': (0, 1),
+                'Logistic - tight': (0.17, 0.83),
+                'Logistic - conventional': (0, 1),
+                'Richards': (0, 1),
+                'Schnute': (0, 1),
+                }
+
+# fitting modes with the exponential phase given by a window of data points (start and end without uncertainty)
+window_modes = ['Manual', 'Manual-like', 'Easy Linear', 'Multi-phase']
+
+# relative step of the central differences
+_step = np.finfo(float).eps**(1/3)
+
+
+################################################
+# model quantities
+################################################
+def log_population(fitting_mode, t, N0, A, mu, l, v):
+    # log population size of a sigmoid model, all arguments can be arrays (one entry per well)
+    if 'Gompertz' in fitting_mode:
+        return mf.modified_gompertz(t, N0, A, mu, l)
+    elif 'Logistic' in fitting_mode:
+        return mf.modified_logistic(t, N0, A, mu, l)
+    elif fitting_mode == 'Richards':
+        return mf.modified_richards(t, N0, A, mu, l, v)
+    elif fitting_mode == 'Schnute':
+        return mf.modified_schnute(t, N0, A, mu, l, v)
+    raise ValueError('no sigmoid model: {}'.format(fitting_mode))
+
+
+def lag_parameter(fitting_mode, t0, A, mu):
+    # lag parameter (lambda) of a sigmoid model from the reported start of the exponential phase
+    a, _ = phase_factors[fitting_mode]
+    return t0 - a * A / mu
+
+
+def _sigmoid_phase(fitting_mode, p):
+    # start, end and doublings of the exponential phase of a sigmoid model (doublings between lambda and end)
+    N0, A, mu, l, v = p
+    a, b = phase_factors[fitting_mode]
+    t0 = l + a * A / mu
+    t1 = l + b * A / mu
+    doublings_log = (log_population(fitting_mode, t1, N0, A, mu, l, v) - log_population(fitting_mode, l, N0, A, mu, l, v)) / np.log(2)
+    return np.stack([t0, t1, doublings_log])
+
+
+def _window_phase(p, t_window):
+    # start, end and doublings of an exponential phase fitted in a window of data points
+    mu = p[2]
+    t0, t1 = t_window.T
+    return np.stack([t0, t1, mu * (t1 - t0) / np.log(2)])
+
+
+################################################
+# uncertainty propagation
+################################################
+def propagate(f, p, cov):
+    '''
+        First-order propagation of parameter uncertainties (as by the uncertainties package) for many wells at once
+        - f: function of the parameters (parameters, wells), returns the derived quantities (quantities, wells)
+        - p: parameters (parameters, wells)
+        - cov: covariance matrices of the parameters (wells, parameters, parameters), NaN entries are treated as zero
+
+        Derivatives are computed by central differences, only for parameters with non-zero variance.
+        Returns the derived quantities and their standard deviations.
+    '''
+    with np.errstate(all='ignore'):
+        value = f(p)
+        var_p = np.diagonal(cov, axis1=1, axis2=2).T
+        J = np.zeros((value.shape[0],) + p.shape)
+        for j in range(p.shape[0]):
+            uncertain = var_p[j] > 0
+            if not uncertain.any():
+                continue
+            h = np.where(uncertain, _step * np.where(p[j] != 0, np.abs(p[j]), 1), 0)
+            dp = np.zeros_like(p)
+            dp[j] = h
+            J[:, j] = np.where(uncertain, (f(p + dp) - f(p - dp)) / (2 * np.where(uncertain, h, 1)), 0)
+        var = np.einsum('kiw,wij,kjw->kw', J, np.nan_to_num(cov), J)
+    return value, np.sqrt(var)
+
+
+def derived_metrics(fitting_modes, params, cov, t_window=None):
+    '''
+        Growth parameters derived from the fitted parameters of many wells at once, with first-order uncertainties
+        - fitting_modes: fitting mode of every well (wells without fit are skipped)
+        - params: fitted N0, A, mu, l and v of every well, shaped (wells, 5), see parameter_names
+        - cov: covariance matrices (wells, 5, 5) or standard deviations (wells, 5) of the parameters
+        - t_window: start and end of the exponential phase of window fits (see window_modes), shaped (wells, 2)
+
+        Recomputing derived parameters (e.g. after changing their definition) doesn't require refitting.
+        Returns a dict of arrays (one entry per well): lag time (t0), end of exponential phase (t1), doubling time (dt),
+        doublings in the exponential phase (doublings_log) and their standard deviations (*_std), NaN without fit.
+    '''
+    fitting_modes = np.asarray(fitting_modes, dtype=object)
+    params = np.asarray(params, dtype=float).reshape(-1, len(parameter_names))
+    cov = np.asarray(cov, dtype=float)
+    if cov.ndim == 2:
+        # independent parameters
+        cov = cov[:, :, None]**2 * np.eye(len(parameter_names))
+    n_wells = params.shape[0]
+    t_window = np.full((n_wells, 2), np.nan) if t_window is None else np.asarray(t_window, dtype=float).reshape(n_wells, 2)
+
+    values = np.full((3, n_wells), np.nan)
+    stds = np.full((3, n_wells), np.nan)
+    for mode in set(fitting_modes):
+        wells = fitting_modes == mode
+        if mode in window_modes:
+            f = partial(_window_phase, t_window=t_window[wells])
+        elif mode in phase_factors:
+            f = partial(_sigmoid_phase, mode)
+        else:
+            continue
+        values[:, wells], stds[:, wells] = propagate(f, params[wells].T, cov[wells])
+
+    # doubling time
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mu = params[:, 2]
+        dt = np.log(2) / mu
+        dt_std = np.log(2) * np.sqrt(cov[:, 2, 2]) / mu**2
+
+    return {
+            't0': values[0], 't0_std': stds[0],
+            't1': values[1], 't1_std': stds[1],
+            'dt': dt, 'dt_std': dt_std,
+            'doublings_log': values[2], 'doublings_log_std': stds[2],
+            }
+
+
+################################################
+# measured quantities
+################################################
+def measured_metrics(traces):
+    '''
+        Yield and doublings of many blanked traces at once (measured values without uncertainty)
+        - traces: blanked data (wells, time points)
+
+        Returns the yield (max. measurement) and the doublings between the smallest positive and the largest measurement.
+    '''
+    traces = np.asarray(traces, dtype=float)
+    with warnings.catch_warnings(), np.errstate(divide='ignore', invalid='ignore'):
+        # wells without positive measurements stay NaN
+        warnings.simplefilter('ignore', RuntimeWarning)
+        y_max = np.nanmax(traces, axis=1)
+        y_min = np.nanmin(np.where(traces > 0, traces, np.nan), axis=1)
+        doublings = np.log2(y_max / y_min)
+    return y_max, doublings
@@ -0,0 +1,143 @@
+'''
+author: Michael A. Reiter
+(c) ETH Zurich, Michael A. Reiter, 2022
+
+This file is part of Dashing Growth Curves.
+
+Dashing Growth Curves is free software: you can redistribute it and/or modify it under the terms of the GNU General Public License as published by the Free Software Foundation, either version 3 of the License, or (at your option) any later version.
+
+Dashing Growth Curves is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License along with Dashing Growth Curves. If not, see <https://www.gnu.org/licenses/>.
+'''
+
+import hashlib
+import json
+import os
+import pickle
+import threading
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+import default_settings as ds
+
+
+# sample figures of all sessions, shared by the server processes (the next request of a session is usually served by
+# another gunicorn worker): Redis if REDIS_URL is set (see worker/connections.py, entries expire after
+# ds.figure_cache_expires, Redis evicts them first if its memory is full), else a diskcache in ds.figure_cache_dir of at
+# most ds.figure_cache_size_limit bytes (least recently used figures are evicted)
+use_redis = 'REDIS_URL' in os.environ
+
+# diskcache of this process, opened on first use in every process (not inherited from the gunicorn master)
+_cache = None
+_pid = None
+_lock = threading.Lock()
+
+# figures being built by the prefetch threads of this process
+_pending = set()
+_executor = ThreadPoolExecutor(max_workers=ds.figure_prefetch_workers)
+
+
+def _disk_cache():
+    global _cache, _pid
+    with _lock:
+        if _pid != os.getpid():
+            import diskcache
+            _cache = diskcache.Cache(ds.figure_cache_dir, size_limit=ds.figure_cache_size_limit, eviction_policy='least-recently-used')
+            _pid = os.getpid()
+        return _cache
+
+
+################################################
+# cache keys
+################################################
+def version(*parts):
+    # content hash of the data a figure depends on (e.g. data version: plate data and blanks, fit version: growth parameters of a well)
+    return hashlib.blake2b(pickle.dumps(parts, protocol=4), digest_size=16).hexdigest()
+
+
+def figure_key(sample_location, data_version, fit_version):
+    return (sample_location, data_version, fit_version)
+
+
+def _store_key(session_id, key):
+    return 'growthdash:figures:' + version(session_id, key)
+
+
+################################################
+# cache
+################################################
+def _encode(figures):
+    # figures as compressed JSON (plotly's encoding, the same as sent to the browser)
+    from plotly.utils import PlotlyJSONEncoder
+    return zlib.compress(json.dumps(list(figures), cls=PlotlyJSONEncoder).encode(), ds.figure_cache_compression_level)
+
+
+def _decode(value):
+    # figures as dicts (Dash takes them as figure property)
+    return json.loads(zlib.decompress(value))
+
+
+def get(session_id, key):
+    # cached figures (None if not cached), marks the figures as recently used
+    if session_id is None:
+        return None
+    if use_redis:
+        from worker import connections
+        value = connections.redis_client().get(_store_key(session_id, key))
+    else:
+        value = _disk_cache().get(_store_key(session_id, key))
+    return None if value is None else _decode(value)
+
+
+def put(session_id, key, value):
+    # store figures, the least recently used figures are dropped if the cache is full
+    if session_id is None:
+        return
+    if use_redis:
+        from worker import connections
+        connections.redis_client().set(_store_key(session_id, key), _encode(value), ex=ds.figure_cache_expires)
+        return
+    _disk_cache().set(_store_key(session_id, key), _encode(value), expire=ds.figure_cache_expires)
+
+
+def _contains(session_id, key):
+    if use_redis:
+        from worker import connections
+        return connections.redis_client().exists(_store_key(session_id, key)) > 0
+    return _store_key(session_id, key) in _disk_cache()
+
+
+def prefetch(session_id, keys, build):
+    '''
+        Build the figures of wells the user is likely to look at next in a background thread
+        - keys: cache keys of the figures (see figure_key()), keys that are cached or already being built are skipped
+        - build: function building the figures of one key, it is called in the background thread
+    '''
+    if session_id is None:
+        return
+    with _lock:
+        keys = [key for key in keys if (session_id, key) not in _pending]
+        _pending.update((session_id, key) for key in keys)
+    if len(keys) > 0:
+        _executor.submit(_build_all, session_id, keys, build)
+
+
+def _build_all(session_id, keys, build):
+    try:
+        for key in keys:
+            if not _contains(session_id, key):
+                put(session_id, key, build(key))
+    finally:
+        with _lock:
+            _pending.difference_update((session_id, key) for key in keys)
+
+
+def after_fork():
+    # the diskcache of the gunicorn master (--preload) is not shared by the forked workers, it's reopened on first use
+    global _cache, _pid
+    with _lock:
+        if _cache is not None:
+            _cache.close()
+        _cache = None
+        _pid = None
@@ -0,0 +1,292 @@
+'''
+author: Michael A. Reiter
+(c) ETH Zurich, Michael A. Reiter, 2022
+
+This file is part of Dashing Growth Curves.
+
+Dashing Growth Curves is free software: you can redistribute it and/or modify it under the terms of the GNU General Public License as published by the Free Software Foundation, either version 3 of the License, or (at your option) any later version.
+
+Dashing Growth Curves is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License along with Dashing Growth Curves. If not, see <https://www.gnu.org/licenses/>.
+'''
+
+import importlib.util
+import threading
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+from scipy.optimize import curve_fit
+
+import math_functions as mf
+import default_settings as ds
+
+# numba is optional, without it the NumPy/SciPy implementations are used
+# it's imported and the kernels are compiled on first use (see _compile()), processes that don't fit don't load it
+numba_available = importlib.util.find_spec('numba') is not None
+_compiled = False
+_compile_lock = threading.Lock()
+
+
+def _select_backend(requested):
+    if requested == 'numpy' or not numba_available:
+        return 'numpy'
+    return 'numba'
+
+# fitting backend used by auto_fitting ('numba' or 'numpy')
+backend = _select_backend(ds.fitting_backend)
+
+
+################################################
+# rolling regression (Easy Linear)
+################################################
+def rolling_regression_numpy(x, y, ws):
+    '''
+        Least squares line through every window of ws consecutive data points (windows starting at 0 ... len(y) - ws - 1)
+        - x, y: time points and log population size
+
+        Returns slope, intercept, their standard errors (same as scipy's curve_fit) and R2 of every window.
+    '''
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    n_windows = y.shape[0] - ws
+    xw = sliding_window_view(x, ws)[:n_windows]
+    yw = sliding_window_view(y, ws)[:n_windows]
+
+    # centered sums are numerically stable for large time values
+    x_mean = xw.mean(axis=1)
+    y_mean = yw.mean(axis=1)
+    dx = xw - x_mean[:, None]
+    dy = yw - y_mean[:, None]
+    sxx = np.einsum('ij,ij->i', dx, dx)
+    sxy = np.einsum('ij,ij->i', dx, dy)
+    syy = np.einsum('ij,ij->i', dy, dy)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        slope = sxy / sxx
+        intercept = y_mean - slope * x_mean
+        rss = np.maximum(syy - slope * sxy, 0)
+        s2 = rss / (ws - 2)
+        slope_std = np.sqrt(s2 / sxx)
+        intercept_std = np.sqrt(s2 * (1 / ws + x_mean**2 / sxx))
+        r2 = 1 - rss / syy
+    return slope, intercept, slope_std, intercept_std, r2
+
+
+def _rolling_regression_loops(x, y, ws):
+    # same as rolling_regression_numpy(), written as loops for compilation with numba
+    n_windows = y.shape[0] - ws
+    slope = np.empty(n_windows)
+    intercept = np.empty(n_windows)
+    slope_std = np.empty(n_windows)
+    intercept_std = np.empty(n_windows)
+    r2 = np.empty(n_windows)
+    for i in range(n_windows):
+        x_mean = 0.0
+        y_mean = 0.0
+        for j in range(i, i + ws):
+            x_mean += x[j]
+            y_mean += y[j]
+        x_mean /= ws
+        y_mean /= ws
+        sxx = 0.0
+        sxy = 0.0
+        syy = 0.0
+        for j in range(i, i + ws):
+            sxx += (x[j] - x_mean) * (x[j] - x_mean)
+            sxy += (x[j] - x_mean) * (y[j] - y_mean)
+            syy += (y[j] - y_mean) * (y[j] - y_mean)
+        slope[i] = sxy / sxx
+        intercept[i] = y_mean - slope[i] * x_mean
+        rss = max(syy - slope[i] * sxy, 0.0)
+        s2 = rss / (ws - 2)
+        slope_std[i] = np.sqrt(s2 / sxx)
+        intercept_std[i] = np.sqrt(s2 * (1 / ws + x_mean * x_mean / sxx))
+        r2[i] = 1 - rss / syy
+    return slope, intercept, slope_std, intercept_std, r2
+
+
+def rolling_regression_robust(x, y, ws, loss, f_scale, n_iter):
+    '''
+        Robust version of rolling_regression_numpy(): iteratively reweighted least squares line through every window,
+        weights are recomputed from the residuals of each window (see math_functions.robust_weights()) n_iter times
+
+        Returns slope, intercept, their standard errors, (weighted) R2 and the weights of every window.
+    '''
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    n_windows = y.shape[0] - ws
+    xw = sliding_window_view(x, ws)[:n_windows]
+    yw = sliding_window_view(y, ws)[:n_windows]
+    w = np.ones(xw.shape)
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        for i in range(n_iter + 1):
+            sw = w.sum(axis=1)
+            x_mean = np.einsum('ij,ij->i', w, xw) / sw
+            y_mean = np.einsum('ij,ij->i', w, yw) / sw
+            dx = xw - x_mean[:, None]
+            dy = yw - y_mean[:, None]
+            sxx = np.einsum('ij,ij,ij->i', w, dx, dx)
+            sxy = np.einsum('ij,ij,ij->i', w, dx, dy)
+            slope = sxy / sxx
+            residuals = dy - slope[:, None] * dx
+            if i < n_iter:
+                w = mf.robust_weights(residuals, loss, f_scale)
+
+        intercept = y_mean - slope * x_mean
+        rss = np.einsum('ij,ij,ij->i', w, residuals, residuals)
+        s2 = rss / (ws - 2)
+        slope_std = np.sqrt(s2 / sxx)
+        intercept_std = np.sqrt(s2 * (1 / sw + x_mean**2 / sxx))
+        r2 = 1 - rss / np.einsum('ij,ij,ij->i', w, dy, dy)
+    return slope, intercept, slope_std, intercept_std, r2, w
+
+
+################################################
+# sigmoid models: residuals, Jacobian and Levenberg-Marquardt
+################################################
+# parameters p = (N0, A, mu, l), y = log population size
+def _gompertz_residuals_jacobian(x, y, p, r, J):
+    N0, A, mu, l = p[0], p[1], p[2], p[3]
+    rate = mu * np.e / A
+    for i in range(x.shape[0]):
+        E = np.exp(min(rate * (l - x[i]) + 1, mf.EXP_MAX))
+        G = np.exp(-E)
+        r[i] = np.log(N0) + A * G - y[i]
+        J[i, 0] = 1 / N0
+        J[i, 1] = G + G * E * rate * (l - x[i])
+        J[i, 2] = - G * E * np.e * (l - x[i])
+        J[i, 3] = - G * E * rate * A
+
+
+def _logistic_residuals_jacobian(x, y, p, r, J):
+    N0, A, mu, l = p[0], p[1], p[2], p[3]
+    rate = 4 * mu / A
+    for i in range(x.shape[0]):
+        z = rate * (l - x[i]) + 2
+        # expit(-z), evaluated without overflow
+        if z >= 0:
+            S = np.exp(-z) / (1 + np.exp(-z))
+        else:
+            S = 1 / (1 + np.exp(z))
+        r[i] = np.log(N0) + A * S - y[i]
+        J[i, 0] = 1 / N0
+        J[i, 1] = S + S * (1 - S) * rate * (l - x[i])
+        J[i, 2] = - 4 * S * (1 - S) * (l - x[i])
+        J[i, 3] = - S * (1 - S) * rate * A
+
+
+def _residuals_jacobian(model, x, y, p, r, J):
+    # model: 0 Gompertz, 1 Logistic (compiled functions can't be passed to cached compiled functions)
+    if model == 0:
+        _gompertz_residuals_jacobian(x, y, p, r, J)
+    else:
+        _logistic_residuals_jacobian(x, y, p, r, J)
+
+
+def _levenberg_marquardt(model, x, y, p0, lower, max_iter):
+    '''
+        Small Levenberg-Marquardt loop for 4-parameter models, parameters are projected onto their lower bounds
+        - model: 0 Gompertz, 1 Logistic
+        Returns the fitted parameters, the Jacobian and residuals at the solution and a convergence flag.
+    '''
+    n = x.shape[0]
+    p = p0.copy()
+    r = np.empty(n)
+    J = np.empty((n, 4))
+    r_new = np.empty(n)
+    J_new = np.empty((n, 4))
+    _residuals_jacobian(model, x, y, p, r, J)
+    cost = np.sum(r * r)
+    damping = 1e-3
+    converged = False
+    for _ in range(max_iter):
+        JtJ = J.T @ J
+        g = J.T @ r
+        M = JtJ.copy()
+        for k in range(4):
+            M[k, k] += damping * max(JtJ[k, k], 1e-12)
+        step = np.linalg.solve(M, -g)
+        p_new = p + step
+        for k in range(4):
+            p_new[k] = max(p_new[k], lower[k])
+        _residuals_jacobian(model, x, y, p_new, r_new, J_new)
+        cost_new = np.sum(r_new * r_new)
+        if np.isfinite(cost_new) and (cost_new < cost):
+            small_step = np.sqrt(np.sum((p_new - p)**2)) <= 1e-10 * (np.sqrt(np.sum(p * p)) + 1e-10)
+            small_decrease = (cost - cost_new) <= 1e-12 * cost
+            p[:] = p_new
+            r[:] = r_new
+            J[:, :] = J_new
+            cost = cost_new
+            damping = max(damping / 10, 1e-12)
+            if small_step or small_decrease:
+                converged = True
+                break
+        else:
+            damping *= 10
+            if damping > 1e12:
+                # no further decrease possible, i.e. at a minimum
+                converged = True
+                break
+    return p, J, r, converged
+
+
+def _compile():
+    # replace the kernels by their compiled versions (kernels calling each other are resolved when they're compiled)
+    global _compiled, _rolling_regression_loops, _gompertz_residuals_jacobian, _logistic_residuals_jacobian, _residuals_jacobian, _levenberg_marquardt
+    with _compile_lock:
+        if _compiled:
+            return
+        import numba
+        _rolling_regression_loops = numba.njit(cache=True)(_rolling_regression_loops)
+        _gompertz_residuals_jacobian = numba.njit(cache=True)(_gompertz_residuals_jacobian)
+        _logistic_residuals_jacobian = numba.njit(cache=True)(_logistic_residuals_jacobian)
+        _residuals_jacobian = numba.njit(cache=True)(_residuals_jacobian)
+        _levenberg_marquardt = numba.njit(cache=True)(_levenberg_marquardt)
+        _compiled = True
+
+
+################################################
+# backend dispatch
+################################################
+def rolling_regression(x, y, ws, backend=None):
+    # rolling regression of the selected backend (see rolling_regression_numpy())
+    if (backend or globals()['backend']) == 'numba':
+        _compile()
+        return _rolling_regression_loops(np.ascontiguousarray(x, dtype=float), np.ascontiguousarray(y, dtype=float), int(ws))
+    return rolling_regression_numpy(x, y, ws)
+
+
+def fit_sigmoid(model, x, y, p0, bounds, maxfev, backend=None, loss='linear', f_scale=1.0):
+    '''
+        Fit a Gompertz or Logistic model (model: 'Gompertz' or 'Logistic') to log population size y
+        - numba backend: compiled Levenberg-Marquardt loop with analytic Jacobian (parameters projected onto lower bounds),
+          falls back to curve_fit if the loop doesn't converge or ends on a bound
+        - numpy backend: scipy's curve_fit (trust region reflective)
+        - loss, f_scale: robust loss of scipy's least_squares, robust fits always use curve_fit
+
+        Returns parameters and covariance matrix like curve_fit, raises RuntimeError if the fit didn't converge.
+    '''
+    model_function = mf.modified_gompertz if model == 'Gompertz' else mf.modified_logistic
+    if loss != 'linear':
+        # robust losses are flat for outliers, ill-posed fits can iterate for very long without a cap
+        return curve_fit(model_function, x, y, p0=p0, bounds=bounds, maxfev=min(maxfev, ds.robust_maxfev), loss=loss, f_scale=f_scale)
+    if (backend or globals()['backend']) == 'numpy':
+        return curve_fit(model_function, x, y, p0=p0, bounds=bounds, maxfev=maxfev)
+
+    _compile()
+    x = np.ascontiguousarray(x, dtype=float)
+    y = np.ascontiguousarray(y, dtype=float)
+    # log(N0) needs N0 > 0, A is kept away from zero (growth rate is scaled by 1 / A)
+    lower = np.maximum(np.asarray(bounds[0], dtype=float), [1e-300, 1e-12, 0, -np.inf])
+    popt, J, r, converged = _levenberg_marquardt(0 if model == 'Gompertz' else 1, x, y, np.asarray(p0, dtype=float), lower, ds.fitting_max_iter)
+    # solutions on a bound (e.g. mu = 0) are left to curve_fit, which keeps parameters strictly inside the bounds
+    if not converged or not np.isfinite(popt).all() or (popt <= lower).any():
+        return curve_fit(model_function, x, y, p0=p0, bounds=bounds, maxfev=maxfev)
+
+    # covariance of the parameters as computed by curve_fit
+    with np.errstate(divide='ignore', invalid='ignore'):
+        pcov = np.linalg.pinv(J.T @ J) * np.sum(r * r) / (x.shape[0] - popt.shape[0])
+    return popt, pcov
@@ -13,33 +13,13 @@ You should have received a copy of the GNU General Public License along with Das
 
 import ast
 from os import lstat
-from dash import Dash, html, dcc, Output, Input, State
+from dash import Dash, html, dcc, Output, Input, State, ClientsideFunction, callback, clientside_callback
 import dash_bootstrap_components as dbc
-import pandas as pd
-import numpy as np
-import uncertainties as uc
-from uncertainties import unumpy as ucn
-from scipy.optimize import curve_fit
 import dash
-from string import ascii_uppercase
-import auto_fitting
 
 
-import math_functions as mf
-import auxilliary_functions as ax
-import default_settings as ds
-
-
-
-def format_growth_rate_values(growth_rate_data_sp):
-    # nan values can't be stored in serialized dicts in Dash stores, that's why they are stored as strings and upon retrieval are converted into np.nan
-    growth_rate_data_sp_formatted = {}
-    for key in growth_rate_data_sp:
-        if growth_rate_data_sp[key] == 'NaN':
-            growth_rate_data_sp_formatted[key] = np.nan
-        else:
-            growth_rate_data_sp_formatted[key] = growth_rate_data_sp[key]
-    return growth_rate_data_sp_formatted
+import worker.jobs as jb
+import messages as ms
 
 
 
@@ -52,7 +32,7 @@ def format_output_strings(mu, mu_std, dt, dt_std, t0, t0_std, doublings, doublin
     out_doublings_log = dcc.Markdown('doublings in log-phase = {0:.2f} &plusmn; {1:.2f}'.format(doublings_log, doublings_log_std))
     out_yield = dcc.Markdown('yield \[{0}\] = {1:.2f}'.format(pop_size_measure, maxOD), dangerously_allow_html=True)
     
-    if (fitting_mode == 'Manual') or (fitting_mode == 'Manual-like') or (fitting_mode == 'Easy Linear'):
+    if fitting_mode in ['Manual', 'Manual-like', 'Easy Linear', 'Multi-phase']:
         out_error = dcc.Markdown('R<sup>2</sup> = {0:.3f}'.format(error), dangerously_allow_html=True)
     else:
         out_error = dcc.Markdown('RMSE = {0:.3f}'.format(error))
@@ -60,535 +40,438 @@ def format_output_strings(mu, mu_std, dt, dt_std, t0, t0_std, doublings, doublin
 
 
 
+def format_row_output_strings(row, pop_size_measure):
+    # format the growth parameters of one sample (see results_table.sample_row()) for display in UI
+    return format_output_strings(row['mumax'], row['mumax_std'], row['dt'], row['dt_std'], row['t0'], row['t0_std'],
+                                 row['doublings'], row['doublings_log'], row['doublings_log_std'], row['yield'], row['error'],
+                                 row['fitting_mode'], pop_size_measure)
+
+
+
+def blanked_sample(df, df_smoothed, smoother_flag, sample_names, blank_locs, sample_locations, blank_model, plate_layout, sample_idx):
+    import plate_layout as lay
+    import blanking as blk
+    import plate_cache as pc
+
+    # time points and blanked trace of one sample (raw or smoothed data, blanks of the whole plate)
+    df = pc.frame_from_store(df_smoothed if smoother_flag else df)
+    df.index = sample_names
+    if plate_layout is not None:
+        plate_layout = lay.layout_from_store(plate_layout)
+    blanks_mean, df_blanked = blk.blanked_plate(df, blank_locs, sample_locations, blank_model, plate_layout)
+    return df.columns.tolist(), df_blanked.iloc[sample_idx].rename(None)
+
+
+################################################
+# callbacks
+################################################
+# registered with dash.callback, the app picks them up when it's created (see app.create_app())
+@callback(
+                Output('growth_rate', 'children'),
+                Output('doubling_time', 'children'),
+                Output('lag_time', 'children'),
+                Output('doublings', 'children'),
+                Output('doublings_log', 'children'),
+                Output('yield', 'children'),
+                Output('error', 'children'),
+                Output('store_growth_data', 'data'),
+                Output('message_area_fits', 'children'),
+                Input('store_upload_flag', 'data'),
+                Input('store_sample_names', 'data'),
+                Input('fig_log', 'clickData'),
+                Input('store_growth_data_auto', 'data'),
+                State('store_growth_data', 'data'),
+                State('store_plate_meta', 'data'),
+                State('store_sample_locations', 'data'),
+                State('store_sample_idx', 'data'),
+                State('store_default_popsizemeasure', 'data'),
+                # background = True,
+
+                prevent_initial_call = True
+)
+def growth_data(upload_flag, sample_names, click_data, growth_data_auto, growth_rate_data, plate_meta, sample_locations, sample_idx, pop_size_measure):
+    import results_table as rt
+
+    # growth data store changes that don't need the plate data (the manual fit is computed in manual_fit())
+    if plate_meta is None:
+        return dash.no_update, dash.no_update, dash.no_update, dash.no_update, dash.no_update, dash.no_update, dash.no_update, dash.no_update, ''
+
+    # growth parameters are stored as columnar table (see results_table)
+    if growth_rate_data is not None:
+        growth_rate_data = rt.table_from_store(growth_rate_data)
+
+    # initialize growth data store
+    if dash.callback_context.triggered[0]['prop_id'] == 'store_upload_flag.data':
+        growth_rate_data = rt.new_table(plate_meta['sample_locations'], plate_meta['sample_names'])
+        return dash.no_update, dash.no_update, dash.no_update, dash.no_update, dash.no_update, dash.no_update, dash.no_update, rt.table_for_store(growth_rate_data), ''
+
+    # change sample name
+    elif dash.callback_context.triggered[0]['prop_id'] == 'store_sample_names.data':
+        growth_rate_data['sample_name'][:] = list(sample_names)
+        return dash.no_update, dash.no_update, dash.no_update, dash.no_update, dash.no_update, dash.no_update, dash.no_update, rt.table_for_store(growth_rate_data), ''
+
+    # exclude or include sample in analysis
+    elif dash.callback_context.triggered[0]['prop_id'] == 'fig_log.clickData':
+        growth_rate_data['excluded_flag'][sample_idx] = not growth_rate_data['excluded_flag'][sample_idx]
+        return dash.no_update, dash.no_update, dash.no_update, dash.no_update, dash.no_update, dash.no_update, dash.no_update, rt.table_for_store(growth_rate_data), ''
+
+    # get autofit data (the job only holds its fits, it may be shared with identical requests, see worker/jobs.py)
+    elif dash.callback_context.triggered[0]['prop_id'] == 'store_growth_data_auto.data':
+        growth_rate_data = rt.merge_fits(growth_rate_data, rt.table_from_store(growth_data_auto))
+        current_sample_position = sample_locations[sample_idx]
+        out_growth_rate, out_doubling_time, out_lag_time, out_doublings, out_doublings_log, out_yield, out_error = \
+            format_row_output_strings(rt.sample_row(growth_rate_data, current_sample_position), pop_size_measure)
+        return out_growth_rate, out_doubling_time, out_lag_time, out_doublings, out_doublings_log, out_yield, out_error, rt.table_for_store(growth_rate_data), ''
 
-def add_to_growth_data_dict(growth_data_data_sp, 
-                            t0='NaN', t0_std='NaN', t0_idx='NaN',
-                            t1='NaN', t1_std='NaN', t1_idx='NaN',
-                            # lambda='NaN', lambda_std='NaN',
-                            mumax='NaN', mumax_std='NaN',
-                            doublingslog='NaN', doublingslog_std='NaN',
-                            dt='NaN', dt_std='NaN',
-                            A='NaN', A_std='NaN',
-                            N0='NaN', N0_std='NaN',
-                            doublings='NaN', 
-                            Yield='NaN',
-                            error='NaN',
-                            fitting_mode='NaN',
-                            smoothing_window='NaN'
-                            ):
-
-    # lag time, i.e. beginning of logistic growth phase (if growth curve was fitted manually, no error associated with lag time)
-    growth_data_data_sp['t0'] = t0
-    growth_data_data_sp['t0_std'] = t0_std
-    growth_data_data_sp['t0_idx'] = t0_idx
-
-    # end of logistic growth phase
-    growth_data_data_sp['t1'] = t1
-    growth_data_data_sp['t1_std'] = t1_std
-    growth_data_data_sp['t1_idx'] = t1_idx
-
-    # max growth rate
-    growth_data_data_sp['mumax'] = mumax
-    growth_data_data_sp['mumax_std'] = mumax_std
-
-    # doubling time
-    growth_data_data_sp['dt'] = dt
-    growth_data_data_sp['dt_std'] = dt_std
-
-    # doublings in logarithmic growth phase
-    growth_data_data_sp['doublings_log'] = doublingslog
-    growth_data_data_sp['doublings_log_std'] = doublingslog_std
-
-    # log carrying capacity
-    growth_data_data_sp['A'] = A
-    growth_data_data_sp['A_std'] = A_std
-
-    # initial population size
-    growth_data_data_sp['N0'] = N0
-    growth_data_data_sp['N0_std'] = N0_std
-
-    # doublings between lowest and highest measured OD
-    growth_data_data_sp['doublings'] = doublings
-
-    # max. measures OD
-    growth_data_data_sp['yield'] = Yield
-
-    # error measure: R2 or RMSE
-    growth_data_data_sp['error'] = error
-
-    # fitting mode used to gather data
-    growth_data_data_sp['fitting_mode'] = fitting_mode
-
-    # data smoothing window size
-    growth_data_data_sp['smoothing_window'] = smoothing_window
-
-    return growth_data_data_sp
-
-
-
-def register_gd_callbacks(app):
-    # callbacks in a file separate from main app need to be registered separately
-    @app.callback(
-                    Output('growth_rate', 'children'),
-                    Output('doubling_time', 'children'),
-                    Output('lag_time', 'children'),
-                    Output('doublings', 'children'),
-                    Output('doublings_log', 'children'),
-                    Output('yield', 'children'),
-                    Output('error', 'children'),
-                    Output('store_growth_data', 'data'),
-                    Output('message_area_fits', 'children'),
-                    Input('fig_log', 'selectedData'),
-                    Input('store_upload_flag', 'data'),
-                    Input('store_sample_idx', 'data'),
-                    Input('store_sample_names', 'data'),
-                    Input('fig_log', 'clickData'),
-                    Input('store_growth_data_auto', 'data'),
-                    Input('store_default_popsizemeasure', 'data'),
-                    State('store_growth_data', 'data'),
-                    State('store_data_df', 'data'),
-                    State('store_data_df_smoothed', 'data'),
-                    State('store_smoother_flag', 'data'),
-                    State('store_blank_locs', 'data'),
-                    State('store_sample_locations', 'data'),
-                    State('store_smoother_value', 'data'),
-                    # background = True,
-
-                    prevent_initial_call = True
-    )
-    def growth_data(selected_data, upload_flag, sample_idx, sample_names, click_data, growth_data_auto, pop_size_measure, growth_rate_data, df, df_smoothed, smoother_flag, blank_locs, sample_locations, smoother_ws):
-        if df is None:
-            return dash.no_update, dash.no_update, dash.no_update, dash.no_update, dash.no_update, dash.no_update, dash.no_update, dash.no_update, ''
-
-        # load data
-        if smoother_flag == False:
-            df = pd.DataFrame.from_dict(df, orient='tight')
-        else:
-            df = pd.DataFrame.from_dict(df_smoothed, orient='tight')
-
-
-        # initialize growth data store
-        if dash.callback_context.triggered[0]['prop_id'] == 'store_upload_flag.data':
-            sample_locations = ax.set_sample_locations(df)
-            sample_names = df.index
-            growth_rate_data = {}
-            for idx, s in enumerate(sample_locations):
-                growth_rate_data[s] = {'sample_name': df.index[idx], 
-                                        'excluded_flag': False, 
-                                        'fitting_mode': 'NaN',
-                                        't0': 'NaN', 't1': 'NaN', 
-                                        't0_std': 'NaN', 't1_std': 'NaN',
-                                        't0_idx': 'NaN', 't1_idx': 'NaN', 'n0': 'NaN', 
-                                        # 'lambda': 'NaN', 'lambda_std': 'NaN',
-                                        'mumax': 'NaN', 'mumax_std': 'NaN', 
-                                        'dt': 'NaN', 'dt_std': 'NaN', 
-                                        'doublings': 'NaN', 
-                                        'doublings_log': 'NaN', 'doublings_log_std': 'NaN',
-                                        'yield': 'NaN',
-                                        'v': 'NaN', 'v_std': 'NaN',
-                                        'A': 'NaN', 
-                                        'error': 'NaN', # R2 if manual or manual-like fit, else RMSE as error measures
-                                        'smoothing_window': 'NaN',
-                                        }
-            
-         
-            return dash.no_update, dash.no_update, dash.no_update, dash.no_update, dash.no_update, dash.no_update, dash.no_update, growth_rate_data, ''
-
-        # change sample name
-        elif dash.callback_context.triggered[0]['prop_id'] == 'store_sample_names.data':
-            for idx, s in enumerate(sample_locations):
-                growth_rate_data[s]['sample_name'] = sample_names[idx]
-            return dash.no_update, dash.no_update, dash.no_update, dash.no_update, dash.no_update, dash.no_update, dash.no_update, growth_rate_data, ''
-
-        # exclude or include sample in analysis
-        elif dash.callback_context.triggered[0]['prop_id'] == 'fig_log.clickData':
-            sp = list(growth_rate_data)[sample_idx]
-            growth_rate_data[sp]['excluded_flag'] = not growth_rate_data[sp]['excluded_flag']
-            return dash.no_update, dash.no_update, dash.no_update, dash.no_update, dash.no_update, dash.no_update, dash.no_update, growth_rate_data, ''
-
-
-        # compute growth data (manual data selection)
-        elif (dash.callback_context.triggered[0]['prop_id'] == 'fig_log.selectedData') and (len(selected_data) > 1):
-            df.index = sample_names
-            sp = sample_locations[sample_idx]
-            
-
-            # time points
-            t = df.columns.tolist()
-
-            # blanks
-            blanks = blank_locs[sp]
-            blanks_mean = df.loc[blanks].mean(axis=0)
-
-            # sample trace
-            sample_trace = df.iloc[sample_idx]
-            sample_trace_blanked = sample_trace - blanks_mean
-
-            # selection idx
-            t0 = selected_data['range']['x'][0]
-            y0 = selected_data['range']['y'][0]
-            t1 = selected_data['range']['x'][1]
-            y1 = selected_data['range']['y'][1]
-
-            sample_trace_blanked_temp = sample_trace_blanked.copy().reset_index()
-            t0_idx = sample_trace_blanked_temp[(sample_trace_blanked_temp['index'] >= t0) & (sample_trace_blanked_temp[0] >= y0)].index[0]
-            t1_idx = sample_trace_blanked_temp[(sample_trace_blanked_temp['index'] <= t1) & (sample_trace_blanked_temp[0] <= y1)].index[-1]
-
-
-            # fit exponential curve
-            x = t[t0_idx: t1_idx + 1]
-            y = sample_trace_blanked.iloc[t0_idx: t1_idx + 1]
-            popt_exp, pcov_exp = curve_fit(mf.exp_function, x, y, bounds=([0, 0], [5, np.inf]), maxfev=1000000)
-
-            # compute r2 value
-            r2 = mf.comp_R2(np.array(x), np.log(y).values, [popt_exp[1], np.log(popt_exp[0])])
-
-            # save growth parameters
-            mu_u = uc.ufloat(popt_exp[1], np.sqrt(pcov_exp[1,1]))
-            dt_u = ucn.log(2) / mu_u
-            doublings = np.log2(sample_trace_blanked.max() / sample_trace_blanked[sample_trace_blanked > 0].min())
-            doublings_log = np.log2(sample_trace_blanked.iloc[t1_idx] / sample_trace_blanked.iloc[t0_idx])
-            doublings_log_std = 0
-            n0 = popt_exp[0]
-            Yield = sample_trace_blanked.max()
-            fitting_mode = 'Manual'
-
-            growth_rate_data[sp] = add_to_growth_data_dict(growth_rate_data[sp], 
-                                                            t[t0_idx], 0, t0_idx, 
-                                                            t[t1_idx], 0, t1_idx,
-                                                            mu_u.n, mu_u.std_dev,
-                                                            doublings_log, doublings_log_std,
-                                                            dt_u.n, dt_u.std_dev,
-                                                            N0=n0, 
-                                                            doublings=doublings,
-                                                            Yield=Yield,
-                                                            error=r2,
-                                                            fitting_mode=fitting_mode,
-                                                            smoothing_window=smoother_ws
-                                                            )
-
-            # format values for display in UI
-            out_growth_rate, out_doubling_time, out_lag_time, out_doublings, out_doublings_log, out_yield, out_error = format_output_strings(growth_rate_data[sp]['mumax'],
-                                                                                                                                    growth_rate_data[sp]['mumax_std'],
-                                                                                                                                    growth_rate_data[sp]['dt'],
-                                                                                                                                    growth_rate_data[sp]['dt_std'],
-                                                                                                                                    growth_rate_data[sp]['t0'],
-                                                                                                                                    growth_rate_data[sp]['t0_std'],
-                                                                                                                                    growth_rate_data[sp]['doublings'],
-                                                                                                                                    growth_rate_data[sp]['doublings_log'],
-                                                                                                                                    growth_rate_data[sp]['doublings_log_std'],
-                                                                                                                                    growth_rate_data[sp]['yield'],
-                                                                                                                                    growth_rate_data[sp]['error'],
-                                                                                                                                    growth_rate_data[sp]['fitting_mode'],
-                                                                                                                                    pop_size_measure
-                                                                                                                                        )
-            return out_growth_rate, out_doubling_time, out_lag_time, out_doublings, out_doublings_log, out_yield, out_error, growth_rate_data, ''
-
-        # update growth rate message area on page turn
-        elif dash.callback_context.triggered[0]['prop_id'] == 'store_sample_idx.data':
-            current_sample_position = sample_locations[sample_idx]
-            growth_rate_data_sp = growth_rate_data[current_sample_position]
-            growth_rate_data_sp_formatted = format_growth_rate_values(growth_rate_data_sp)
-          
-
-            out_growth_rate, out_doubling_time, out_lag_time, out_doublings, out_doublings_log, out_yield, out_error = \
-                format_output_strings(growth_rate_data_sp_formatted['mumax'],
-                                      growth_rate_data_sp_formatted['mumax_std'],
-                                      growth_rate_data_sp_formatted['dt'],
-                                      growth_rate_data_sp_formatted['dt_std'],
-                                      growth_rate_data_sp_formatted['t0'],
-                                      growth_rate_data_sp_formatted['t0_std'],
-                                      growth_rate_data_sp_formatted['doublings'],
-                                      growth_rate_data_sp_formatted['doublings_log'],
-                                      growth_rate_data_sp_formatted['doublings_log_std'],
-                                      growth_rate_data_sp_formatted['yield'],
-                                      growth_rate_data_sp_formatted['error'],
-                                      growth_rate_data_sp_formatted['fitting_mode'],
-                                      pop_size_measure,
-                                        )
-                                     
-            return out_growth_rate, out_doubling_time, out_lag_time, out_doublings, out_doublings_log, out_yield, out_error, dash.no_update, ''
-        
-        # get autofit data
-        elif dash.callback_context.triggered[0]['prop_id'] == 'store_growth_data_auto.data':
-            growth_rate_data = growth_data_auto
-            current_sample_position = sample_locations[sample_idx]
-            growth_rate_data_sp = growth_rate_data[current_sample_position]
-            growth_rate_data_sp_formatted = format_growth_rate_values(growth_rate_data_sp)
-           
-            out_growth_rate, out_doubling_time, out_lag_time, out_doublings, out_doublings_log, out_yield, out_error = format_output_strings(growth_rate_data_sp_formatted['mumax'],
-                                                                                                                                  growth_rate_data_sp_formatted['mumax_std'],
-                                                                                                                                  growth_rate_data_sp_formatted['dt'],
-                                                                                                                                  growth_rate_data_sp_formatted['dt_std'],
-                                                                                                                                  growth_rate_data_sp_formatted['t0'],
-                                                                                                                                  growth_rate_data_sp_formatted['t0_std'],
-                                                                                                                                  growth_rate_data_sp_formatted['doublings'],
-                                                                                                                                  growth_rate_data_sp_formatted['doublings_log'],
-                                                                                                                                  growth_rate_data_sp_formatted['doublings_log_std'],
-                                                                                                                                  growth_rate_data_sp_formatted['yield'],
-                                                                                                                                  growth_rate_data_sp_formatted['error'],
-                                                                                                                                  growth_rate_data_sp_formatted['fitting_mode'],
-                                                                                                                                  pop_size_measure
-                                                                                                                                )
-                                                                                                                                    
-            return out_growth_rate, out_doubling_time, out_lag_time, out_doublings, out_doublings_log, out_yield, out_error, growth_rate_data, ''
-
-        
-        
-        else:
-            return dash.no_update, dash.no_update, dash.no_update, dash.no_update, dash.no_update, dash.no_update, dash.no_update, dash.no_update, dash.no_update
-
-
-
-
-
-    ###################
-    # autofitting
-    ###################
-    style_auto_fit_div = {'visibility': 'visible',
-                          'height': '100vh', 'width': '100vw', 
-                          'position': 'absolute', 'left': '0', 'top': '0',
-                          'display': 'flex', 'justify-content': 'center', 'align-items': 'center', 
-                          'background-color': 'rgb(245, 245, 245)', 
-                          'z-index': '100'
-                                }
-
-    style_progress_bar = {'visibility': 'visible',
-                          'height': '2em', 'width': '100%'
+    else:
+        return dash.no_update, dash.no_update, dash.no_update, dash.no_update, dash.no_update, dash.no_update, dash.no_update, dash.no_update, dash.no_update
+
+
+@callback(
+                Output('growth_rate', 'children', allow_duplicate=True),
+                Output('doubling_time', 'children', allow_duplicate=True),
+                Output('lag_time', 'children', allow_duplicate=True),
+                Output('doublings', 'children', allow_duplicate=True),
+                Output('doublings_log', 'children', allow_duplicate=True),
+                Output('yield', 'children', allow_duplicate=True),
+                Output('error', 'children', allow_duplicate=True),
+                Output('store_growth_data', 'data', allow_duplicate=True),
+                Output('message_area_fits', 'children', allow_duplicate=True),
+                Input('fig_log', 'selectedData'),
+                State('store_growth_data', 'data'),
+                State('store_data_df', 'data'),
+                State('store_data_df_smoothed', 'data'),
+                State('store_smoother_flag', 'data'),
+                State('store_blank_locs', 'data'),
+                State('store_sample_locations', 'data'),
+                State('store_sample_names', 'data'),
+                State('store_smoother_value', 'data'),
+                State('dropdown_blank_model', 'value'),
+                State('store_plate_layout', 'data'),
+                State('store_sample_idx', 'data'),
+                State('store_default_popsizemeasure', 'data'),
+
+                prevent_initial_call = True
+)
+def manual_fit(selected_data, growth_rate_data, df, df_smoothed, smoother_flag, blank_locs, sample_locations, sample_names, smoother_ws, blank_model, plate_layout, sample_idx, pop_size_measure):
+    import numpy as np
+    from scipy.optimize import curve_fit
+    import math_functions as mf
+    import analysis_core as ac
+    import derived_metrics as dm
+    import results_table as rt
+
+    # compute growth data (manual data selection), the only change of the growth data store that needs the plate data
+    if (df is None) or (growth_rate_data is None) or (selected_data is None) or (len(selected_data) <= 1):
+        return dash.no_update, dash.no_update, dash.no_update, dash.no_update, dash.no_update, dash.no_update, dash.no_update, dash.no_update, dash.no_update
+
+    # load data
+    growth_rate_data = rt.table_from_store(growth_rate_data)
+    sp = sample_locations[sample_idx]
+
+    # time points and blanked sample trace
+    t, sample_trace_blanked = blanked_sample(df, df_smoothed, smoother_flag, sample_names, blank_locs, sample_locations, blank_model, plate_layout, sample_idx)
+
+    # selection idx
+    t0 = selected_data['range']['x'][0]
+    y0 = selected_data['range']['y'][0]
+    t1 = selected_data['range']['x'][1]
+    y1 = selected_data['range']['y'][1]
+
+    sample_trace_blanked_temp = sample_trace_blanked.copy().reset_index()
+    t0_idx = sample_trace_blanked_temp[(sample_trace_blanked_temp['index'] >= t0) & (sample_trace_blanked_temp[0] >= y0)].index[0]
+    t1_idx = sample_trace_blanked_temp[(sample_trace_blanked_temp['index'] <= t1) & (sample_trace_blanked_temp[0] <= y1)].index[-1]
+
+
+    # fit exponential curve
+    x = t[t0_idx: t1_idx + 1]
+    y = sample_trace_blanked.iloc[t0_idx: t1_idx + 1]
+    popt_exp, pcov_exp = curve_fit(mf.exp_function, x, y, bounds=([0, 0], [5, np.inf]), maxfev=1000000)
+
+    # compute r2 value
+    r2 = mf.comp_R2(np.array(x), np.log(y).values, [popt_exp[1], np.log(popt_exp[0])])
+
+    # save growth parameters (doublings in the exponential phase are measured, see update_derived_metrics())
+    Yield, doublings = dm.measured_metrics([sample_trace_blanked.values])
+    doublings_log = np.log2(sample_trace_blanked.iloc[t1_idx] / sample_trace_blanked.iloc[t0_idx])
+    doublings_log_std = 0
+    n0 = popt_exp[0]
+    fitting_mode = 'Manual'
+
+    growth_rate_data = ac.add_to_growth_data_dict(growth_rate_data, sp,
+                                               t[t0_idx], 0, t0_idx,
+                                               t[t1_idx], 0, t1_idx,
+                                               popt_exp[1], np.sqrt(pcov_exp[1,1]),
+                                               doublings_log, doublings_log_std,
+                                               N0=n0, N0_std=0,
+                                               doublings=doublings[0],
+                                               Yield=Yield[0],
+                                               error=r2,
+                                               fitting_mode=fitting_mode,
+                                               smoothing_window=smoother_ws,
+                                               blank_model=blank_model,
+                                               )
+    growth_rate_data = ac.update_derived_metrics(growth_rate_data, [sp])
+
+    # format values for display in UI
+    out_growth_rate, out_doubling_time, out_lag_time, out_doublings, out_doublings_log, out_yield, out_error = \
+        format_row_output_strings(rt.sample_row(growth_rate_data, sp), pop_size_measure)
+    return out_growth_rate, out_doubling_time, out_lag_time, out_doublings, out_doublings_log, out_yield, out_error, rt.table_for_store(growth_rate_data), ''
+
+
+
+
+
+# growth parameters of the displayed sample on page turn (client-side, see assets/clientside.js)
+clientside_callback(
+                ClientsideFunction(namespace='growthdash', function_name='show_growth_parameters'),
+                Output('growth_rate', 'children', allow_duplicate=True),
+                Output('doubling_time', 'children', allow_duplicate=True),
+                Output('lag_time', 'children', allow_duplicate=True),
+                Output('doublings', 'children', allow_duplicate=True),
+                Output('doublings_log', 'children', allow_duplicate=True),
+                Output('yield', 'children', allow_duplicate=True),
+                Output('error', 'children', allow_duplicate=True),
+                Input('store_sample_idx', 'data'),
+                Input('store_default_popsizemeasure', 'data'),
+                State('store_growth_data', 'data'),
+                State('store_sample_locations', 'data'),
+
+                prevent_initial_call = True
+)
+
+
+
+###################
+# autofitting
+###################
+style_auto_fit_div = {'visibility': 'visible',
+                      'height': '100vh', 'width': '100vw', 
+                      'position': 'absolute', 'left': '0', 'top': '0',
+                      'display': 'flex', 'justify-content': 'center', 'align-items': 'center', 
+                      'background-color': 'rgb(245, 245, 245)', 
+                      'z-index': '100'
                             }
 
-    style_cancel_button = {
-                            'visibility': 'visible', 
-                            'height':'25px', 'width': '110px', 
-                            'display': 'flex', 'justify-content': 'center', 'align-items': 'center'
-                            }
-    @app.callback(
-                    output = Output('store_growth_data_auto', 'data'),
-                    inputs = Input('button_auto_fit', 'n_clicks'),
-                    state = [State('store_data_df', 'data'),
-                              State('store_data_df_smoothed', 'data'),
-                              State('store_smoother_flag', 'data'),
-                              State('store_growth_data', 'data'),
-                              State('store_blank_locs', 'data'),
-                              State('store_auto_fit_ws', 'data'),
-                              State('store_auto_fit_slope_range', 'data'),
-                              State('store_auto_fit_r2_var_weight', 'data'),
-                              State('dropdown_fitting_algorithms', 'value'),
-                              State('easy_linear_window_size', 'value'),
-                              State('store_smoother_value', 'data'),
-                              ],
-                    background = True,
-                    running = [
-                                (Output('auto_fit_div', 'style'),
-                                        style_auto_fit_div,
-                                        {'visibility': 'hidden'}
-                                ),
-                                (Output('progress_count', 'style'),
-                                        {'visibility': 'visible', 'justify-content': 'center'},
-                                        {'visibility': 'hidden'},
-                                ),
-                                (Output("progress_bar", "style"),
-                                        style_progress_bar,
-                                        {"visibility": "hidden"},
-                                ),
-                                (Output('button_cancel_autofit', 'style'),
-                                        style_cancel_button,
-                                        {'visibility': 'hidden'}
-                                ),
-                                (Output('body_layout', 'style'),
-                                        {'overflow': 'hidden', 'position': 'fixed'},
-                                        {'overflow': 'visible'}
-                                ),
-                                
-                                ],
-                    progress = [Output('progress_bar', 'value'), Output('progress_bar', 'max'), Output('progress_count', 'children')],
-                    cancel = [Input('button_cancel_autofit', 'n_clicks')],
-                    prevent_initial_call = True
-    )
-    def auto_fit(set_progress, button_clicks, df, df_smoothed, smoother_flag, growth_rate_data, blank_locs, auto_fit_ws, auto_fit_sr, auto_fit_weight, fitting_algorithm, window_size, smoother_ws):
-        # autofit on button press
-        if growth_rate_data is None:
-            return dash.no_update
-
-        # load data
-        if smoother_flag == False:
-            df = pd.DataFrame.from_dict(df, orient='tight')
-        else:
-            df = pd.DataFrame.from_dict(df_smoothed, orient='tight')
-
-        skip_list = ds.accepted_blank_names
-        n_samples_total = len(growth_rate_data)
-        for i, sp in enumerate(growth_rate_data):
-            set_progress((str(i + 1), str(n_samples_total), '{} / {}'.format(i + 1, n_samples_total)))
-
-            if any([x in growth_rate_data[sp]['sample_name'] for x in skip_list]) or (growth_rate_data[sp]['sample_name'] == '-'):
-                continue
-
-            else:
-                blanks = blank_locs[sp]
-                blanks_mean = df.loc[blanks].mean(axis=0)
-                sample_trace_blanked = df.iloc[i] - blanks_mean
-                t = df.columns.values
-                
-                # remove negative and zero value (taking the log negative values become NaN, fitting algorithms can't handle NaNs and infinities)
-                sample_trace_blanked_log = np.log(sample_trace_blanked)
-                nan_inf_mask = (~np.isnan(sample_trace_blanked_log)) & (sample_trace_blanked_log != - np.inf)
-                sample_trace_blanked = sample_trace_blanked[nan_inf_mask]
-                t = t[nan_inf_mask]
-                
-                if sample_trace_blanked.shape[0] <= 0.1 * sample_trace_blanked_log.shape[0]:
-                    # don't analyze samples that contain majority negative values after blanking
-                    continue
-
-                # fitting
-                if fitting_algorithm == 'Manual-like':
-                    t0_idx, t1_idx = auto_fitting.autofit_manual_like(t, sample_trace_blanked, ws=auto_fit_ws, slope_range=auto_fit_sr, b=auto_fit_weight)
-
-                    if t0_idx is None:
-                        continue
-
-                    try:
-                        x = t[t0_idx: t1_idx]
-                        y = sample_trace_blanked.iloc[t0_idx: t1_idx]
-                        popt_exp, pcov_exp = curve_fit(mf.exp_function, x, y, bounds=([0, 0.001], [5, 2]))
-                        
-                    except:
-                        continue
-                    
-                    # compute r2 value
-                    r2 = mf.comp_R2(np.array(x), np.log(y), [popt_exp[1], np.log(popt_exp[0])])
-
-
-                    mu_u = uc.ufloat(popt_exp[1], np.sqrt(pcov_exp[1,1]))
-                    dt_u = ucn.log(2) / mu_u
-
-                    doublings_log = np.log2(sample_trace_blanked.iloc[t1_idx] / sample_trace_blanked.iloc[t0_idx])
-                    doublings_log_std = 0
-
-                    Yield = sample_trace_blanked.max()
-
-                    fitting_mode = 'Manual-like'
-
-                    growth_rate_data[sp] = add_to_growth_data_dict(growth_rate_data[sp], 
-                                                t[t0_idx], 0, t0_idx, 
-                                                t[t1_idx], 0, t1_idx,
-                                                mu_u.n, mu_u.std_dev,
-                                                doublings_log, doublings_log_std,
-                                                dt_u.n, dt_u.std_dev,
-                                                N0=n0, 
-                                                doublings=doublings,
-                                                Yield=Yield,
-                                                error=r2,
-                                                fitting_mode=fitting_mode,
-
-                                                )
-                
-                else:
-                    if 'Gompertz' in fitting_algorithm:
-                        # A: log carrying capacity
-                        # mu: max growth rate
-                        # l: lag time (i.e. beginning of exponential phase)
-                        # t1: beginning of stationary phase (i.e. end of exponential phase)
-                        # N0: initial population size
-                        A, A_std, mu, mu_std, l, l_std, N0, N0_std  = auto_fitting.autofit_gompertz(t, sample_trace_blanked)
-
-
-                        if (np.isnan(A)) or (np.isnan(mu_std)) or (mu_std == np.inf):
-                            continue
-                        
-                        N0_u = uc.ufloat(N0, N0_std)
-                        A_u = uc.ufloat(A, A_std)
-                        mu_u = uc.ufloat(mu, mu_std)
-                        l_u = uc.ufloat(l, l_std)
-
-                        if fitting_algorithm == 'Gompertz - tight':
-                            t0_u = l_u + 0.014 * A_u / mu_u
-                            t1_u = l_u + 0.72 * A_u / mu_u
-                            ratio = ucn.exp(mf.modified_gompertz_uncertainty(t1_u, N0_u, A_u, mu_u, l_u)) / ucn.exp(mf.modified_gompertz_uncertainty(l_u, N0_u, A_u, mu_u, l_u))
-                        elif fitting_algorithm == 'Gompertz - conventional':
-                            t0_u = l_u
-                            t1_u = (A_u + mu_u * l_u) / mu_u # end of exponential phase
-                            ratio = ucn.exp(mf.modified_gompertz_uncertainty(t1_u, N0_u, A_u, mu_u, l_u)) / ucn.exp(mf.modified_gompertz_uncertainty(l_u, N0_u, A_u, mu_u, l_u))
-                        doublings_log_u = ucn.log(ratio) / ucn.log(2) 
-                    
-                    elif 'Logistic' in fitting_algorithm:
-                        # A: log carrying capacity
-                        # mu: max growth rate
-                        # l: lag time (i.e. beginning of exponential phase)
-                        # t1: beginning of stationary phase (i.e. end of exponential phase)
-                        # N0: initial population size
-                        A, A_std, mu, mu_std, l, l_std, N0, N0_std = auto_fitting.autofit_logistic(t, sample_trace_blanked)
-                        print(sp)
-                        print(N0, A, mu, l)
-                        if (np.isnan(A)) or (np.isnan(mu_std)) or (mu_std == np.inf):
-                            continue  
-
-                        N0_u = uc.ufloat(N0, N0_std)
-                        A_u = uc.ufloat(A, A_std)
-                        mu_u = uc.ufloat(mu, mu_std)
-                        l_u = uc.ufloat(l, l_std)
-                        if fitting_algorithm == 'Logistic - tight':
-                            t0_u = l_u + 0.17 * A_u / mu_u
-                            t1_u = l_u + 0.83 * A_u / mu_u
-                            ratio = ucn.exp(mf.modified_logistic_uncertainty(t1_u, N0_u, A_u, mu_u, l_u)) / ucn.exp(mf.modified_logistic_uncertainty(l_u, N0_u, A_u, mu_u, l_u))
-
-                        elif fitting_algorithm == 'Logistic - conventional':
-                            t0_u = l_u
-                            t1_u = (A_u + mu_u * l_u) / mu_u # end of exponential phase
-                            ratio = ucn.exp(mf.modified_logistic_uncertainty(t1_u, N0_u, A_u, mu_u, l_u)) / ucn.exp(mf.modified_logistic_uncertainty(l_u, N0_u, A_u, mu_u, l_u))
-                        doublings_log_u = ucn.log(ratio) / ucn.log(2) 
-
-
-                    
-                    elif 'Easy Linear' in fitting_algorithm:
-                        # mu: max growth rate
-                        # l: lag time (i.e. beginning of exponential phase)
-                        # t1: beginning of stationary phase (i.e. end of exponential phase)
-                        t0, t1, mu, mu_std, y_intercept, y_intercept_std, R2_error = auto_fitting.autofit_easylinear(t, sample_trace_blanked, window_size)
-                        
-                        A_u = uc.ufloat(np.nan, np.nan)
-                        # n0 = mf.lin_function(t0, mu, y_intercept) / np.exp(mf.lin_function(t0, mu, y_intercept))
-                        N0_u = uc.ufloat(np.exp(y_intercept), 0)
-                        t0_u = uc.ufloat(t0, 0)
-                        t1_u = uc.ufloat(t1, 0)
-                        mu_u = uc.ufloat(mu, mu_std)
-                        y_intercept_u = uc.ufloat(y_intercept, y_intercept_std)
-
-                        ratio = ucn.exp(mf.lin_function(t1, mu_u, y_intercept_u)) / ucn.exp(mf.lin_function(t0, mu_u, y_intercept_u))
-                        doublings_log_u = ucn.log(ratio) / ucn.log(2)
-
-                
-
-                    # compute doubling time
-                    dt_u = ucn.log(2) / mu_u
-
-                    # compute yield (i.e. max OD measurement)
-                    maxOD600 = sample_trace_blanked.max()
-
-                    # compute doublings in measured data (take the smallest non-negative value as reference point)
-                    doublings = np.log2(sample_trace_blanked.max() / sample_trace_blanked[sample_trace_blanked > 0].min())
-                   
-                    # fill in data
-                    growth_rate_data[sp] = add_to_growth_data_dict(
-                                                growth_rate_data[sp], 
-                                                ax.format_value_for_store(t0_u.n), ax.format_value_for_store(t0_u.std_dev), 'NaN', 
-                                                ax.format_value_for_store(t1_u.n), ax.format_value_for_store(t1_u.std_dev), 'NaN',
-                                                ax.format_value_for_store(mu_u.n), ax.format_value_for_store(mu_u.std_dev),
-                                                ax.format_value_for_store(doublings_log_u.n), ax.format_value_for_store(doublings_log_u.std_dev),
-                                                ax.format_value_for_store(dt_u.n), ax.format_value_for_store(dt_u.std_dev),
-                                                ax.format_value_for_store(A_u.n), ax.format_value_for_store(A_u.std_dev),
-                                                N0=ax.format_value_for_store(N0_u.n), N0_std=ax.format_value_for_store(N0_u.std_dev), 
-                                                doublings=ax.format_value_for_store(doublings),
-                                                Yield=ax.format_value_for_store(maxOD600) ,
-                                                fitting_mode=fitting_algorithm,
-                                                smoothing_window=smoother_ws
-                                                )
-                    t_fit, y_fit = ax.generate_fitted_curve(t, fitting_algorithm, growth_rate_data[sp], t.shape[0])
-                    
-                    if 'Easy Linear' in fitting_algorithm:
-                        growth_rate_data[sp]['error'] = R2_error
-                    else:
-                        rmse = mf.rmse(np.array(sample_trace_blanked), y_fit)
-                        growth_rate_data[sp]['error'] = rmse
-                   
-        return growth_rate_data
\ No newline at end of file
+style_progress_bar = {'visibility': 'visible',
+                      'height': '2em', 'width': '100%'
+                        }
+
+style_cancel_button = {
+                        'visibility': 'visible', 
+                        'height':'25px', 'width': '110px', 
+                        'display': 'flex', 'justify-content': 'center', 'align-items': 'center'
+                        }
+# the autofit runs as job of the background workers (see worker/), the overlay with the progress bar is shown until it's
+# finished or cancelled
+style_auto_fit_hidden = [{'visibility': 'hidden'}, {'visibility': 'hidden'}, {'visibility': 'hidden'}, {'visibility': 'hidden'}, {'overflow': 'visible'}]
+style_auto_fit_running = [style_auto_fit_div, {'visibility': 'visible', 'justify-content': 'center'}, style_progress_bar, style_cancel_button, {'overflow': 'hidden', 'position': 'fixed'}]
+auto_fit_style_outputs = [Output('auto_fit_div', 'style', allow_duplicate=True),
+                          Output('progress_count', 'style', allow_duplicate=True),
+                          Output('progress_bar', 'style', allow_duplicate=True),
+                          Output('button_cancel_autofit', 'style', allow_duplicate=True),
+                          Output('body_layout', 'style', allow_duplicate=True),
+                          ]
+
+
+@callback(
+                output = [Output('store_autofit_job', 'data'),
+                          Output('interval_autofit', 'disabled'),
+                          Output('progress_bar', 'value'),
+                          Output('progress_bar', 'max'),
+                          Output('progress_count', 'children'),
+                          ] + auto_fit_style_outputs,
+                inputs = Input('button_auto_fit', 'n_clicks'),
+                state = [State('store_data_df', 'data'),
+                          State('store_data_df_smoothed', 'data'),
+                          State('store_smoother_flag', 'data'),
+                          State('store_growth_data', 'data'),
+                          State('store_sample_locations', 'data'),
+                          State('store_sample_names', 'data'),
+                          State('store_blank_locs', 'data'),
+                          State('store_auto_fit_ws', 'data'),
+                          State('store_auto_fit_slope_range', 'data'),
+                          State('store_auto_fit_r2_var_weight', 'data'),
+                          State('dropdown_fitting_algorithms', 'value'),
+                          State('easy_linear_window_size', 'value'),
+                          State('store_smoother_value', 'data'),
+                          State('dropdown_blank_model', 'value'),
+                          State('store_plate_layout', 'data'),
+                          State('input_bootstrap_resamples', 'value'),
+                          State('dropdown_fit_loss', 'value'),
+                          State('input_fit_loss_scale', 'value'),
+                          ],
+                prevent_initial_call = True
+)
+def auto_fit(button_clicks, df, df_smoothed, smoother_flag, growth_rate_data, sample_locations, sample_names, blank_locs, auto_fit_ws, auto_fit_sr, auto_fit_weight, fitting_algorithm, window_size, smoother_ws, blank_model, plate_layout, n_bootstrap, loss, f_scale):
+    # autofit on button press, the plate is fitted by a background worker (see check_auto_fit())
+    if growth_rate_data is None:
+        return [dash.no_update] * 10
+
+    settings = {'auto_fit_ws': auto_fit_ws, 'auto_fit_sr': auto_fit_sr, 'auto_fit_weight': auto_fit_weight,
+                'fitting_algorithm': fitting_algorithm, 'window_size': window_size, 'smoother_ws': smoother_ws,
+                'blank_model': blank_model, 'n_bootstrap': n_bootstrap, 'loss': loss, 'f_scale': f_scale}
+    job_id, ticket = jb.submit('autofit_plate',
+                       plate = df_smoothed if smoother_flag else df,
+                       sample_locations = sample_locations,
+                       sample_names = sample_names,
+                       blank_locs = blank_locs,
+                       plate_layout = plate_layout,
+                       settings = settings)
+    return [{'job': job_id, 'ticket': ticket}, False, 0, len(sample_locations), ''] + style_auto_fit_running
+
+
+@callback(
+                output = [Output('store_growth_data_auto', 'data'),
+                          Output('store_autofit_job', 'data', allow_duplicate=True),
+                          Output('interval_autofit', 'disabled', allow_duplicate=True),
+                          Output('progress_bar', 'value', allow_duplicate=True),
+                          Output('progress_bar', 'max', allow_duplicate=True),
+                          Output('progress_count', 'children', allow_duplicate=True),
+                          ] + auto_fit_style_outputs,
+                inputs = [Input('interval_autofit', 'n_intervals'),
+                          Input('button_cancel_autofit', 'n_clicks'),
+                          ],
+                state = State('store_autofit_job', 'data'),
+                prevent_initial_call = True
+)
+def check_auto_fit(n_intervals, cancel_clicks, job):
+    # progress of the autofit job, the results are passed on to store_growth_data_auto when it's finished
+    if job is None:
+        return [dash.no_update] * 11
+    job_id = job['job']
+
+    if dash.callback_context.triggered[0]['prop_id'] == 'button_cancel_autofit.n_clicks':
+        jb.cancel(job_id, job['ticket'])
+        return [dash.no_update, None, True, dash.no_update, dash.no_update, dash.no_update] + style_auto_fit_hidden
+
+    status = jb.status(job_id)
+    if status['state'] in ['PENDING', 'PROGRESS']:
+        if status.get('total', 0) == 0:
+            return [dash.no_update] * 11
+        return [dash.no_update, dash.no_update, dash.no_update, status['done'], status['total'],
+                '{} / {}'.format(status['done'], status['total'])] + [dash.no_update] * 5
+
+    # finished, failed or cancelled
+    growth_data_auto = jb.result(job_id) if status['state'] == 'SUCCESS' else dash.no_update
+    return [growth_data_auto, None, True, dash.no_update, dash.no_update, dash.no_update] + style_auto_fit_hidden
+
+
+
+###################
+# single samples
+###################
+@callback(
+                Output('store_sample_fit_job', 'data'),
+                Output('interval_sample_fit', 'disabled'),
+                Output('message_area_fits', 'children', allow_duplicate=True),
+                Input('button_fit_sample', 'n_clicks'),
+                State('store_data_df', 'data'),
+                State('store_data_df_smoothed', 'data'),
+                State('store_smoother_flag', 'data'),
+                State('store_growth_data', 'data'),
+                State('store_blank_locs', 'data'),
+                State('store_sample_locations', 'data'),
+                State('store_sample_names', 'data'),
+                State('store_sample_idx', 'data'),
+                State('store_auto_fit_ws', 'data'),
+                State('store_auto_fit_slope_range', 'data'),
+                State('store_auto_fit_r2_var_weight', 'data'),
+                State('dropdown_fitting_algorithms', 'value'),
+                State('easy_linear_window_size', 'value'),
+                State('store_smoother_value', 'data'),
+                State('dropdown_blank_model', 'value'),
+                State('store_plate_layout', 'data'),
+                State('input_bootstrap_resamples', 'value'),
+                State('dropdown_fit_loss', 'value'),
+                State('input_fit_loss_scale', 'value'),
+                prevent_initial_call = True
+)
+def fit_sample(button_clicks, df, df_smoothed, smoother_flag, growth_rate_data, blank_locs, sample_locations, sample_names, sample_idx, auto_fit_ws, auto_fit_sr, auto_fit_weight, fitting_algorithm, window_size, smoother_ws, blank_model, plate_layout, n_bootstrap, loss, f_scale):
+    import analysis_core as ac
+
+    # fit the displayed sample with the autofit settings, the job runs on the interactive queue of the background workers
+    # so it doesn't wait for plate-wide jobs (see check_sample_fit())
+    if (df is None) or (growth_rate_data is None):
+        return dash.no_update, dash.no_update, dash.no_update
+
+    t, sample_trace_blanked = blanked_sample(df, df_smoothed, smoother_flag, sample_names, blank_locs, sample_locations, blank_model, plate_layout, sample_idx)
+    settings = {'auto_fit_ws': auto_fit_ws, 'auto_fit_sr': auto_fit_sr, 'auto_fit_weight': auto_fit_weight,
+                'fitting_algorithm': fitting_algorithm, 'window_size': window_size, 'smoother_ws': smoother_ws,
+                'blank_model': blank_model, 'loss': loss, 'f_scale': f_scale}
+    sample = {'t': t, 'y_blanked': sample_trace_blanked.tolist(), 'settings': settings,
+              'sample_location': sample_locations[sample_idx], 'sample_name': sample_names[sample_idx]}
+
+    # fits with bootstrap confidence intervals are a task of their own
+    n_bootstrap, _ = ac.valid_fit_settings(n_bootstrap, f_scale)
+    if n_bootstrap > 0:
+        job_id, ticket = jb.submit('bootstrap_sample', n_bootstrap=n_bootstrap, **sample)
+    else:
+        job_id, ticket = jb.submit('fit_sample', **sample)
+    return {'job': job_id, 'ticket': ticket}, False, ''
+
+
+@callback(
+                Output('store_growth_data_auto', 'data', allow_duplicate=True),
+                Output('store_sample_fit_job', 'data', allow_duplicate=True),
+                Output('interval_sample_fit', 'disabled', allow_duplicate=True),
+                Output('message_area_fits', 'children', allow_duplicate=True),
+                Input('interval_sample_fit', 'n_intervals'),
+                State('store_sample_fit_job', 'data'),
+                prevent_initial_call = True
+)
+def check_sample_fit(n_intervals, job):
+    import results_table as rt
+
+    # the fit of the sample is merged into the growth data store like autofit results (see growth_data())
+    if job is None:
+        return dash.no_update, dash.no_update, dash.no_update, dash.no_update
+
+    status = jb.status(job['job'])
+    if status['state'] in ['PENDING', 'PROGRESS']:
+        return dash.no_update, dash.no_update, dash.no_update, dash.no_update
+
+    growth_data_sample = jb.result(job['job']) if status['state'] == 'SUCCESS' else None
+    if (growth_data_sample is None) or (rt.table_from_store(growth_data_sample)['fitting_mode'][0] is None):
+        return dash.no_update, None, True, ms.error_sample_fit
+    return growth_data_sample, None, True, ''
+
+
+
+###################
+# export
+###################
+@callback(
+    Output('store_export_job', 'data'),
+    Output('interval_export', 'disabled'),
+    Input("download_sample_data_button", "n_clicks"),
+    State('store_growth_data', 'data'),
+    prevent_initial_call=True,
+)
+def export_analysis(n_clicks, growth_data):
+    # summaries of sample data (one row per sample location) are written by the export queue of the background workers
+    if growth_data is None:
+        return dash.no_update, dash.no_update
+    job_id, ticket = jb.submit('export_results', growth_data=growth_data, file_format='csv')
+    return {'job': job_id, 'ticket': ticket}, False
+
+
+@callback(
+    Output("download_sample_data", "data"),
+    Output('store_export_job', 'data', allow_duplicate=True),
+    Output('interval_export', 'disabled', allow_duplicate=True),
+    Input('interval_export', 'n_intervals'),
+    State('store_export_job', 'data'),
+    prevent_initial_call=True,
+)
+def download_analysis(n_intervals, job):
+    # download of the export once it's finished
+    if job is None:
+        return dash.no_update, dash.no_update, dash.no_update
+    status = jb.status(job['job'])
+    if status['state'] in ['PENDING', 'PROGRESS']:
+        return dash.no_update, dash.no_update, dash.no_update
+    text = jb.result(job['job']) if status['state'] == 'SUCCESS' else None
+    if text is None:
+        return dash.no_update, None, True
+    return dcc.send_string(text, "sample_data.csv"), None, True
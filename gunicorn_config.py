@@ -0,0 +1,44 @@
+'''
+author: Michael A. Reiter
+(c) ETH Zurich, Michael A. Reiter, 2022
+
+This file is part of Dashing Growth Curves.
+
+Dashing Growth Curves is free software: you can redistribute it and/or modify it under the terms of the GNU General Public License as published by the Free Software Foundation, either version 3 of the License, or (at your option) any later version.
+
+Dashing Growth Curves is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License along with Dashing Growth Curves. If not, see <https://www.gnu.org/licenses/>.
+'''
+
+import gc
+import os
+
+
+# gunicorn --config gunicorn_config.py app:server
+bind = '0.0.0.0:{}'.format(os.environ.get('PORT', 8050))
+workers = int(os.environ.get('WEB_CONCURRENCY', 21))
+threads = 1
+timeout = 1200
+
+# the app (layout, callbacks and libraries) is imported once in the master process, the workers are forked from it and
+# share its memory copy-on-write instead of importing everything on their own
+preload_app = True
+
+
+def when_ready(server):
+    # the app imports numpy, pandas, plotly figures and the analysis modules inside its callbacks, they are imported here
+    # once so the workers share them instead of importing them on the first request
+    import analysis_core, plotting, plate_cache, data_transport  # noqa: F401
+    from plotly.subplots import make_subplots  # noqa: F401
+
+    # objects of the preloaded app are never freed, moving them out of the garbage collector's reach keeps the collector
+    # from touching (and thereby copying) their memory pages in every worker
+    gc.freeze()
+
+
+def post_fork(server, worker):
+    import figure_cache as fc
+    import worker.jobs as jb
+    jb.after_fork()
+    fc.after_fork()
@@ -0,0 +1,87 @@
+'''
+author: Michael A. Reiter
+(c) ETH Zurich, Michael A. Reiter, 2022
+
+This file is part of Dashing Growth Curves.
+
+Dashing Growth Curves is free software: you can redistribute it and/or modify it under the terms of the GNU General Public License as published by the Free Software Foundation, either version 3 of the License, or (at your option) any later version.
+
+Dashing Growth Curves is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License along with Dashing Growth Curves. If not, see <https://www.gnu.org/licenses/>.
+'''
+
+# compare the compiled (numba) and the NumPy/SciPy fitting backends on the test workbooks
+# run from the repository root: python implementation_test/compare_fitting_backends.py
+
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import auto_fitting
+import fitting_kernels as fk
+import math_functions as mf
+
+
+workbooks = ['synthetic_gompertz_growth_curves_dgc_ready_noised.xlsx',
+             'synthetic_logistic_growth_curves_dgc_ready_noised.xlsx',
+             'real_test_data.xlsx',
+             ]
+rtol = 1e-3     # relative tolerance of growth rates
+
+
+def load_blanked_traces(path):
+    # subtract the mean of all blanks, keep positive values only (same as automatic fitting in the app)
+    df = pd.read_excel(path, index_col=0)
+    df.columns = df.columns.astype(float)
+    is_blank = df.index.astype(str).str.startswith('blank')
+    df_blanked = df[~is_blank] - df[is_blank].mean()
+    t = df.columns.values
+    for name, trace in df_blanked.iterrows():
+        mask = trace.values > 0
+        if mask.sum() > 0.1 * mask.shape[0]:
+            yield name, t[mask], trace[mask]
+
+
+def sum_of_squares(model, t, y, fit):
+    # residual sum of squares of a sigmoid fit on log scale
+    A, _, mu, _, l, _, N0, _, _ = fit
+    return np.sum((model(t, N0, A, mu, l) - np.log(y.values))**2)
+
+
+def fit_all(traces, backend):
+    fk.backend = backend
+    mu = {}
+    rss = {}
+    start = time.time()
+    for name, t, y in traces:
+        for model, autofit, model_function in [('Gompertz', auto_fitting.autofit_gompertz, mf.modified_gompertz), 
+                                               ('Logistic', auto_fitting.autofit_logistic, mf.modified_logistic)]:
+            fit = autofit(t, y)
+            mu[(name, model)] = fit[2]
+            rss[(name, model)] = sum_of_squares(model_function, t, y, fit)
+        mu[(name, 'Easy Linear')] = auto_fitting.autofit_easylinear(t, y, 20)[2]
+    return pd.Series(mu), pd.Series(rss), time.time() - start
+
+
+if not fk.numba_available:
+    sys.exit('numba is not installed, only the NumPy backend is available')
+
+for workbook in workbooks:
+    traces = list(load_blanked_traces(os.path.join(os.path.dirname(os.path.abspath(__file__)), workbook)))
+    fit_all(traces[:1], 'numba')     # compile kernels
+    mu_numba, rss_numba, time_numba = fit_all(traces, 'numba')
+    mu_numpy, rss_numpy, time_numpy = fit_all(traces, 'numpy')
+
+    # growth rates can differ in flat optima, where the compiled backend should then find an equal or better fit
+    agree = np.isclose(mu_numba, mu_numpy, rtol=rtol, equal_nan=True)
+    better = (rss_numba <= rss_numpy * (1 + 1e-9)) | rss_numpy.isna()
+    print('{}: {} fits, {} growth rates agree (rtol {}), compiled fit at least as good in {} of {} sigmoid fits, numba {:.2f} s, numpy {:.2f} s'.format(
+          workbook, agree.shape[0], agree.sum(), rtol, better.sum(), better.shape[0], time_numba, time_numpy))
+    if not agree.all():
+        disagree = pd.DataFrame({'mu numba': mu_numba, 'mu numpy': mu_numpy, 'rss numba': rss_numba, 'rss numpy': rss_numpy})[~agree]
+        print(disagree)
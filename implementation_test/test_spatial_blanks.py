@@ -0,0 +1,55 @@
+'''
+author: Michael A. Reiter
+(c) ETH Zurich, Michael A. Reiter, 2022
+
+This file is part of Dashing Growth Curves.
+
+Dashing Growth Curves is free software: you can redistribute it and/or modify it under the terms of the GNU General Public License as published by the Free Software Foundation, either version 3 of the License, or (at your option) any later version.
+
+Dashing Growth Curves is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License along with Dashing Growth Curves. If not, see <https://www.gnu.org/licenses/>.
+'''
+
+# spatial blank model with blanks that don't span the plate (e.g. only in the edge columns)
+# run from the repository root: python -m pytest implementation_test/test_spatial_blanks.py (or python implementation_test/test_spatial_blanks.py)
+
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import blanking as blk
+import plate_layout as lay
+
+
+def background_with_blank_columns(blank_cols, blank_values):
+    # spatial background of a 96-well plate with blanks in the given columns (samples at 0.5)
+    plate_layout = lay.generate_plate_layout(96)
+    is_blank = np.isin(plate_layout['col_idx'], blank_cols)
+    values = np.where(is_blank[:, None], blank_values(plate_layout)[:, None], 0.5) * np.ones((96, 3))
+    return blk.spatial_background(values, is_blank, plate_layout), plate_layout
+
+
+def test_flat_blanks_in_first_column():
+    background, _ = background_with_blank_columns([0], lambda layout: np.full(96, 0.1))
+    assert np.allclose(background, 0.1)
+
+
+def test_flat_blanks_in_edge_columns():
+    background, _ = background_with_blank_columns([0, 11], lambda layout: np.full(96, 0.1))
+    assert np.allclose(background, 0.1)
+
+
+def test_row_gradient_of_blanks_in_edge_columns():
+    # the gradient along the rows is fitted, the background is constant along the rows
+    gradient = lambda layout: 0.1 + 0.01 * layout['row_idx']
+    background, plate_layout = background_with_blank_columns([0, 11], gradient)
+    assert np.allclose(background[:, 0], gradient(plate_layout))
+
+
+if __name__ == '__main__':
+    for test in [test_flat_blanks_in_first_column, test_flat_blanks_in_edge_columns, test_row_gradient_of_blanks_in_edge_columns]:
+        test()
+        print(test.__name__, 'ok')
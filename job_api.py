@@ -0,0 +1,211 @@
+'''
+author: Michael A. Reiter
+(c) ETH Zurich, Michael A. Reiter, 2022
+
+This file is part of Dashing Growth Curves.
+
+Dashing Growth Curves is free software: you can redistribute it and/or modify it under the terms of the GNU General Public License as published by the Free Software Foundation, either version 3 of the License, or (at your option) any later version.
+
+Dashing Growth Curves is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License along with Dashing Growth Curves. If not, see <https://www.gnu.org/licenses/>.
+'''
+
+import hmac
+import io
+import json
+import os
+
+from flask import jsonify, request, send_file
+
+import auxilliary_functions as ax
+import default_settings as ds
+import messages as ms
+import worker.jobs as jb
+
+
+################################################
+# job arguments
+################################################
+def _setting(settings, key, default, cast, valid=lambda x: True):
+    # setting of a request with its default, raises ValueError if invalid
+    value = settings.get(key, default)
+    try:
+        value = cast(value)
+    except (TypeError, ValueError):
+        raise ValueError('invalid {}: {}'.format(key, value))
+    if not valid(value):
+        raise ValueError('invalid {}: {}'.format(key, value))
+    return value
+
+
+def plate_job(df, settings, layout_file=None):
+    '''
+        Arguments of the autofit_plate task (see worker/tasks.py) for a plate and the settings of a request
+        - settings (all optional, defaults as in the app): algorithm, window_size, auto_fit_ws, auto_fit_sr,
+          auto_fit_weight, blanks (sample names, default: the first three samples), blank_model, smoothing_window
+          (0: raw data), n_bootstrap, loss, f_scale
+        - layout_file: well labels of the samples (see plate_layout.read_layout_file())
+
+        Raises ValueError if a setting is invalid.
+    '''
+    import plate_layout as lay
+    import data_transport as dt
+
+    sample_names = df.index.tolist()
+    fit_settings = {
+            'fitting_algorithm': _setting(settings, 'algorithm', ds.default_fitting_algorithm, str, lambda x: x in ds.fittings_algorithms),
+            'window_size': _setting(settings, 'window_size', ds.default_easy_linear_window_size, int, lambda x: x > 1),
+            'auto_fit_ws': _setting(settings, 'auto_fit_ws', ds.auto_fit_default_ws, int, lambda x: x > 0),
+            'auto_fit_sr': _setting(settings, 'auto_fit_sr', ds.auto_fit_default_sr, float),
+            'auto_fit_weight': _setting(settings, 'auto_fit_weight', ds.auto_fit_default_weight, float),
+            'smoother_ws': _setting(settings, 'smoothing_window', 0, int, lambda x: x >= 0),
+            'blank_model': _setting(settings, 'blank_model', ds.default_blank_model, str, lambda x: x in ds.blank_models),
+            'n_bootstrap': _setting(settings, 'n_bootstrap', 0, int, lambda x: x >= 0),
+            'loss': _setting(settings, 'loss', ds.default_fit_loss, str, lambda x: x in ds.fit_losses),
+            'f_scale': _setting(settings, 'f_scale', ds.default_fit_loss_scale, float, lambda x: x > 0),
+            }
+
+    # blanks of all samples (as the default blanks of the app)
+    blanks = settings.get('blanks', [x for x in sample_names if x != '-'][:3])
+    if isinstance(blanks, str):
+        blanks = [x.strip() for x in blanks.split(',')]
+    if (not isinstance(blanks, list)) or (not all(isinstance(x, str) for x in blanks)):
+        raise ValueError('invalid blanks: {} (list of sample names)'.format(blanks))
+    if not all(x in sample_names for x in blanks):
+        raise ValueError(ms.error_blank_name)
+
+    if (layout_file is not None) and (len(layout_file) != df.shape[0]):
+        raise ValueError(ms.error_layout_length)
+    plate_layout = lay.generate_plate_layout(df.shape[0], layout_file)
+    sample_locations = plate_layout['locations'].tolist()
+
+    # smoothed data is fitted as in the app if a smoothing window is set
+    if fit_settings['smoother_ws'] > 0:
+        df = df.rolling(fit_settings['smoother_ws'], axis=1, min_periods=1, center=True).mean()
+
+    return {
+            'plate': dt.frame_for_store(df),
+            'sample_locations': sample_locations,
+            'sample_names': sample_names,
+            'blank_locs': {loc: list(blanks) for loc in sample_locations},
+            'plate_layout': lay.layout_for_store(plate_layout),
+            'settings': fit_settings,
+            }
+
+
+################################################
+# results
+################################################
+def results_response(job_id, file_format):
+    import results_table as rt
+
+    # results table of a finished job, one row per sample location (the columns of the app's download)
+    growth_data = jb.result(job_id)
+    if growth_data is None:
+        return jsonify({'job': job_id, 'error': 'results expired'}), 404
+    df = rt.to_dataframe(rt.table_from_store(growth_data))
+    if file_format == 'parquet':
+        buffer = io.BytesIO()
+        try:
+            df.to_parquet(buffer)
+        except ImportError:
+            return jsonify({'error': 'parquet export needs pyarrow or fastparquet'}), 501
+        buffer.seek(0)
+        return send_file(buffer, mimetype='application/vnd.apache.parquet', download_name='{}.parquet'.format(job_id))
+    return df.to_json(orient='index'), 200, {'Content-Type': 'application/json'}
+
+
+################################################
+# HTTP API
+################################################
+def _authorized():
+    # all requests need the token of ds.job_api_token (off if no token is set)
+    token = os.environ.get('JOB_API_TOKEN', ds.job_api_token)
+    if not token:
+        return False
+    return hmac.compare_digest(request.headers.get('Authorization', ''), 'Bearer ' + token)
+
+
+def register_job_routes(server):
+    '''
+        Endpoints for plate analysis by other systems (autofit of a whole plate as background job, see worker/)
+        - POST /jobs with a plate file (form field 'file', same format as the upload of the app), optional layout file
+          ('layout') and settings as JSON object ('settings', see plate_job()) starts a job, returns its id
+        - the ticket returned with the job id identifies the request, jobs of identical requests are shared (see
+          worker.jobs.submit())
+        - GET /jobs/<job_id> returns the state ('PENDING', 'PROGRESS', 'SUCCESS', 'FAILURE' or 'REVOKED') and progress
+        - GET /jobs/<job_id>/results?format=json|parquet returns the growth parameters of a finished job
+        - DELETE /jobs/<job_id>?ticket=<ticket> withdraws the request, the job is cancelled if no other request is left
+        - at most default_settings.job_api_max_running jobs run at the same time, further requests are answered with
+          status 429 and a Retry-After header
+        - requests need the header 'Authorization: Bearer <token>' (see ds.job_api_token), else status 401
+        - requests larger than ds.job_api_max_upload are refused by Flask (status 413)
+    '''
+    server.config['MAX_CONTENT_LENGTH'] = ds.job_api_max_upload
+
+    @server.route('/jobs', methods=['POST'])
+    def job_create():
+        import plate_layout as lay
+
+        if not _authorized():
+            return jsonify({'error': 'unauthorized'}), 401
+        if 'file' not in request.files:
+            return jsonify({'error': 'file missing'}), 400
+        try:
+            plate_file = request.files['file']
+            df = ax.read_data_file(plate_file.read(), plate_file.filename)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        except Exception:
+            return jsonify({'error': ms.error_upload_file}), 400
+        if ax.has_duplicate_samples(df):
+            return jsonify({'error': ms.error_duplicate_samples}), 400
+
+        layout_file = None
+        if 'layout' in request.files:
+            try:
+                layout_file = lay.read_layout_file(request.files['layout'].read(), request.files['layout'].filename)
+            except Exception:
+                return jsonify({'error': ms.error_layout_file}), 400
+
+        try:
+            settings = json.loads(request.form.get('settings') or '{}')
+            if not isinstance(settings, dict):
+                raise ValueError('settings need to be a JSON object')
+            kwargs = plate_job(df, settings, layout_file)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+
+        job_id, ticket = jb.submit_admitted('autofit_plate', **kwargs)
+        if job_id is None:
+            return jsonify({'error': 'too many running jobs'}), 429, {'Retry-After': str(ds.job_api_retry_after)}
+        return jsonify({'job': job_id, 'ticket': ticket, 'state': 'PENDING'}), 202, {'Location': '/jobs/{}'.format(job_id)}
+
+    @server.route('/jobs/<job_id>', methods=['GET'])
+    def job_status(job_id):
+        if not _authorized():
+            return jsonify({'error': 'unauthorized'}), 401
+        return jsonify(dict(jb.status(job_id), job=job_id))
+
+    @server.route('/jobs/<job_id>', methods=['DELETE'])
+    def job_cancel(job_id):
+        if not _authorized():
+            return jsonify({'error': 'unauthorized'}), 401
+        # jobs shared with identical requests keep running for the other clients (see worker.jobs.cancel())
+        if 'ticket' not in request.args:
+            return jsonify({'error': 'ticket missing'}), 400
+        jb.cancel(job_id, request.args['ticket'])
+        return jsonify(dict(jb.status(job_id), job=job_id))
+
+    @server.route('/jobs/<job_id>/results', methods=['GET'])
+    def job_results(job_id):
+        if not _authorized():
+            return jsonify({'error': 'unauthorized'}), 401
+        status = jb.status(job_id)
+        if status['state'] != 'SUCCESS':
+            return jsonify(dict(status, job=job_id, error=status.get('error', 'job not finished'))), 409
+        file_format = request.args.get('format', 'json')
+        if file_format not in ['json', 'parquet']:
+            return jsonify({'error': 'format needs to be json or parquet'}), 400
+        return results_response(job_id, file_format)
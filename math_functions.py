@@ -12,26 +12,83 @@ You should have received a copy of the GNU General Public License along with Das
 '''
 
 import numpy as np
+from scipy.special import expit
 from uncertainties import unumpy as unp
+from uncertainties import wrap
+
+
+# largest argument of np.exp that doesn't overflow
+EXP_MAX = np.log(np.finfo(float).max)
+
+
+################################################
+# kernels
+################################################
+# model functions are evaluated in place, i.e. with one output buffer and without temporaries, they can either be
+# written to a preallocated buffer (out) or evaluate many parameter sets against one time vector at once (*_batch)
+def _scaled_lag(x, l, rate, out=None):
+    # rate * (l - x), broadcast over parameter sets (columns) and time points
+    if out is None:
+        out = np.empty(np.broadcast(x, l, rate).shape)
+    np.subtract(l, x, out=out)
+    out *= rate
+    return out
+
+
+def _result(out):
+    # scalar time points return scalars
+    return out[()] if out.ndim == 0 else out
+
+
+def _columns(*params):
+    # parameter sets as column vectors for batch evaluation
+    return [np.asarray(p, dtype=float)[:, None] for p in params]
 
 
 def lin_function(x, m, t):
     return m * x + t
 
-def exp_function(t, n0, mu):
-    return n0 * np.exp(1)**(mu * t)
+def exp_function(t, n0, mu, out=None):
+    out = _scaled_lag(t, 0, - mu, out)
+    np.minimum(out, EXP_MAX, out=out)
+    np.exp(out, out=out)
+    out *= n0
+    return _result(out)
 
-def modified_gompertz(x, N0, A, mu, l):
+def modified_gompertz(x, N0, A, mu, l, out=None):
     # modified Gompertz function from "Modeling of the Bacterial Growth Curve", Zwittering et al, 1990
-    return np.log(N0) + A * np.exp(1)**(- np.exp(1)**(mu * np.exp(1) / A * (l - x) + 1))
+    # inner exponent is clipped before it overflows (the outer exponential is zero there anyway)
+    out = _scaled_lag(x, l, mu * np.e / A, out)
+    out += 1
+    np.minimum(out, EXP_MAX, out=out)
+    np.exp(out, out=out)
+    np.negative(out, out=out)
+    np.exp(out, out=out)
+    out *= A
+    out += np.log(N0)
+    return _result(out)
+
+def modified_gompertz_batch(x, N0, A, mu, l, out=None):
+    # evaluate the parameter sets N0[i], A[i], mu[i], l[i] at time points x, returns (parameter sets, time points) array
+    return modified_gompertz(x, *_columns(N0, A, mu, l), out=out)
 
 def modified_gompertz_uncertainty(x, N0, A, mu, l):
     # modified Gompertz function from "Modeling of the Bacterial Growth Curve", Zwittering et al, 1990
     return unp.log(N0) + A * np.exp(1)**(- np.exp(1)**(mu * np.exp(1) / A * (l - x) + 1))
 
-def modified_logistic(x, N0, A, mu, l):
+def modified_logistic(x, N0, A, mu, l, out=None):
     # modified Logistic function from "Modeling of the Bacterial Growth Curve", Zwittering et al, 1990
-    return np.log(N0) + A * 1 / (1 + np.exp(1)**(4 * mu / A * (l - x) + 2))
+    # A / (1 + e^z) evaluated as A * expit(-z), which doesn't overflow
+    out = _scaled_lag(x, l, - 4 * mu / A, out)
+    out -= 2
+    expit(out, out=out)
+    out *= A
+    out += np.log(N0)
+    return _result(out)
+
+def modified_logistic_batch(x, N0, A, mu, l, out=None):
+    # evaluate the parameter sets N0[i], A[i], mu[i], l[i] at time points x, returns (parameter sets, time points) array
+    return modified_logistic(x, *_columns(N0, A, mu, l), out=out)
 
 def modified_logistic_uncertainty(x, N0, A, mu, l):
     # modified function to deal with uncertainties in the parameters
@@ -40,11 +97,58 @@ def modified_logistic_uncertainty(x, N0, A, mu, l):
 
 def modified_richards(x, N0, A, mu, l, v):
     # modified Richards function from "Modeling of the Bacterial Growth Curve", Zwittering et al, 1990
-    return np.log(N0) + A * (1 + v * np.exp(1)**(1 + v) * np.exp(1)**(mu / A * (1 + v) * (1 + 1/v) * (l -x)))**(-1/v)
+    # special case of the modified Schnute function with negative shape parameter (v > 0), evaluated overflow-safe
+    return modified_schnute(x, N0, A, mu, l, -v)
+
+def modified_richards_uncertainty(x, N0, A, mu, l, v):
+    # modified function to deal with uncertainties in the parameters
+    # derivatives are computed numerically, the closed form overflows close to the Gompertz limit (v -> 0)
+    return wrap(lambda *args: float(modified_richards(*args)))(x, N0, A, mu, l, v)
+
+def _schnute_terms(x, A, mu, l, v):
+    # rate parameter a, exponent w and log(1 - v * e^w) of the modified Schnute function (-inf outside the domain for v > 0)
+    a = mu * (1 - v)**(1 - 1/v) / A
+    w = a * (l - np.asarray(x, dtype=float)) + 1 - v
+    with np.errstate(over='ignore', invalid='ignore', divide='ignore'):
+        # both branches are evaluated to support arrays of shape parameters (one per well)
+        log_q = np.where(v < 0, np.logaddexp(0, w + np.log(np.abs(v))), np.log1p(-np.minimum(np.exp(w + np.log(np.abs(v))), 1)))
+    return a, w, log_q
 
 def modified_schnute(x, N0, A, mu, l, v):
-    # modified Richards function from "Modeling of the Bacterial Growth Curve", Zwittering et al, 1990
-    return np.log(N0) + (mu * (1 - v) / A) * ((1 - v * np.exp(1)**(A * l + 1 - v - A * x)) / (1 - v))**(1/v)
+    # modified Schnute function from "Modeling of the Bacterial Growth Curve", Zwittering et al, 1990
+    # parameterized by the asymptote A (log carrying capacity) instead of the rate parameter a, shape parameter v < 1
+    # (v < 0: Richards function, v -> 0: Gompertz function), log(1 - v * e^w) is evaluated overflow-safe
+    _, _, log_q = _schnute_terms(x, A, mu, l, v)
+    return np.log(N0) + A * np.exp(log_q / v)
+
+def modified_schnute_uncertainty(x, N0, A, mu, l, v):
+    # modified function to deal with uncertainties in the parameters
+    # derivatives are computed numerically, the closed form overflows close to the Gompertz limit (v -> 0)
+    return wrap(lambda *args: float(modified_schnute(*args)))(x, N0, A, mu, l, v)
+
+def modified_schnute_jacobian(x, N0, A, mu, l, v):
+    '''
+        Analytic Jacobian of the modified Schnute function
+        - partial derivatives with respect to log(N0), log(A), log(mu), l and v (columns in this order)
+        - products that vanish outside of the domain (v > 0, early time points) are set to zero
+    '''
+    x = np.asarray(x, dtype=float)
+    a, w, log_q = _schnute_terms(x, A, mu, l, v)
+    log_g = log_q / v
+    g = np.exp(log_g)
+    with np.errstate(over='ignore', invalid='ignore'):
+        # g * e^w / q, evaluated in log space (e^w overflows at early time points for v < 0)
+        g_r = np.where(np.isfinite(log_q), np.exp(log_g + w - log_q), 0)
+        g_log_q = np.where(np.isfinite(log_q), g * log_q, 0)
+    dw_dv = a * (l - x) * (np.log(1 - v) / v**2 + 1 / v) - 1
+
+    J = np.empty((x.shape[0], 5))
+    J[:, 0] = 1
+    J[:, 1] = A * g + A * g_r * a * (l - x)
+    J[:, 2] = - A * g_r * a * (l - x)
+    J[:, 3] = - A * g_r * a
+    J[:, 4] = A * (- g_r / v - g_log_q / v**2 - g_r * dw_dv)
+    return J
 
 def comp_R2(xdata, ydata, popt):
     residuals = ydata - lin_function(xdata, *popt)
@@ -56,4 +160,33 @@ def comp_R2(xdata, ydata, popt):
     return r2
 
 def rmse(data, data_predicted):
-    return np.sqrt(np.mean((data_predicted - data) ** 2))
\ No newline at end of file
+    return np.sqrt(np.mean((data_predicted - data) ** 2))
+
+
+def robust_loss(residuals, loss='linear', f_scale=1.0):
+    # loss of every residual as minimized by scipy's least_squares (cost = sum / 2), z = (residual / f_scale)^2
+    z = (np.asarray(residuals, dtype=float) / f_scale)**2
+    if loss == 'soft_l1':
+        rho = 2 * (np.sqrt(1 + z) - 1)
+    elif loss == 'huber':
+        rho = np.where(z <= 1, z, 2 * np.sqrt(z) - 1)
+    elif loss == 'cauchy':
+        rho = np.log1p(z)
+    elif loss == 'arctan':
+        rho = np.arctan(z)
+    else:
+        rho = z
+    return f_scale**2 * rho
+
+def robust_weights(residuals, loss='linear', f_scale=1.0):
+    # weight of every data point in a robust fit (derivative of the loss, 1: full weight, 0: ignored), z = (residual / f_scale)^2
+    z = (np.asarray(residuals, dtype=float) / f_scale)**2
+    if loss == 'soft_l1':
+        return 1 / np.sqrt(1 + z)
+    elif loss == 'huber':
+        return 1 / np.sqrt(np.maximum(z, 1))
+    elif loss == 'cauchy':
+        return 1 / (1 + z)
+    elif loss == 'arctan':
+        return 1 / (1 + z**2)
+    return np.ones_like(z)
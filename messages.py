@@ -32,8 +32,13 @@ tooltip_auto_sr = 'Delineate window around maximum slope that is considered for
 tooltip_auto_weight = 'Higher values favor improved fit over size of the fitted area'
 
 tooltip_set_blanks = 'Set the default blanks for all samples (Note: overrides previously set blanks for individual samples)'
+tooltip_blank_model = 'Selected blanks: subtract the mean of the blanks set for each sample. Row/Column median: median of the blank wells in the same plate row/column. Plate median: median of all blank wells. Spatial fit: background predicted from the plate position by a smooth fit across all blank wells (accounts for edge effects, e.g. evaporation)'
+tooltip_bootstrap_resamples = 'Number of residual bootstrap resamples per sample used by automatic fitting to compute confidence intervals of growth rate, lag time and doubling time (0: no bootstrap). Confidence intervals are added to the downloaded growth parameters (e.g. mumax_ci_low, mumax_ci_high)'
+tooltip_fit_loss = 'Loss function of automatic Gompertz, Logistic and Easy Linear fits. linear: ordinary least squares. soft_l1, huber, cauchy, arctan: robust fits that down-weight single outlier time points (e.g. bubbles, condensation), so raw data can be fitted without smoothing. Outliers are marked in the log-scale graph'
+tooltip_fit_loss_scale = 'Scale of the robust loss in log units (natural logarithm of the population size measure), deviations from the fit larger than this scale are down-weighted'
 
-tooltip_csv_download = dcc.Markdown('t0: start of log phase<br>t1: end of log-phase<br>t0_idx: datapoint at which log-phase starts', dangerously_allow_html=True)
+tooltip_fit_sample_button = 'Fit the displayed sample again with the selected fitting algorithm and settings (including bootstrap confidence intervals if set)'
+tooltip_csv_download = dcc.Markdown('t0: start of log phase<br>t1: end of log-phase<br>l: lag parameter (lambda) of the sigmoid models<br>t0_idx: datapoint at which log-phase starts<br>*_ci_low/*_ci_high: bootstrap confidence interval<br>point_weights: weight of every time point in a robust fit<br>phase_*: growth phases of the Multi-phase algorithm', dangerously_allow_html=True)
 # settings div
 
 
@@ -45,6 +50,13 @@ error_blank_name = 'Invalid blank name. All blank names need to be existing samp
 error_blank_location = 'Invalid blank locations. All blank names need to be existing sample names.'
 error_duplicate_sample = 'Duplicate sample name. Sample names need to be unique. For replicates append number to sample name (e.g. test 5)'
 
+error_sample_fit = 'The fit of the sample failed, its previous growth parameters are kept.'
+error_layout_file = 'Could not read layout file. Layout file needs to be either Excel file or semicolon-separated .csv file with a header line and one unique well label (e.g. A1 or AF48) per data row'
+error_stream_source = 'No live data found. Enter the path of a growing .csv export in the watch directory of the server or the id of a session started via the /stream API.'
+error_stream_limit = 'Too many live sessions on the server, please try again later.'
+error_stream_empty = 'The live session does not contain any time points yet.'
+error_layout_length = 'Number of wells in layout file does not match number of samples in data file.'
+
 error_smoother_ws = 'window size needs to be an integer > 0'
 
 error_manual_like_fit_ws = 'Window size needs to be an integer value'
@@ -65,6 +77,16 @@ upload_area = dcc.Markdown(
                 '<b>Drag and Drop or Select File (semicolon-separated .csv or Excel)</b>',
                  dangerously_allow_html=True
                  )
+
+upload_layout_area = dcc.Markdown(
+                'Optional: Drag and Drop or Select plate layout file (well label for every sample, upload before data file)',
+                 dangerously_allow_html=True
+                 )
+
+stream_source_placeholder = 'Live plate read: path of a growing .csv export or id of a /stream session'
+
+layout_file_loaded = 'Plate layout with {} wells loaded.'
+layout_file_after_data = 'Plate layout with {} wells loaded. It is applied to the next data upload, upload the data file again to use it for the current data.'
                                                                     
 
 data_privacy_text = dcc.Markdown('''
@@ -0,0 +1,119 @@
+'''
+author: Michael A. Reiter
+(c) ETH Zurich, Michael A. Reiter, 2022
+
+This file is part of Dashing Growth Curves.
+
+Dashing Growth Curves is free software: you can redistribute it and/or modify it under the terms of the GNU General Public License as published by the Free Software Foundation, either version 3 of the License, or (at your option) any later version.
+
+Dashing Growth Curves is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License along with Dashing Growth Curves. If not, see <https://www.gnu.org/licenses/>.
+'''
+
+import hashlib
+import os
+import threading
+import uuid
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+
+import data_transport as dt
+import default_settings as ds
+
+
+# decoded plates are written once as .npy files and memory-mapped by every server process (gunicorn workers) that needs them
+# plates mapped by this process (key: data hash, value: read-only memory map)
+_attached = OrderedDict()
+_lock = threading.Lock()
+
+
+################################################
+# cache keys
+################################################
+def data_hash(data):
+    # content hash of the stored plate values (see data_transport.frame_for_store()), without decoding them
+    h = hashlib.blake2b(digest_size=16)
+    for block in data['blocks']:
+        h.update('{}{}{}'.format(block['dtype'], block['shape'], block.get('compression')).encode())
+        h.update(block['data'].encode('ascii'))
+    return h.hexdigest()
+
+
+def _path(key):
+    return os.path.join(ds.plate_cache_dir, key + '.npy')
+
+
+################################################
+# cache
+################################################
+def _attach(key):
+    # memory map of a cached plate (None if not cached)
+    with _lock:
+        values = _attached.get(key)
+        if values is not None:
+            _attached.move_to_end(key)
+            return values
+    try:
+        values = np.load(_path(key), mmap_mode='r')
+        os.utime(_path(key))   # mark as recently used (see _prune())
+    except (OSError, ValueError):
+        return None
+    with _lock:
+        _attached[key] = values
+        while len(_attached) > ds.plate_cache_max_attached:
+            _attached.popitem(last=False)
+    return values
+
+
+def _write(key, values):
+    # the file is renamed into place when complete, other processes never see a partially written plate
+    os.makedirs(ds.plate_cache_dir, exist_ok=True)
+    tmp = _path(key) + '.{}.tmp'.format(uuid.uuid4().hex)
+    try:
+        with open(tmp, 'wb') as f:
+            np.save(f, values)
+        os.replace(tmp, _path(key))
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+    _prune()
+
+
+def _prune():
+    # remove the least recently used plates if more than ds.plate_cache_max_files are cached
+    try:
+        files = [os.path.join(ds.plate_cache_dir, f) for f in os.listdir(ds.plate_cache_dir) if f.endswith('.npy')]
+        if len(files) <= ds.plate_cache_max_files:
+            return
+        files.sort(key=os.path.getmtime)
+        for f in files[:len(files) - ds.plate_cache_max_files]:
+            os.remove(f)
+    except OSError:
+        # other processes prune at the same time
+        pass
+
+
+def frame_from_store(data):
+    '''
+        Plate data as DataFrame from store_data_df or store_data_df_smoothed (see data_transport.frame_from_store())
+        - the values are decoded by the first process that needs them and shared via a memory-mapped file (read-only)
+        - falls back to decoding in this process if the cache is disabled or can't be written
+    '''
+    if (not ds.plate_cache_enabled) or ('blocks' not in data):
+        return dt.frame_from_store(data)
+
+    key = data_hash(data)
+    values = _attach(key)
+    if values is None:
+        df = dt.frame_from_store(data)
+        try:
+            _write(key, df.values)
+        except OSError:
+            return df
+        values = _attach(key)
+        if values is None:
+            return df
+    return pd.DataFrame(values, index=data['index'], columns=data['columns'], copy=False)
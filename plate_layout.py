@@ -0,0 +1,131 @@
+'''
+author: Michael A. Reiter
+(c) ETH Zurich, Michael A. Reiter, 2022
+
+This file is part of Dashing Growth Curves.
+
+Dashing Growth Curves is free software: you can redistribute it and/or modify it under the terms of the GNU General Public License as published by the Free Software Foundation, either version 3 of the License, or (at your option) any later version.
+
+Dashing Growth Curves is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License along with Dashing Growth Curves. If not, see <https://www.gnu.org/licenses/>.
+'''
+
+import io
+from string import ascii_uppercase
+
+import numpy as np
+import pandas as pd
+
+import default_settings as ds
+
+
+################################################
+# row labels
+################################################
+def row_labels(n_rows):
+    # spreadsheet-style row labels: A-Z, then AA, AB, ... (1536-well plates use rows A-Z and AA-AF)
+    letters = np.array(list(ascii_uppercase))
+    idx = np.arange(n_rows)
+    single = letters[idx % 26]
+    prefix = np.where(idx >= 26, letters[(idx // 26 - 1) % 26], '')
+    return np.char.add(prefix, single)
+
+
+def row_index(labels):
+    # inverse of row_labels(), i.e. 'A' -> 0, 'Z' -> 25, 'AA' -> 26
+    labels = pd.Series(labels, dtype=str).str.upper()
+    first = labels.str[0].map(ord).values - ord('A')
+    second = labels.str[1].fillna('').map(lambda x: ord(x) - ord('A') if x else -1).values
+    return np.where(second >= 0, (first + 1) * 26 + second, first)
+
+
+################################################
+# plate layouts
+################################################
+def generate_plate_layout(n_wells, locations=None):
+    '''
+        Generate the layout of a plate with n_wells wells
+        - n_wells: number of samples in the uploaded data
+        - locations: optional list of well labels (e.g. from a layout file) mapping data rows to wells
+
+        Returns a dict holding the well labels as well as the row and column indices of every data row as arrays
+        (row_idx/col_idx are -1 if the data row can't be placed on a plate, e.g. for numerical IDs).
+    '''
+    if locations is not None:
+        locations = np.asarray(locations, dtype=str)
+        row_idx, col_idx = parse_well_labels(locations)
+        n_rows = int(row_idx.max()) + 1 if (row_idx >= 0).any() else 0
+        n_cols = int(col_idx.max()) + 1 if (col_idx >= 0).any() else 0
+
+    elif n_wells in ds.plate_formats:
+        n_rows, n_cols = ds.plate_formats[n_wells]
+        row_idx = np.repeat(np.arange(n_rows), n_cols)
+        col_idx = np.tile(np.arange(n_cols), n_rows)
+        locations = np.char.add(row_labels(n_rows)[row_idx], (col_idx + 1).astype(str))
+
+    else:
+        # data wasn't collected in any of the supported plate formats, just generate numerical IDs
+        n_rows, n_cols = 0, 0
+        row_idx = np.full(n_wells, -1)
+        col_idx = np.full(n_wells, -1)
+        locations = np.arange(1, n_wells + 1).astype(str)
+
+    return {
+            'locations': locations,
+            'row_idx': row_idx,
+            'col_idx': col_idx,
+            'n_rows': n_rows,
+            'n_cols': n_cols,
+            }
+
+
+def parse_well_labels(locations):
+    # split well labels (e.g. 'B7', 'AF48') into row and column indices, labels that aren't wells get index -1
+    parts = pd.Series(locations, dtype=str).str.strip().str.extract(r'^([A-Za-z]{1,2})0*(\d+)$')
+    valid = parts[0].notna().values
+    row_idx = np.full(len(parts), -1)
+    col_idx = np.full(len(parts), -1)
+    if valid.any():
+        row_idx[valid] = row_index(parts.loc[valid, 0].values)
+        col_idx[valid] = parts.loc[valid, 1].astype(int).values - 1
+    return row_idx, col_idx
+
+
+def layout_for_store(layout):
+    # numpy arrays can't be stored in Dash stores
+    return {key: value.tolist() if isinstance(value, np.ndarray) else value for key, value in layout.items()}
+
+
+def layout_from_store(layout):
+    return {key: np.asarray(value) if isinstance(value, list) else value for key, value in layout.items()}
+
+
+################################################
+# layout files
+################################################
+def read_layout_file(decoded, filename):
+    '''
+        Read an explicit layout file mapping the rows of the uploaded data to wells
+        - one well label per data row (in the order of the data), either as single column or in a column named 'well'
+        - the first line of the file is a header line
+        - semicolon-separated .csv or Excel file (same conventions as data upload)
+
+        Returns the list of well labels, raises ValueError if the file doesn't contain valid well labels.
+    '''
+    if filename.split('.')[-1] == 'csv':
+        layout = pd.read_csv(io.StringIO(decoded.decode('utf-8')), sep=';', dtype=str)
+    elif filename.split('.')[-1] in ['xlsx', 'xls']:
+        layout = pd.read_excel(decoded, dtype=str)
+    else:
+        raise ValueError('unsupported file type')
+
+    columns = [c for c in layout.columns if str(c).strip().lower() == 'well']
+    wells = layout[columns[0]] if len(columns) > 0 else layout.iloc[:, -1]
+    wells = wells.dropna().str.strip().str.upper()
+
+    # all wells need to be valid and unique
+    row_idx, col_idx = parse_well_labels(wells.values)
+    if (wells.shape[0] == 0) or (row_idx < 0).any() or (col_idx < 0).any() or wells.duplicated().any():
+        raise ValueError('invalid well labels')
+    return wells.tolist()
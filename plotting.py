@@ -10,8 +10,11 @@ Dashing Growth Curves is distributed in the hope that it will be useful, but WIT
 
 You should have received a copy of the GNU General Public License along with Dashing Growth Curves. If not, see <https://www.gnu.org/licenses/>.
 '''
+import numpy as np
 import plotly.graph_objects as go
 
+import plate_layout as lay
+
 
 def overview_plot(df):
     def error_band(mean, std):
@@ -152,3 +155,49 @@ def bar_chart(names, y, errors, n_ex, y_axis='y', dp_overlay=None, ):
 
     fig = go.Figure(data=data, layout=layout)
     return fig
+
+
+def plate_matrix(plate_layout, values, fill_value=np.nan):
+    # arrange per-sample values on the plate grid (samples without plate position are dropped)
+    values = np.asarray(values)
+    dtype = object if values.dtype == object else np.result_type(values.dtype, np.min_scalar_type(fill_value))
+    matrix = np.full((plate_layout['n_rows'], plate_layout['n_cols']), fill_value, dtype=dtype)
+    row_idx = np.asarray(plate_layout['row_idx'])
+    col_idx = np.asarray(plate_layout['col_idx'])
+    on_plate = row_idx >= 0
+    matrix[row_idx[on_plate], col_idx[on_plate]] = values[on_plate]
+    return matrix
+
+
+def plate_heatmap(plate_layout, values, sample_names, parameter_name):
+    # plate view colouring every well by a growth parameter, rendered as a single heatmap trace
+    # customdata holds the sample index of each well (-1 for empty wells) to jump to the sample on click
+    z = plate_matrix(plate_layout, values)
+    sample_idx = plate_matrix(plate_layout, np.arange(len(values)), fill_value=-1)
+    text = plate_matrix(plate_layout, np.array(sample_names, dtype=object), fill_value='')
+
+    # nested lists (rather than arrays) so that individual wells can be updated in place with a Patch
+    data = [go.Heatmap(
+                        z=np.where(np.isnan(z), None, z).tolist(),
+                        x=np.arange(1, plate_layout['n_cols'] + 1),
+                        y=lay.row_labels(plate_layout['n_rows']),
+                        customdata=sample_idx.tolist(),
+                        text=text.tolist(),
+                        hovertemplate='%{y}%{x}: %{text}<br>' + parameter_name + ' = %{z:.3f}<extra></extra>',
+                        colorscale='Viridis',
+                        xgap=2,
+                        ygap=2,
+                        hoverongaps=False,
+                        )]
+
+    layout = go.Layout(
+                      font = {'size': 16},
+                      xaxis = {'side': 'top', 'dtick': 1 if plate_layout['n_cols'] <= 24 else 4, 'showgrid': False, 'zeroline': False},
+                      yaxis = {'autorange': 'reversed', 'showgrid': False, 'zeroline': False},
+                      paper_bgcolor = 'rgba(0,0,0,0)',
+                      plot_bgcolor = 'rgba(0,0,0,0)',
+                      margin = {'l': 60, 'r': 0, 't': 40, 'b': 20},
+                      modebar =  {'bgcolor':'rgba(0,0,0,0)', 'color':'darkslategrey', "activecolor":'black'},
+                      )
+    fig = go.Figure(data=data, layout=layout)
+    return fig
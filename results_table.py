@@ -0,0 +1,189 @@
+'''
+author: Michael A. Reiter
+(c) ETH Zurich, Michael A. Reiter, 2022
+
+This file is part of Dashing Growth Curves.
+
+Dashing Growth Curves is free software: you can redistribute it and/or modify it under the terms of the GNU General Public License as published by the Free Software Foundation, either version 3 of the License, or (at your option) any later version.
+
+Dashing Growth Curves is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License along with Dashing Growth Curves. If not, see <https://www.gnu.org/licenses/>.
+'''
+
+import numpy as np
+import pandas as pd
+
+import data_transport as dt
+
+
+################################################
+# fields
+################################################
+# growth results of all samples are kept in columns (one array per field, one entry per sample location)
+# fields in the order of the downloaded table
+fields = [
+            'sample_name', 'excluded_flag', 'fitting_mode',
+            't0', 't1', 't0_std', 't1_std', 't0_idx', 't1_idx',
+            'mumax', 'mumax_std',
+            'dt', 'dt_std',
+            'doublings',
+            'doublings_log', 'doublings_log_std',
+            'yield',
+            'v', 'v_std',
+            'A', 'A_std',
+            'N0', 'N0_std',
+            'l', 'l_std',
+            'error',                # R2 if manual, Easy Linear or Multi-phase fit, else RMSE
+            'smoothing_window',
+            'blank_model',
+            'mumax_ci_low', 'mumax_ci_high',
+            't0_ci_low', 't0_ci_high',
+            'dt_ci_low', 'dt_ci_high',
+            'selected_model', 'model_score',
+            'runner_up_model', 'runner_up_score',
+            'model_criterion',
+            'fit_loss', 'point_weights',
+            'phase_mumax', 'phase_mumax_std',
+            'phase_t0', 'phase_t1', 'phase_N0',
+            ]
+
+bool_fields = ['excluded_flag']
+text_fields = ['sample_name', 'fitting_mode', 'blank_model', 'selected_model', 'runner_up_model', 'model_criterion', 'fit_loss']
+array_fields = ['point_weights', 'phase_mumax', 'phase_mumax_std', 'phase_t0', 'phase_t1', 'phase_N0']    # one array per sample
+index_fields = ['t0_idx', 't1_idx']     # data point indices of manual fits (stored as float to hold NaN)
+float_fields = [f for f in fields if f not in bool_fields + text_fields + array_fields]
+
+# fields set by a fit (reset when a sample is fitted again)
+fit_fields = [f for f in fields if f not in ['sample_name', 'excluded_flag']]
+
+
+def _empty_column(field, n):
+    # unset values: NaN (numbers), None (text and arrays), False (flags)
+    if field in bool_fields:
+        return np.zeros(n, dtype=bool)
+    elif field in float_fields:
+        return np.full(n, np.nan)
+    return np.full(n, None, dtype=object)
+
+
+################################################
+# tables
+################################################
+def new_table(sample_locations, sample_names):
+    '''
+        Results table without fits
+        - sample_locations: sample locations (keys of the samples)
+        - sample_names: sample names in the same order
+
+        Returns a dict with the sample locations and one array per field (see fields).
+    '''
+    n = len(sample_locations)
+    table = {'sample_locations': np.asarray(sample_locations, dtype=str)}
+    for field in fields:
+        table[field] = _empty_column(field, n)
+    table['sample_name'][:] = list(sample_names)
+    return table
+
+
+def sample_index(table, sp):
+    # row of a sample location
+    return int(np.flatnonzero(table['sample_locations'] == sp)[0])
+
+
+def set_fit(table, sp, **values):
+    # replace the fit of one sample, fields that are not given are reset
+    i = sample_index(table, sp)
+    for field in fit_fields:
+        value = values.get(field, None)
+        if field in array_fields:
+            table[field][i] = None if value is None else np.asarray(value, dtype=float)
+        elif field in float_fields:
+            table[field][i] = np.nan if value is None else value
+        else:
+            table[field][i] = value
+    return table
+
+
+def merge_fits(table, fitted):
+    # fits of another table of the plate (e.g. the result of an autofit job) replace the fits of the same samples,
+    # samples it has no fit for keep theirs (names and excluded flags are always kept)
+    rows = np.flatnonzero([x is not None for x in fitted['fitting_mode']])
+    idx = [sample_index(table, sp) for sp in fitted['sample_locations'][rows]]
+    for field in fit_fields:
+        table[field][idx] = fitted[field][rows]
+    return table
+
+
+def sample_row(table, sp):
+    # all fields of one sample as dict (data point indices as int, NaN if not set)
+    i = sample_index(table, sp)
+    row = {field: table[field][i] for field in fields}
+    for field in index_fields:
+        if not np.isnan(row[field]):
+            row[field] = int(row[field])
+    return row
+
+
+def has_fit(table):
+    # samples with a fitted growth rate
+    return np.array([x is not None for x in table['fitting_mode']], dtype=bool) & ~np.isnan(table['mumax'])
+
+
+def to_dataframe(table):
+    # table with one row per sample location (e.g. for download), arrays as lists
+    data = {field: table[field] for field in fields}
+    for field in array_fields:
+        data[field] = [None if x is None else x.tolist() for x in table[field]]
+    return pd.DataFrame(data, index=table['sample_locations'])
+
+
+################################################
+# serialization
+################################################
+def table_for_store(table):
+    '''
+        Serialize a results table for a Dash store
+        - numbers and flags as base64 encoded little-endian arrays (NaN values are kept), see data_transport.encode_array()
+          (uncompressed, the store is decoded in the browser, see assets/clientside.js)
+        - arrays of all samples concatenated, with their lengths (-1: not set)
+        - text as lists (None: not set)
+    '''
+    columns = {}
+    for field in fields:
+        column = table[field]
+        if field in bool_fields:
+            columns[field] = dt.encode_array(column, '|b1')
+        elif field in float_fields:
+            columns[field] = dt.encode_array(column, '<f8')
+        elif field in array_fields:
+            lengths = [-1 if x is None else len(x) for x in column]
+            values = [x for x in column if x is not None]
+            data = np.concatenate(values) if len(values) > 0 else np.empty(0)
+            columns[field] = dict(dt.encode_array(data, '<f8'), dtype='ragged', lengths=lengths)
+        else:
+            columns[field] = {'dtype': 'text', 'data': column.tolist()}
+    return {'sample_locations': table['sample_locations'].tolist(), 'columns': columns}
+
+
+def table_from_store(data):
+    # results table from its serialized form (see table_for_store())
+    table = {'sample_locations': np.asarray(data['sample_locations'], dtype=str)}
+    n = len(table['sample_locations'])
+    for field in fields:
+        column = data['columns'].get(field)
+        if column is None:
+            table[field] = _empty_column(field, n)
+        elif column['dtype'] == 'ragged':
+            values = dt.decode_array(dict(column, dtype='<f8'))
+            table[field] = np.full(n, None, dtype=object)
+            offset = 0
+            for i, length in enumerate(column['lengths']):
+                if length >= 0:
+                    table[field][i] = values[offset:offset + length]
+                    offset += length
+        elif column['dtype'] == 'text':
+            table[field] = np.array(column['data'], dtype=object)
+        else:
+            table[field] = dt.decode_array(column)
+    return table
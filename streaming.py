@@ -0,0 +1,417 @@
+'''
+author: Michael A. Reiter
+(c) ETH Zurich, Michael A. Reiter, 2022
+
+This file is part of Dashing Growth Curves.
+
+Dashing Growth Curves is free software: you can redistribute it and/or modify it under the terms of the GNU General Public License as published by the Free Software Foundation, either version 3 of the License, or (at your option) any later version.
+
+Dashing Growth Curves is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License along with Dashing Growth Curves. If not, see <https://www.gnu.org/licenses/>.
+'''
+
+import hmac
+import os
+import threading
+import time
+import uuid
+
+from flask import jsonify, request
+
+import default_settings as ds
+from worker import store
+
+
+# live sessions are kept in the shared store (see worker/store.py), so all server processes see the time points sent to
+# any of them: samples and csv path of a session, time points of the HTTP feed as blocks, every process keeps its own
+# copy with the blanked data and growth rates (key: session id, 'csv:<path>' for watched files or the id of the HTTP API)
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+
+class SessionLimitReached(Exception):
+    pass
+
+
+################################################
+# rolling Easy Linear statistics
+################################################
+class RollingLinearFit:
+    '''
+        Easy Linear growth rates of all wells, updated with every new time point
+        - sums of x, y, x^2, xy and y^2 over the last ws points of every well are kept, a new time point adds one point
+          to and removes one point from every window (O(1) per well)
+        - the window [k - ws, k) is evaluated when time point k arrives (same windows as auto_fitting.autofit_easylinear())
+        - non-positive blanked values cannot be log-transformed, windows containing them are skipped
+    '''
+    def __init__(self, n_wells, ws, t_ref):
+        import numpy as np
+
+        self.ws = int(ws)
+        self.t_ref = t_ref  # time points are shifted to keep the sums small
+        self.n = 0
+        self.sums = np.zeros((5, n_wells))
+        self.n_valid = np.zeros(n_wells, dtype=int)
+        self.mumax = np.full(n_wells, np.nan)
+        self.t_start = np.full(n_wells, np.nan)
+        self.t_end = np.full(n_wells, np.nan)
+        self.intercept = np.full(n_wells, np.nan)
+
+    def _terms(self, t, y_blanked):
+        import numpy as np
+
+        # summands of the window sums, non-positive values are left out
+        valid = y_blanked > 0
+        x = np.where(valid, t - self.t_ref, 0)
+        y = np.log(np.where(valid, y_blanked, 1))
+        return np.stack([x, y, x * x, x * y, y * y]), valid
+
+    def push(self, t, y_blanked, t_leaving=None, y_leaving=None):
+        '''
+            Add one time point of all wells
+            - t, y_blanked: new time point and blanked values of all wells
+            - t_leaving, y_leaving: time point and blanked values leaving the window (needed once ws points were pushed)
+        '''
+        if self.n >= self.ws:
+            self._evaluate(t_leaving, t)
+            terms, valid = self._terms(t_leaving, y_leaving)
+            self.sums -= terms
+            self.n_valid -= valid
+
+        terms, valid = self._terms(t, y_blanked)
+        self.sums += terms
+        self.n_valid += valid
+        self.n += 1
+
+    def _evaluate(self, t_start, t_end):
+        import numpy as np
+
+        # least squares line through the current window of every well, the steepest window so far is kept
+        sx, sy, sxx, sxy, syy = self.sums
+        n = self.ws
+        with np.errstate(divide='ignore', invalid='ignore'):
+            dxx = sxx - sx * sx / n
+            slope = (sxy - sx * sy / n) / dxx
+        steeper = (self.n_valid == n) & (dxx > 0) & (slope > 0) & ~(slope <= self.mumax)
+        self.mumax[steeper] = slope[steeper]
+        self.intercept[steeper] = (sy[steeper] - slope[steeper] * sx[steeper]) / n - slope[steeper] * self.t_ref
+        self.t_start[steeper] = t_start
+        self.t_end[steeper] = t_end
+
+
+################################################
+# live session
+################################################
+class StreamingSession:
+    '''
+        Growing data set of a live plate read
+        - raw and blanked data are stored in preallocated arrays that double in size when full
+        - new time points are blanked on their own (all blank models only combine wells of the same time point) and update
+          the rolling Easy Linear statistics, a change of the blanks or the window size recomputes both once
+        - csv_path: optional growing csv export (same format as uploaded files), read on every poll()
+    '''
+    def __init__(self, sample_names, csv_path=None, session_id=None):
+        import numpy as np
+
+        self.sample_names = list(sample_names)
+        self.csv_path = csv_path
+        self.session_id = session_id
+        self.created = None     # version of the session in the shared store (a session id can be started again)
+        self.n_blocks = 0       # blocks of time points of the shared store added to this copy
+        self._csv_mtime = None
+        self.lock = threading.Lock()
+        self.n = 0
+        self._t = np.empty(ds.stream_initial_capacity)
+        self._raw = np.empty((len(self.sample_names), ds.stream_initial_capacity))
+        self._blanked = np.empty_like(self._raw)
+        self._config = None
+        self._fit = None
+
+    @property
+    def t(self):
+        return self._t[:self.n]
+
+    @property
+    def raw(self):
+        return self._raw[:, :self.n]
+
+    def append(self, t_new, values_new):
+        '''
+            Append time points
+            - t_new: new time points (must be later than all stored time points)
+            - values_new: measurements of all samples, shaped (samples, time points)
+        '''
+        import numpy as np
+
+        t_new = np.atleast_1d(np.asarray(t_new, dtype=float))
+        values_new = np.asarray(values_new, dtype=float).reshape(len(self.sample_names), t_new.shape[0])
+        with self.lock:
+            t_all = np.concatenate([self.t[-1:], t_new])
+            if (np.diff(t_all) <= 0).any():
+                raise ValueError('time points must be increasing')
+            if self.n + t_new.shape[0] > self._t.shape[0]:
+                self._grow(self.n + t_new.shape[0])
+            start = self.n
+            self._t[start:start + t_new.shape[0]] = t_new
+            self._raw[:, start:start + t_new.shape[0]] = values_new
+            self.n += t_new.shape[0]
+            if self._config is not None:
+                self._update(start)
+        return self.n
+
+    def _grow(self, n_min):
+        import numpy as np
+
+        capacity = max(2 * self._t.shape[0], n_min)
+        for name in ['_t', '_raw', '_blanked']:
+            old = getattr(self, name)
+            new = np.empty(old.shape[:-1] + (capacity,))
+            new[..., :self.n] = old[..., :self.n]
+            setattr(self, name, new)
+
+    def configure(self, sample_names, blank_locs, sample_locations, blank_model, plate_layout, ws):
+        '''
+            Set blanks and Easy Linear window size (same arguments as blanking.blanked_plate(), sample names may have been
+            renamed in the app), blanked data and growth rates are only recomputed if they changed
+        '''
+        config = (list(sample_names), {sp: list(blank_locs[sp]) for sp in sample_locations}, list(sample_locations), blank_model,
+                  None if plate_layout is None else (plate_layout['n_rows'], plate_layout['n_cols'], tuple(plate_layout['row_idx']), tuple(plate_layout['col_idx'])),
+                  int(ws))
+        with self.lock:
+            if config == self._config:
+                return
+            self._config = config
+            self._plate_layout = plate_layout
+            self._fit = None
+            self._update(0)
+
+    def _background(self, values):
+        import blanking as blk
+
+        # background of a block of time points (see blanking.blanked_plate())
+        sample_names, blank_locs, sample_locations, blank_model, _, _ = self._config
+        if blank_model == 'Selected blanks':
+            groups, group_idx = blk.blank_groups(blank_locs, sample_locations)
+            return blk.blank_group_means(values, sample_names, groups)[group_idx]
+        return blk.model_background(values, sample_names, blank_locs, blank_model, self._plate_layout)
+
+    def _update(self, start):
+        # blank the time points from start on and push them to the rolling growth rate statistics
+        if start >= self.n:
+            return
+        values = self._raw[:, start:self.n]
+        self._blanked[:, start:self.n] = values - self._background(values)
+        if self._fit is None:
+            self._fit = RollingLinearFit(len(self.sample_names), self._config[-1], self._t[0])
+            start = 0
+        ws = self._fit.ws
+        for k in range(start, self.n):
+            if k >= ws:
+                self._fit.push(self._t[k], self._blanked[:, k], self._t[k - ws], self._blanked[:, k - ws])
+            else:
+                self._fit.push(self._t[k], self._blanked[:, k])
+
+    def blanked(self, start=0):
+        return self._blanked[:, start:self.n]
+
+    def growth_rates(self):
+        import numpy as np
+
+        # steepest Easy Linear growth rate of every well so far (NaN if no window was evaluated yet)
+        if self._fit is None:
+            return np.full(len(self.sample_names), np.nan)
+        return self._fit.mumax.copy()
+
+    def to_dataframe(self, start=0):
+        import pandas as pd
+
+        # raw data in the format of uploaded files (sample names as index, time points as columns)
+        return pd.DataFrame(self._raw[:, start:self.n], index=self.sample_names, columns=self._t[start:self.n])
+
+    def poll(self):
+        # append new time points of the watched csv file, if it changed since the last poll
+        if self.csv_path is None:
+            return self.n
+        mtime = os.stat(self.csv_path).st_mtime_ns
+        if mtime == self._csv_mtime:
+            return self.n
+        self._csv_mtime = mtime
+        df = read_csv_export(self.csv_path)
+        if df.shape[1] > self.n:
+            self.append(df.columns.values[self.n:], df.values[:, self.n:])
+        return self.n
+
+
+def read_csv_export(path):
+    import numpy as np
+    import pandas as pd
+
+    # csv export of a plate reader, formatted like uploaded files (first column: sample names, other columns: time points)
+    df = pd.read_csv(path, sep=';', index_col=0)
+    df.columns = df.columns.astype(float)
+    # a row might still be written, incomplete time points are read on the next poll
+    complete = df.notna().all(axis=0).values
+    n_complete = complete.shape[0] if complete.all() else int(np.argmin(complete))
+    return df.iloc[:, :n_complete].astype(float)
+
+
+################################################
+# session registry
+################################################
+def _key(session_id):
+    return 'stream:' + session_id
+
+
+def _block_key(session_id, k):
+    return 'stream:{}:{}'.format(session_id, k)
+
+
+def _register(session_id):
+    # add a session to the live sessions of all processes, new sessions are refused if ds.stream_max_sessions are live
+    with store.lock('stream:sessions'):
+        now = time.time()
+        sessions = {s: t for s, t in (store.get('stream:sessions') or {}).items() if now - t < ds.stream_session_expires}
+        if (session_id not in sessions) and (len(sessions) >= ds.stream_max_sessions):
+            raise SessionLimitReached
+        sessions[session_id] = now
+        store.set('stream:sessions', sessions, ds.stream_session_expires)
+
+
+def _sync(session, meta):
+    import data_transport as dt
+
+    # add the blocks of time points other processes added to the shared store
+    for k in range(session.n_blocks, meta['n_blocks']):
+        block = store.get(_block_key(session.session_id, k))
+        if block is None:
+            break
+        session.append(block['t'], dt.decode_array(block['values']))
+        session.n_blocks = k + 1
+
+
+def get_session(session_id):
+    # live session (None if unknown or expired), brought up to date with the shared store
+    meta = store.get(_key(session_id))
+    if meta is None:
+        return None
+    with _sessions_lock:
+        session = _sessions.get(session_id)
+        if (session is None) or (session.created != meta['created']):
+            session = StreamingSession(meta['samples'], meta['csv_path'], session_id)
+            session.created = meta['created']
+            _sessions[session_id] = session
+            if len(_sessions) > ds.stream_max_sessions:
+                # copies of sessions are rebuilt from the shared store if needed again
+                _sessions.pop(next(iter(_sessions)))
+        _sync(session, meta)
+    return session
+
+
+def create_session(session_id, sample_names, csv_path=None):
+    # start a session, raises SessionLimitReached if ds.stream_max_sessions sessions are live
+    _register(session_id)
+    meta = {'samples': list(sample_names), 'csv_path': csv_path, 'created': uuid.uuid4().hex, 'n_blocks': 0}
+    store.set(_key(session_id), meta, ds.stream_session_expires)
+    return get_session(session_id)
+
+
+def append_points(session_id, t_new, values_new):
+    '''
+        Append time points to a session of the HTTP feed (see StreamingSession.append()), they are added to the shared
+        store for the other processes. Returns the number of time points, None if the session is unknown.
+    '''
+    import numpy as np
+    import data_transport as dt
+
+    with store.lock(_key(session_id)):
+        session = get_session(session_id)
+        if session is None:
+            return None
+        meta = store.get(_key(session_id))
+        n = session.append(t_new, values_new)
+        block = {'t': np.atleast_1d(np.asarray(t_new, dtype=float)).tolist(),
+                 'values': dt.encode_array(np.asarray(values_new, dtype=float))}
+        store.set(_block_key(session_id, meta['n_blocks']), block, ds.stream_session_expires)
+        meta['n_blocks'] += 1
+        store.set(_key(session_id), meta, ds.stream_session_expires)
+        session.n_blocks = meta['n_blocks']
+    return n
+
+
+def watch_path(path):
+    # resolved path of a csv export inside ds.stream_watch_dir (None if watching files is off or the path is outside)
+    watch_dir = os.environ.get('STREAM_WATCH_DIR', ds.stream_watch_dir)
+    if not watch_dir:
+        return None
+    watch_dir = os.path.realpath(watch_dir)
+    path = os.path.realpath(os.path.join(watch_dir, path))
+    if (os.path.commonpath([watch_dir, path]) != watch_dir) or (not os.path.isfile(path)):
+        return None
+    return path
+
+
+def watch_csv(path):
+    # session reading a growing csv export (path resolved by watch_path()), every process reads the file on its own
+    session_id = 'csv:' + path
+    session = get_session(session_id)
+    if session is None:
+        df = read_csv_export(path)
+        session = create_session(session_id, df.index.astype(str), csv_path=path)
+    session.poll()
+    return session
+
+
+################################################
+# HTTP API
+################################################
+def _authorized():
+    # the HTTP feed needs the token of ds.stream_api_token (off if no token is set)
+    token = os.environ.get('STREAM_API_TOKEN', ds.stream_api_token)
+    if not token:
+        return False
+    return hmac.compare_digest(request.headers.get('Authorization', ''), 'Bearer ' + token)
+
+
+def register_stream_routes(server):
+    '''
+        Endpoints for plate readers (or their control software) pushing time points to a live session
+        - PUT /stream/<session_id> with {"samples": [...]} starts a session
+        - POST /stream/<session_id>/timepoints with {"time": [...], "values": [[...], ...]} appends time points, values
+          has one list per time point with one value per sample
+        - requests need the header 'Authorization: Bearer <token>' (see ds.stream_api_token), new sessions are refused
+          with status 429 while ds.stream_max_sessions sessions are live
+    '''
+    @server.route('/stream/<session_id>', methods=['PUT'])
+    def stream_create(session_id):
+        if not _authorized():
+            return jsonify({'error': 'unauthorized'}), 401
+        body = request.get_json(silent=True) or {}
+        samples = body.get('samples')
+        if not samples:
+            return jsonify({'error': 'samples missing'}), 400
+        try:
+            create_session(session_id, [str(s) for s in samples])
+        except SessionLimitReached:
+            return jsonify({'error': 'too many live sessions'}), 429
+        return jsonify({'session': session_id, 'n_timepoints': 0}), 201
+
+    @server.route('/stream/<session_id>/timepoints', methods=['POST'])
+    def stream_append(session_id):
+        import numpy as np
+
+        if not _authorized():
+            return jsonify({'error': 'unauthorized'}), 401
+        session = get_session(session_id)
+        if session is None:
+            return jsonify({'error': 'unknown session'}), 404
+        body = request.get_json(silent=True) or {}
+        try:
+            t_new = np.atleast_1d(np.asarray(body['time'], dtype=float))
+            values_new = np.asarray(body['values'], dtype=float).reshape(t_new.shape[0], len(session.sample_names)).T
+            n = append_points(session_id, t_new, values_new)
+        except (KeyError, TypeError, ValueError) as e:
+            return jsonify({'error': str(e)}), 400
+        if n is None:
+            return jsonify({'error': 'unknown session'}), 404
+        return jsonify({'session': session_id, 'n_timepoints': n})
@@ -0,0 +1,21 @@
+'''
+author: Michael A. Reiter
+(c) ETH Zurich, Michael A. Reiter, 2022
+
+This file is part of Dashing Growth Curves.
+
+Dashing Growth Curves is free software: you can redistribute it and/or modify it under the terms of the GNU General Public License as published by the Free Software Foundation, either version 3 of the License, or (at your option) any later version.
+
+Dashing Growth Curves is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License along with Dashing Growth Curves. If not, see <https://www.gnu.org/licenses/>.
+'''
+
+# background jobs (autofit, single-well fits, bootstrap and export)
+# - tasks.py: the tasks, only NumPy/SciPy and the analysis code are imported (no Dash or plotly)
+# - celery_app.py: Celery app with task routing and queues (production, REDIS_URL set):
+#     celery -A worker.celery_app worker -Q interactive
+#     celery -A worker.celery_app worker -Q plate,export
+# - connections.py: Redis connection pool of a process, shared by the result backend and server-side stores
+# - store.py: data shared by all server processes (Redis or diskcache), e.g. job bookkeeping and live sessions
+# - jobs.py: submitting jobs and checking their progress from the app (Celery or local process pools)
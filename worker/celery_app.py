@@ -0,0 +1,83 @@
+'''
+author: Michael A. Reiter
+(c) ETH Zurich, Michael A. Reiter, 2022
+
+This file is part of Dashing Growth Curves.
+
+Dashing Growth Curves is free software: you can redistribute it and/or modify it under the terms of the GNU General Public License as published by the Free Software Foundation, either version 3 of the License, or (at your option) any later version.
+
+Dashing Growth Curves is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License along with Dashing Growth Curves. If not, see <https://www.gnu.org/licenses/>.
+'''
+
+import os
+
+from celery import Celery
+from celery.backends.redis import RedisBackend
+
+import default_settings as ds
+from worker import connections, tasks
+
+
+################################################
+# Celery app
+################################################
+class PooledRedisBackend(RedisBackend):
+    # result backend on the connection pool shared with the server-side stores (see connections.py)
+    def _get_pool(self, **params):
+        return connections.connection_pool()
+
+
+# workers only import the tasks and the analysis code, not the app (see worker/__init__.py for the worker commands)
+celery_app = Celery(__name__, broker=connections.redis_url(), backend='worker.celery_app:PooledRedisBackend')
+celery_app.conf.update(
+                        # every task has its queue (see default_settings.worker_task_queues), workers listening to the
+                        # interactive queue serve single-well fits while plate-wide jobs are running
+                        task_routes={'worker.' + name: {'queue': queue} for name, queue in ds.worker_task_queues.items()},
+                        task_default_queue='plate',
+                        # a worker listening to several queues empties them in the given order (e.g. -Q interactive,plate)
+                        broker_transport_options={'queue_order_strategy': 'priority',
+                                                  'max_connections': connections.max_connections(),
+                                                  'health_check_interval': ds.redis_health_check_interval},
+                        # long jobs: a worker process reserves few tasks, tasks are acknowledged when done (not lost if a worker dies)
+                        worker_prefetch_multiplier=int(os.environ.get('WORKER_PREFETCH_MULTIPLIER', ds.worker_prefetch_multiplier)),
+                        worker_concurrency=int(os.environ.get('WORKER_CONCURRENCY', ds.worker_concurrency)),
+                        task_acks_late=True,
+                        task_track_started=True,
+                        result_expires=ds.job_result_expires,
+                        # connections: the broker keeps a pool of its own (kombu), the result backend uses the shared one
+                        broker_pool_limit=ds.redis_broker_pool_limit,
+                        redis_max_connections=connections.max_connections(),
+                        redis_backend_health_check_interval=ds.redis_health_check_interval,
+                        )
+
+
+################################################
+# tasks
+################################################
+def _progress(task):
+    # progress of a task in the result backend (see jobs.status())
+    def progress(done, total):
+        task.update_state(state='PROGRESS', meta={'done': done, 'total': total})
+    return progress
+
+
+@celery_app.task(bind=True, name='worker.autofit_plate')
+def autofit_plate(self, **kwargs):
+    return tasks.autofit_plate(progress=_progress(self), **kwargs)
+
+
+@celery_app.task(bind=True, name='worker.fit_sample')
+def fit_sample(self, **kwargs):
+    return tasks.fit_sample(progress=_progress(self), **kwargs)
+
+
+@celery_app.task(bind=True, name='worker.bootstrap_sample')
+def bootstrap_sample(self, **kwargs):
+    return tasks.bootstrap_sample(progress=_progress(self), **kwargs)
+
+
+@celery_app.task(bind=True, name='worker.export_results')
+def export_results(self, **kwargs):
+    return tasks.export_results(progress=_progress(self), **kwargs)
@@ -0,0 +1,58 @@
+'''
+author: Michael A. Reiter
+(c) ETH Zurich, Michael A. Reiter, 2022
+
+This file is part of Dashing Growth Curves.
+
+Dashing Growth Curves is free software: you can redistribute it and/or modify it under the terms of the GNU General Public License as published by the Free Software Foundation, either version 3 of the License, or (at your option) any later version.
+
+Dashing Growth Curves is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License along with Dashing Growth Curves. If not, see <https://www.gnu.org/licenses/>.
+'''
+
+import os
+import threading
+
+import default_settings as ds
+
+
+# connections to Redis (REDIS_URL) of this process, shared by the Celery result backend (see celery_app.py) and the
+# server-side stores, the pool blocks instead of opening more than ds.redis_max_connections connections
+_pool = None
+_lock = threading.Lock()
+
+
+################################################
+# settings
+################################################
+def redis_url():
+    return os.environ.get('REDIS_URL')
+
+
+def max_connections():
+    # connections per process (environment variable REDIS_MAX_CONNECTIONS), the Redis plan limits the sum over all processes
+    return int(os.environ.get('REDIS_MAX_CONNECTIONS', ds.redis_max_connections))
+
+
+################################################
+# connections
+################################################
+def connection_pool():
+    # pool of this process, redis-py pools reconnect by themselves in forked processes (gunicorn workers)
+    global _pool
+    with _lock:
+        if _pool is None:
+            import redis
+            _pool = redis.BlockingConnectionPool.from_url(redis_url(),
+                                                          max_connections=max_connections(),
+                                                          timeout=ds.redis_pool_timeout,
+                                                          health_check_interval=ds.redis_health_check_interval,
+                                                          socket_keepalive=True)
+        return _pool
+
+
+def redis_client():
+    # client on the shared pool (a client takes a connection from the pool for every command)
+    import redis
+    return redis.Redis(connection_pool=connection_pool())
@@ -0,0 +1,302 @@
+'''
+author: Michael A. Reiter
+(c) ETH Zurich, Michael A. Reiter, 2022
+
+This file is part of Dashing Growth Curves.
+
+Dashing Growth Curves is free software: you can redistribute it and/or modify it under the terms of the GNU General Public License as published by the Free Software Foundation, either version 3 of the License, or (at your option) any later version.
+
+Dashing Growth Curves is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License along with Dashing Growth Curves. If not, see <https://www.gnu.org/licenses/>.
+'''
+
+import hashlib
+import json
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+
+
+import default_settings as ds
+from worker import store
+
+
+# jobs run on Celery workers if REDIS_URL is set (see celery_app.py), else in process pools of this server process, one
+# pool per queue (see default_settings.worker_task_queues), status and results of local jobs are shared via diskcache
+use_celery = 'REDIS_URL' in os.environ
+
+# local process pools, created on first use in every process (not inherited from the gunicorn master), status and
+# results of local jobs are kept in the diskcache of store.py
+_pools = {}
+_pid = None
+_lock = threading.Lock()
+
+
+class JobCancelled(Exception):
+    pass
+
+
+def _local():
+    # process pools and job cache of this process
+    global _pid
+    with _lock:
+        if _pid != os.getpid():
+            _pools.clear()
+            _pid = os.getpid()
+        return _pools, store.cache()
+
+
+def _pool(queue):
+    pools, _ = _local()
+    with _lock:
+        if queue not in pools:
+            pools[queue] = ProcessPoolExecutor(max_workers=ds.local_worker_processes[queue])
+        return pools[queue]
+
+
+def _set_status(job_id, state, **info):
+    _, cache = _local()
+    cache.set(('status', job_id), dict(info, state=state), expire=ds.job_result_expires)
+
+
+def _run_local(job_id, name, kwargs):
+    # runs in a process of the local pool
+    from worker import tasks
+    _, cache = _local()
+
+    def progress(done, total):
+        if cache.get(('cancel', job_id)):
+            raise JobCancelled
+        _set_status(job_id, 'PROGRESS', done=done, total=total)
+
+    try:
+        result = getattr(tasks, name)(progress=progress, **kwargs)
+    except JobCancelled:
+        _set_status(job_id, 'REVOKED')
+        return
+    except Exception as e:
+        _set_status(job_id, 'FAILURE', error=repr(e))
+        return
+    cache.set(('result', job_id), result, expire=ds.job_result_expires)
+    _set_status(job_id, 'SUCCESS')
+
+
+################################################
+# jobs
+################################################
+def job_key(name, kwargs):
+    '''
+        Analysis key of a job, identical requests have the same key (None: jobs of the task aren't shared)
+        - autofit_plate: hash of the numeric matrix (values and time points, with the names and locations of its rows),
+          the blank assignment (blanks of every sample, blank model and plate layout), the smoothing window, the
+          algorithm (with its settings) and the window size
+        - the stored form of the plate (blocks, dtype, compression) is not part of the key
+    '''
+    import numpy as np
+    import plate_cache as pc
+
+    if name != 'autofit_plate':
+        return None
+    df = pc.frame_from_store(kwargs['plate'])
+    settings = dict(kwargs['settings'])
+    request = {
+                'matrix': [df.columns.tolist(), list(kwargs['sample_locations']), list(kwargs['sample_names'])],
+                'blanks': [kwargs['blank_locs'], settings.pop('blank_model', None), kwargs['plate_layout']],
+                'smoothing_window': settings.pop('smoother_ws', None),
+                'window_size': settings.pop('window_size', None),
+                'algorithm': [settings.pop('fitting_algorithm', None), settings],
+                }
+    h = hashlib.blake2b(digest_size=16)
+    h.update(np.ascontiguousarray(df.values, dtype='<f8').tobytes())
+    h.update(json.dumps(request, sort_keys=True, default=str).encode())
+    return h.hexdigest()
+
+
+def _send(name, kwargs):
+    queue = ds.worker_task_queues[name]
+    if use_celery:
+        from worker.celery_app import celery_app
+        return celery_app.send_task('worker.' + name, kwargs=kwargs, queue=queue).id
+
+    job_id = uuid.uuid4().hex
+    _set_status(job_id, 'PENDING')
+    _pool(queue).submit(_run_local, job_id, name, kwargs)
+    return job_id
+
+
+def _reusable(job):
+    # job of an identical request that's queued, running or finished (not failed, cancelled, lost or expired)
+    if job is None:
+        return False
+    state = status(job['job'])['state']
+    if state == 'PENDING':
+        # unknown jobs are pending as well, jobs waiting longer than ds.job_dedup_pending_timeout are considered lost
+        return time.time() - job['submitted'] < ds.job_dedup_pending_timeout
+    elif state == 'SUCCESS':
+        return result(job['job']) is not None
+    return state == 'PROGRESS'
+
+
+def submit(name, admit=None, **kwargs):
+    '''
+        Run a task of worker.tasks in the background
+        - name: task name (e.g. 'autofit_plate'), the task is sent to its queue (see default_settings.worker_task_queues)
+        - admit: called before a new job is started, no job is started if it returns False (see submit_admitted())
+        - kwargs: arguments of the task (JSON serializable)
+
+        Identical requests (see job_key()) get the id of the job that's already queued, running or finished (e.g. the
+        same control plate uploaded by several users), its results are kept for ds.job_result_expires.
+        Returns the job id and the ticket of this request (needed to cancel it, see cancel()), None and None if the job
+        was not admitted.
+    '''
+    ticket = uuid.uuid4().hex
+    key = job_key(name, kwargs) if ds.job_dedup_enabled else None
+    if key is None:
+        if (admit is not None) and (not admit()):
+            return None, None
+        job_id = _send(name, kwargs)
+        store.set('clients:' + job_id, {'key': None, 'tickets': [ticket]}, ds.job_result_expires)
+        return job_id, ticket
+
+    with store.lock('key:' + key):
+        job = store.get('key:' + key)
+        if _reusable(job):
+            job_id = job['job']
+            clients = store.get('clients:' + job_id) or {'key': key, 'tickets': []}
+        elif (admit is not None) and (not admit()):
+            return None, None
+        else:
+            job_id = _send(name, kwargs)
+            store.set('key:' + key, {'job': job_id, 'submitted': time.time()}, ds.job_result_expires)
+            clients = {'key': key, 'tickets': []}
+
+        # requests waiting for the job, one ticket each (see cancel())
+        clients['tickets'].append(ticket)
+        store.set('clients:' + job_id, clients, ds.job_result_expires)
+    return job_id, ticket
+
+
+def status(job_id):
+    '''
+        Status of a job as dict
+        - state: 'PENDING', 'PROGRESS', 'SUCCESS', 'FAILURE' or 'REVOKED' (Celery's task states, unknown jobs are pending)
+        - done, total: progress of running jobs
+        - error: error of failed jobs
+    '''
+    if use_celery:
+        from worker.celery_app import celery_app
+        job = celery_app.AsyncResult(job_id)
+        if job.state == 'PROGRESS':
+            return dict(job.info, state='PROGRESS')
+        elif job.state == 'STARTED':
+            return {'state': 'PROGRESS', 'done': 0, 'total': 0}
+        elif job.state == 'FAILURE':
+            return {'state': 'FAILURE', 'error': repr(job.info)}
+        return {'state': job.state}
+
+    _, cache = _local()
+    return cache.get(('status', job_id), {'state': 'PENDING'})
+
+
+def result(job_id):
+    # result of a finished job (None if not finished or expired)
+    if use_celery:
+        from worker.celery_app import celery_app
+        job = celery_app.AsyncResult(job_id)
+        return job.result if job.state == 'SUCCESS' else None
+
+    _, cache = _local()
+    return cache.get(('result', job_id))
+
+
+def _clients_lock(job_id, clients):
+    # clients of shared jobs change under the lock of their key (see submit())
+    if clients['key'] is None:
+        return store.lock('job:' + job_id)
+    return store.lock('key:' + clients['key'])
+
+
+def cancel(job_id, ticket):
+    '''
+        Withdraw the request with a ticket (see submit()) from a job, the job is cancelled when no request is left
+        - unknown or already withdrawn tickets and finished jobs don't change anything
+        - later identical requests start a new job once the job is cancelled (local jobs only stop at their next
+          progress update)
+    '''
+    if status(job_id)['state'] in ['SUCCESS', 'FAILURE', 'REVOKED']:
+        return
+
+    clients = store.get('clients:' + job_id)
+    if (clients is None) or (ticket not in clients['tickets']):
+        return
+    with _clients_lock(job_id, clients):
+        clients = store.get('clients:' + job_id)
+        if (clients is None) or (ticket not in clients['tickets']):
+            return
+        clients['tickets'].remove(ticket)
+        store.set('clients:' + job_id, clients, ds.job_result_expires)
+        if len(clients['tickets']) > 0:
+            return
+        if clients['key'] is not None:
+            job = store.get('key:' + clients['key'])
+            if (job is not None) and (job['job'] == job_id):
+                store.delete('key:' + clients['key'])
+
+    if use_celery:
+        from worker.celery_app import celery_app
+        celery_app.control.revoke(job_id, terminate=True)
+        return
+
+    _, cache = _local()
+    cache.set(('cancel', job_id), True, expire=ds.job_result_expires)
+
+
+################################################
+# admission
+################################################
+def max_running():
+    # jobs of the HTTP API running at the same time (environment variable JOB_API_MAX_RUNNING)
+    return int(os.environ.get('JOB_API_MAX_RUNNING', ds.job_api_max_running))
+
+
+def submit_admitted(name, **kwargs):
+    '''
+        Submit a job if less than max_running() jobs submitted this way are pending or running (see submit())
+
+        Returns the job id and the ticket of the request, None and None if the job was not admitted.
+    '''
+    with store.lock('admission'):
+        # jobs admitted before that are still pending or running (the status of unknown jobs is 'PENDING', they are
+        # dropped when their results would have expired)
+        now = time.time()
+        admitted = store.get('admitted') or {}
+        admitted = {job_id: t for job_id, t in admitted.items()
+                    if (now - t < ds.job_result_expires) and (status(job_id)['state'] in ['PENDING', 'PROGRESS'])}
+
+        # requests attached to the job of an identical request (see submit()) are always admitted and not counted
+        started = []
+
+        def admit():
+            if len(admitted) >= max_running():
+                return False
+            started.append(True)
+            return True
+
+        job_id, ticket = submit(name, admit=admit, **kwargs)
+        if len(started) > 0:
+            admitted[job_id] = now
+        store.set('admitted', admitted, ds.job_result_expires)
+    return job_id, ticket
+
+
+def after_fork():
+    # process pools and the job cache of the gunicorn master (--preload) are not shared by the forked workers, they are
+    # recreated on first use
+    global _pid
+    with _lock:
+        _pools.clear()
+        _pid = None
+    store.after_fork()
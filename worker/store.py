@@ -0,0 +1,86 @@
+'''
+author: Michael A. Reiter
+(c) ETH Zurich, Michael A. Reiter, 2022
+
+This file is part of Dashing Growth Curves.
+
+Dashing Growth Curves is free software: you can redistribute it and/or modify it under the terms of the GNU General Public License as published by the Free Software Foundation, either version 3 of the License, or (at your option) any later version.
+
+Dashing Growth Curves is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License along with Dashing Growth Curves. If not, see <https://www.gnu.org/licenses/>.
+'''
+
+import json
+import os
+import threading
+
+import default_settings as ds
+
+
+# data shared by all server processes (job bookkeeping, live sessions): Redis if REDIS_URL is set (see connections.py),
+# else a diskcache in ds.job_cache_dir (shared by the processes of one machine, it also holds status and results of
+# local jobs, see jobs.py)
+use_redis = 'REDIS_URL' in os.environ
+
+# diskcache of this process, opened on first use in every process (not inherited from the gunicorn master)
+_cache = None
+_pid = None
+_lock = threading.Lock()
+
+
+def cache():
+    global _cache, _pid
+    with _lock:
+        if _pid != os.getpid():
+            import diskcache
+            _cache = diskcache.Cache(ds.job_cache_dir, size_limit=ds.job_cache_size_limit, eviction_policy='least-recently-used')
+            _pid = os.getpid()
+        return _cache
+
+
+################################################
+# shared store
+################################################
+def get(key):
+    # value of a key (None if not set or expired), values are JSON serializable
+    if use_redis:
+        from worker import connections
+        value = connections.redis_client().get('growthdash:' + key)
+        return None if value is None else json.loads(value)
+    return cache().get(('shared', key))
+
+
+def set(key, value, expire):
+    if use_redis:
+        from worker import connections
+        connections.redis_client().set('growthdash:' + key, json.dumps(value), ex=int(expire))
+        return
+    cache().set(('shared', key), value, expire=expire)
+
+
+def delete(key):
+    if use_redis:
+        from worker import connections
+        connections.redis_client().delete('growthdash:' + key)
+        return
+    cache().delete(('shared', key))
+
+
+def lock(key):
+    # lock held by one server process at a time, released after ds.job_lock_timeout if its holder dies
+    if use_redis:
+        from worker import connections
+        return connections.redis_client().lock('growthdash:lock:' + key, timeout=ds.job_lock_timeout)
+    import diskcache
+    return diskcache.Lock(cache(), ('lock', key), expire=ds.job_lock_timeout)
+
+
+def after_fork():
+    # the diskcache of the gunicorn master (--preload) is not shared by the forked workers, it's reopened on first use
+    global _cache, _pid
+    with _lock:
+        if _cache is not None:
+            _cache.close()
+        _cache = None
+        _pid = None
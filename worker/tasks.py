@@ -0,0 +1,114 @@
+'''
+author: Michael A. Reiter
+(c) ETH Zurich, Michael A. Reiter, 2022
+
+This file is part of Dashing Growth Curves.
+
+Dashing Growth Curves is free software: you can redistribute it and/or modify it under the terms of the GNU General Public License as published by the Free Software Foundation, either version 3 of the License, or (at your option) any later version.
+
+Dashing Growth Curves is distributed in the hope that it will be useful, but WITHOUT ANY WARRANTY; without even the implied warranty of MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License along with Dashing Growth Curves. If not, see <https://www.gnu.org/licenses/>.
+'''
+
+import time
+
+import pandas as pd
+
+import analysis_core as ac
+import auto_fitting
+import default_settings as ds
+import results_table as rt
+import plate_cache as pc
+import plate_layout as lay
+
+
+# tasks run by the background workers (see celery_app.py and jobs.py), arguments and results are JSON serializable
+# (stored plates and results tables), progress: called with the number of done and of all steps
+
+
+################################################
+# progress
+################################################
+def throttled(progress, interval=None):
+    '''
+        Progress function passing on at most one update per interval (default_settings.progress_update_interval [s])
+        - the first and the last update (done == total) are always passed on
+        - every update is a write to the result backend or job cache, fits of single wells take a few ms
+    '''
+    if progress is None:
+        return lambda done, total: None
+    interval = ds.progress_update_interval if interval is None else interval
+    last_update = [None]
+
+    def update(done, total):
+        now = time.monotonic()
+        if (last_update[0] is None) or (now - last_update[0] >= interval) or (done >= total):
+            last_update[0] = now
+            progress(done, total)
+    return update
+
+
+################################################
+# plates
+################################################
+def autofit_plate(plate, sample_locations, sample_names, blank_locs, plate_layout, settings, progress=None):
+    '''
+        Blank and fit all samples of a plate (see analysis_core.autofit_plate())
+        - plate: stored plate data, raw or smoothed (see data_transport.frame_for_store())
+        - sample_locations, sample_names: location and current name of every sample (blanks are referenced by name)
+        - plate_layout: stored plate layout (see plate_layout.layout_for_store()) or None
+        - settings: fitting settings (keyword arguments of analysis_core.autofit_plate(), e.g. fitting_algorithm, window_size)
+
+        Returns the stored results table with the fits of this job only (see results_table.merge_fits()), the result
+        only depends on the arguments (jobs are shared by identical requests, see jobs.job_key()).
+    '''
+    df = pc.frame_from_store(plate)
+    growth_rate_data = rt.new_table(sample_locations, sample_names)
+    if plate_layout is not None:
+        plate_layout = lay.layout_from_store(plate_layout)
+    growth_rate_data = ac.autofit_plate(df, growth_rate_data, blank_locs, plate_layout, progress=throttled(progress), **settings)
+    return rt.table_for_store(growth_rate_data)
+
+
+################################################
+# single wells
+################################################
+def fit_sample(t, y_blanked, settings, sample_location='sample', sample_name='sample', progress=None):
+    '''
+        Fit one blanked growth curve (e.g. a single well refitted with other settings)
+        - t, y_blanked: time points and blanked measurements
+        - settings: fitting settings as in autofit_plate(), blank settings are not used
+        - sample_location, sample_name: location and name of the sample in the results table
+
+        Returns the stored results table with one sample.
+    '''
+    df_blanked = pd.DataFrame([y_blanked], index=[sample_name], columns=t, dtype=float)
+    growth_rate_data = rt.new_table([sample_location], [sample_name])
+    n_bootstrap, f_scale = ac.valid_fit_settings(settings.get('n_bootstrap', 0), settings.get('f_scale'))
+    with auto_fitting.bootstrap_executor(n_bootstrap) as executor:
+        growth_rate_data = ac.fit_all_samples(throttled(progress), df_blanked, df_blanked, growth_rate_data,
+                                              settings['auto_fit_ws'], settings['auto_fit_sr'], settings['auto_fit_weight'],
+                                              settings['fitting_algorithm'], settings['window_size'], settings.get('smoother_ws', 0),
+                                              settings.get('blank_model'), n_bootstrap, executor,
+                                              settings.get('loss', 'linear'), f_scale)
+    return rt.table_for_store(growth_rate_data)
+
+
+def bootstrap_sample(t, y_blanked, settings, n_bootstrap, sample_location='sample', sample_name='sample', progress=None):
+    # fit of one blanked growth curve with bootstrap confidence intervals from n_bootstrap resamples (see fit_sample())
+    return fit_sample(t, y_blanked, dict(settings, n_bootstrap=n_bootstrap), sample_location, sample_name, progress)
+
+
+################################################
+# export
+################################################
+def export_results(growth_data, file_format='csv', progress=None):
+    '''
+        Results table as text (one row per sample location)
+        - file_format: 'csv' (tab separated, as the download of the app) or 'json' (one record per sample location)
+    '''
+    df = rt.to_dataframe(rt.table_from_store(growth_data))
+    if file_format == 'json':
+        return df.to_json(orient='index')
+    return df.to_csv(sep='\t', na_rep='NaN')